@@ -1,16 +1,83 @@
-from flask import Flask, render_template, request, jsonify, abort, g
+from collections.abc import Mapping, Sequence
+from functools import wraps
+from flask import (Flask, render_template, request, jsonify, abort, g, make_response, url_for,
+                   send_file, before_render_template, template_rendered)
+from flask.json.provider import DefaultJSONProvider
 from config import Config
+from utils.catalog import DiagramRecord
 from utils.diagram_parser import DiagramParser
+from utils.diagram_types import type_label
+from utils.export import (EXPORT_FORMATS, CatalogExport, ExportLayoutCache, parse_section_range,
+                          select_positions)
+from utils.fragment_cache import FragmentCache, FragmentCacheExtension
+from utils.metrics import MetricsRegistry, timed_iter
+from utils.profiling import ProfileStore, RequestProfiler
+from utils.response_cache import CachedBody, CompressedResponseCache, available_encodings, compress_chunks
+from utils.search_cache import CachedSearch, SearchResultCache, search_cache_key
+from utils.streaming import json_array_chunks, ndjson_chunks
+from utils.structured_log import configure_logging, log_event, sampled
+from utils.svg_render import SVGCache, SVGPrerenderer, make_renderer
+import hashlib
+import hmac
+import logging
 import os
 import re
+import time
+from urllib.parse import urlencode
+
+metrics = MetricsRegistry()
+request_duration = metrics.histogram('http_request_duration_seconds',
+                                     'Time to produce a response, by endpoint', ['endpoint'])
+requests_total = metrics.counter('http_requests_total', 'Responses sent, by endpoint and status',
+                                 ['endpoint', 'status'])
+phase_duration = metrics.histogram('http_request_phase_seconds',
+                                   'Time spent rendering templates, serializing JSON and searching, by endpoint',
+                                   ['endpoint', 'phase'])
+
+class CatalogJSONProvider(DefaultJSONProvider):
+    """Serialize catalog records (read-only mappings) and record sequences like plain dicts and lists"""
+    @staticmethod
+    def default(o):
+        if isinstance(o, Mapping):
+            return dict(o)
+        if isinstance(o, Sequence):
+            return list(o)
+        return DefaultJSONProvider.default(o)
+    
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = super().response(*args, **kwargs)
+        record_timing('serialize', time.perf_counter() - start)
+        return response
 
 app = Flask(__name__)
+app.json = CatalogJSONProvider(app)
 app.config.from_object(Config)
 
-# Initialize diagram parser with debug info
-print(f"Loading diagrams from: {app.config['DIAGRAM_FILE']}")
-parser = DiagramParser(app.config['DIAGRAM_FILE'])
-print(f"Total diagrams loaded: {len(parser.get_all_diagrams())}")
+configure_logging(app.config['LOG_LEVEL'])
+logger = logging.getLogger('mermaid_viewer')
+
+# Initialize diagram parser
+logger.info(f"Loading diagrams from: {app.config['DIAGRAM_FILE']}")
+parser = DiagramParser(app.config['DIAGRAM_FILE'],
+                       workers=app.config['PARSE_WORKERS'],
+                       bundle_path=app.config['DIAGRAM_BUNDLE'])
+logger.info(f"Total diagrams loaded: {len(parser.get_all_diagrams())}")
+
+# Pick up edits to the diagram file without restarting the workers
+if app.config['RELOAD_ON_CHANGE'] and app.config['RELOAD_WATCHER']:
+    parser.start_watcher(app.config['RELOAD_CHECK_INTERVAL'])
+
+# Server-side SVG rendering. The loaded catalog is prerendered in the background
+# once a server process starts (gunicorn's post_fork, or __main__ below), and
+# every reloaded catalog as soon as it is installed.
+svg_renderer = make_renderer(app.config['SVG_RENDERER'], app.config['SVG_RENDERER_COMMAND'],
+                             app.config['SVG_RENDER_TIMEOUT'], app.config['SVG_RENDERER_PUPPETEER_CONFIG'])
+prerenderer = (SVGPrerenderer(svg_renderer, SVGCache(app.config['SVG_CACHE_DIR'], app.config['SVG_CACHE_MAX_BYTES']),
+                              app.config['SVG_RENDER_WORKERS'], app.config['SVG_RENDER_RETRY_SECONDS'])
+               if svg_renderer is not None else None)
+if prerenderer is not None:
+    parser.on_reload(prerenderer.sync)
 
 # Custom filter for slugifying strings
 def slugify_filter(text):
@@ -25,28 +92,347 @@ def slugify_filter(text):
     text = text.strip('-')
     return text
 
-# Register the filter with Jinja2
+# Register the filters with Jinja2
 app.jinja_env.filters['slugify'] = slugify_filter
+app.jinja_env.filters['type_label'] = type_label
+
+# {% cache %} blocks: catalog-wide fragments (navbar, diagram rows) rendered once per catalog version
+app.jinja_env.add_extension(FragmentCacheExtension)
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_BYTES']) if app.config['FRAGMENT_CACHE_BYTES'] else None
+app.jinja_env.fragment_cache = fragment_cache
+app.jinja_env.fragment_cache_version = lambda: g.get('catalog_version')
+app.jinja_env.fragment_cache_verify = app.config['FRAGMENT_CACHE_VERIFY']
+
+def template_fingerprint(folder):
+    """Hash of the template files, so cached pages are revalidated after a deploy"""
+    h = hashlib.blake2b(digest_size=4)
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as f:
+            h.update(name.encode('utf-8'))
+            h.update(f.read())
+    return h.hexdigest()
+
+TEMPLATE_VERSION = template_fingerprint(os.path.join(app.root_path, app.template_folder))
+
+def page_etag(catalog, **view_args):
+    """Pages embed catalog-wide navigation, so they change with any diagram"""
+    return f"{catalog.version}.{TEMPLATE_VERSION}"
+
+def catalog_etag(catalog, **view_args):
+    return catalog.version
+
+def diagram_etag(catalog, diagram_id):
+    diagram = catalog.get_by_id(diagram_id)
+    return diagram.digest() if diagram else None
+
+def is_not_modified(etag, last_modified):
+    """Whether the client's cached copy, as described by its validators, is current"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+def conditional(cache_control_key, etag_for=page_etag):
+    """Answer conditional GETs for a view whose output only depends on the catalog.
+    
+    The ETag is computed from the catalog before the view runs, so a current
+    client copy gets a 304 without any serialization or template rendering.
+    Successful responses get the ETag, Last-Modified and the Cache-Control
+    policy configured under ``cache_control_key``.
+    """
+    def decorator(view):
+        compressible = getattr(view, 'compressible', False)
+        
+        @wraps(view)
+        def wrapper(**view_args):
+            catalog = parser.catalog
+            etag = identity_etag = etag_for(catalog, **view_args)
+            if etag is None:
+                return view(**view_args)
+            if compressible:
+                # Each content encoding is a distinct representation
+                encoding = negotiate_encoding()
+                if encoding:
+                    etag = f"{etag}-{encoding}"
+            
+            if is_not_modified(etag, catalog.last_modified) or (
+                    etag != identity_etag and is_not_modified(identity_etag, catalog.last_modified)):
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(**view_args))
+                if response.status_code not in (200, 206):
+                    return response
+                if 'Content-Encoding' not in response.headers:
+                    # Passed through uncompressed (streamed or a range)
+                    etag = identity_etag
+            
+            response.set_etag(etag)
+            if catalog.last_modified is not None:
+                response.last_modified = catalog.last_modified
+            response.headers['Cache-Control'] = app.config[cache_control_key]
+            if compressible:
+                response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
+
+response_cache = CompressedResponseCache(app.config['COMPRESSION_CACHE_BYTES'])
+search_cache = SearchResultCache(app.config['SEARCH_CACHE_BYTES'], app.config['SEARCH_CACHE_TTL'])
+
+# Headers that describe the uncompressed body and must not be replayed
+UNCACHED_HEADERS = {'content-length', 'content-type', 'content-encoding', 'transfer-encoding'}
+
+def negotiate_encoding():
+    """Best content encoding acceptable to the client, or None"""
+    if not app.config['COMPRESSION_ENABLED']:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+def cache_compressed(chunks, key, version, content_type, headers):
+    """Pass compressed chunks on as they are produced, caching the body once
+    complete unless it outgrew RESPONSE_CACHE_MAX_BYTES
+    """
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size <= app.config['RESPONSE_CACHE_MAX_BYTES']:
+                parts.append(chunk)
+            else:
+                parts = None
+        yield chunk
+    # Don't cache a body built from a catalog swapped in meanwhile
+    if parts is not None and parser.catalog.version == version:
+        response_cache.put(key, version, CachedBody(b''.join(parts), content_type, headers))
+
+def compressed(view):
+    """Serve a view's successful responses compressed, from a cache keyed by
+    route, arguments, encoding and catalog version.
+    
+    Bodies are compressed and sent chunk by chunk; streamed bodies are flushed
+    through the compressor a chunk at a time, so they keep streaming. Range
+    requests are passed through uncompressed and uncached. Must be applied
+    below ``conditional``.
+    """
+    @wraps(view)
+    def wrapper(**view_args):
+        encoding = negotiate_encoding()
+        if not encoding or request.range:
+            response = make_response(view(**view_args))
+            response.vary.add('Accept-Encoding')
+            return response
+        
+        version = parser.catalog.version
+        key = (request.endpoint, tuple(sorted(view_args.items())),
+               tuple(sorted(request.args.items(multi=True))), encoding)
+        entry = response_cache.get(key, version)
+        if entry is not None:
+            response = app.response_class(entry.body, content_type=entry.content_type, headers=entry.headers)
+        else:
+            response = make_response(view(**view_args))
+            if response.status_code != 200:
+                response.vary.add('Accept-Encoding')
+                return response
+            headers = [(name, value) for name, value in response.headers
+                       if name.lower() not in UNCACHED_HEADERS]
+            chunks = compress_chunks(response.iter_encoded(), encoding, flush=response.is_streamed)
+            response = app.response_class(cache_compressed(chunks, key, version, response.content_type, headers),
+                                          content_type=response.content_type, headers=headers)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    wrapper.compressible = True
+    return wrapper
+
+# Catalog and cache state, read when /metrics is scraped
+stats = parser.reload_stats
+metrics.callback('diagram_catalog_diagrams', 'Diagrams in the current catalog', lambda: len(parser.catalog))
+metrics.callback('diagram_catalog_load_seconds', 'Duration of the initial catalog load',
+                 lambda: stats['load_duration_ms'] / 1000)
+metrics.callback('diagram_catalog_reloads_total', 'Catalog reloads', lambda: stats['reloads'], 'counter')
+metrics.callback('diagram_catalog_reload_seconds_total', 'Time spent reloading the catalog',
+                 lambda: stats['total_duration_ms'] / 1000, 'counter')
+metrics.callback('diagram_catalog_last_reload_seconds', 'Duration of the last catalog reload',
+                 lambda: stats['last_duration_ms'] / 1000)
+metrics.callback('diagram_catalog_sections_reparsed_total', 'Sections parsed again by reloads',
+                 lambda: stats['sections_reparsed'], 'counter')
+metrics.callback('diagram_catalog_sections_reused_total', 'Unchanged sections reused by reloads',
+                 lambda: stats['sections_reused'], 'counter')
+metrics.callback('response_cache_hits_total', 'Compressed response cache hits',
+                 lambda: response_cache.hits, 'counter')
+metrics.callback('response_cache_misses_total', 'Compressed response cache misses',
+                 lambda: response_cache.misses, 'counter')
+metrics.callback('response_cache_evictions_total', 'Compressed response cache evictions',
+                 lambda: response_cache.evictions, 'counter')
+metrics.callback('response_cache_bytes', 'Size of the cached compressed bodies',
+                 lambda: response_cache.stats()['bytes'])
+if app.config['SEARCH_CACHE_BYTES']:
+    metrics.callback('search_cache_hits_total', 'Search result cache hits',
+                     lambda: search_cache.hits, 'counter')
+    metrics.callback('search_cache_misses_total', 'Search result cache misses',
+                     lambda: search_cache.misses, 'counter')
+    metrics.callback('search_cache_coalesced_total', 'Searches that waited for an identical one in progress',
+                     lambda: search_cache.coalesced, 'counter')
+    metrics.callback('search_cache_evictions_total', 'Search result cache evictions',
+                     lambda: search_cache.evictions, 'counter')
+    metrics.callback('search_cache_expirations_total', 'Search results dropped after SEARCH_CACHE_TTL',
+                     lambda: search_cache.expirations, 'counter')
+    metrics.callback('search_cache_hit_ratio', 'Share of search result cache lookups that hit',
+                     lambda: search_cache.stats()['hit_rate'])
+    metrics.callback('search_cache_bytes', 'Size of the cached search results',
+                     lambda: search_cache.stats()['bytes'])
+if prerenderer is not None:
+    metrics.callback('svg_renders_total', 'Diagrams rendered to SVG by this process',
+                     lambda: prerenderer.rendered, 'counter')
+    metrics.callback('svg_render_failures_total', 'Diagrams that failed to render to SVG',
+                     lambda: prerenderer.failed, 'counter')
+    metrics.callback('svg_render_seconds_total', 'Time spent rendering diagrams to SVG',
+                     lambda: prerenderer.render_seconds, 'counter')
+    metrics.callback('svg_render_queued', 'Diagrams waiting to be rendered to SVG',
+                     lambda: prerenderer.queued)
+    metrics.callback('svg_cache_evictions_total', 'SVGs pruned from the disk cache by this process',
+                     lambda: prerenderer.cache.evictions, 'counter')
+if fragment_cache is not None:
+    metrics.callback('fragment_cache_hits_total', 'Template fragment cache hits',
+                     lambda: fragment_cache.hits, 'counter')
+    metrics.callback('fragment_cache_misses_total', 'Template fragment cache misses',
+                     lambda: fragment_cache.misses, 'counter')
+    metrics.callback('fragment_cache_evictions_total', 'Template fragment cache evictions',
+                     lambda: fragment_cache.evictions, 'counter')
+    metrics.callback('fragment_cache_bytes', 'Size of the cached template fragments',
+                     lambda: fragment_cache.stats()['bytes'])
+
+def record_timing(phase, seconds):
+    """Account ``seconds`` spent in ``phase`` (render, serialize or search) to the current request"""
+    timings = g.setdefault('timings', {})
+    timings[phase] = timings.get(phase, 0.0) + seconds
+    if app.config['METRICS_ENABLED']:
+        phase_duration.observe(seconds, request.endpoint or 'unmatched', phase)
+
+def timed_stream(chunks):
+    """Account the time spent generating a streamed body to the serialize phase"""
+    if not app.config['METRICS_ENABLED']:
+        return chunks
+    return timed_iter(chunks, phase_duration, request.endpoint, 'serialize')
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+    start = g.pop('render_start', None)
+    if start is not None:
+        record_timing('render', time.perf_counter() - start)
+
+profiling = app.config['PROFILING_ENABLED'] and bool(app.config['PROFILING_TOKEN'])
+if app.config['PROFILING_ENABLED'] and not profiling:
+    logger.warning("PROFILING_ENABLED is set without a PROFILING_TOKEN; profiling stays off")
+profiles = ProfileStore(app.config['PROFILING_KEEP'])
+
+def has_profiling_token(value):
+    """Whether a client-supplied ``value`` is the profiling token"""
+    token = app.config['PROFILING_TOKEN']
+    if not token or not value:
+        return False
+    # Compared as bytes: compare_digest rejects non-ASCII str
+    return hmac.compare_digest(value.encode('utf-8'), token.encode('utf-8'))
+
+def start_profiling():
+    """Profile this request if it asks for it with the token, or if it is sampled"""
+    if has_profiling_token(request.headers.get('X-Profile') or request.args.get('profile')):
+        g.profiler = RequestProfiler.start('requested')
+    elif sampled(app.config['PROFILING_SAMPLE_RATE']):
+        g.profiler = RequestProfiler.start('sampled')
+
+def finish_profiling(response):
+    """Store the request's profile once its body has been sent"""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    profile_id = profiles.next_id()
+    # The path as requested, without the profiling token
+    query = urlencode([(name, value) for name, value in request.args.items(multi=True) if name != 'profile'])
+    path = f'{request.path}?{query}' if query else request.path
+    request_info = (request.method, path, request.endpoint, response.status_code)
+    phases = g.setdefault('timings', {})
+    
+    def store():
+        profile = profiler.finish(profile_id, *request_info, phases)
+        if profile.trigger == 'requested' or profile.duration_ms >= app.config['PROFILING_THRESHOLD_MS']:
+            profiles.add(profile)
+    
+    response.call_on_close(store)
+    if profiler.trigger == 'requested':
+        response.headers['X-Profile-Id'] = str(profile_id)
+
+@app.teardown_request
+def discard_profiler(error):
+    """Stop a profiler left running by a request that never produced a response"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.discard()
 
 @app.before_request
 def before_request():
     """Load diagrams for use in base template"""
+    if profiling:
+        start_profiling()
+    g.request_start = time.perf_counter()
+    if app.config['RELOAD_ON_CHANGE'] and not app.config['RELOAD_WATCHER']:
+        parser.check_for_changes(app.config['RELOAD_CHECK_INTERVAL'])
+    
+    # Read first: fragments rendered from these lists are cached under this version
+    g.catalog_version = parser.catalog.version
     g.diagrams = parser.get_all_diagrams()
     g.sections = parser.get_all_sections()
+
+@app.after_request
+def after_request(response):
+    """Record request metrics and log a sample of requests.
     
-    # Debug info
-    print(f"Request to {request.path} - Loaded {len(g.diagrams)} diagrams")
+    Every server error and every request slower than LOG_SLOW_REQUEST_MS is
+    logged; other requests only at LOG_REQUEST_SAMPLE_RATE.
+    """
+    if profiling:
+        finish_profiling(response)
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    endpoint = request.endpoint or 'unmatched'
+    if app.config['METRICS_ENABLED']:
+        request_duration.observe(duration, endpoint)
+        requests_total.inc(endpoint, str(response.status_code))
+    
+    duration_ms = duration * 1000
+    if (response.status_code >= 500 or duration_ms >= app.config['LOG_SLOW_REQUEST_MS']
+            or sampled(app.config['LOG_REQUEST_SAMPLE_RATE'])):
+        phases = {f'{phase}_ms': round(seconds * 1000, 3) for phase, seconds in g.get('timings', {}).items()}
+        log_event(logger, 'request', method=request.method, path=request.path, endpoint=endpoint,
+                  status=response.status_code, duration_ms=round(duration_ms, 3),
+                  diagrams=len(parser.catalog), **phases)
+    return response
 
 @app.context_processor
 def inject_common_data():
     """Inject common data into all templates"""
     return {
         'app_name': app.config['APP_NAME'],
+        'lazy_rendering': app.config['LAZY_RENDERING'],
+        'prefetch_navigation': app.config['PREFETCH_NAVIGATION'],
+        'svg_prerendering': prerenderer is not None,
         'diagrams': g.get('diagrams', []),
-        'sections': g.get('sections', [])
+        'sections': g.get('sections', []),
+        # Read by the cached navbar: views pass their own ``diagrams``
+        'quick_links': g.get('diagrams', [])[:10]
     }
 
 @app.route('/')
+@conditional('CACHE_CONTROL_PAGES')
 def index():
     """Home page with list of diagrams"""
     diagrams = parser.get_all_diagrams()
@@ -58,16 +444,37 @@ def index():
     return render_template('index.html', 
                          diagrams=diagrams,
                          sections=sections,
-                         preview_diagram=preview_diagram)
+                         preview_diagram=preview_diagram,
+                         type_counts=parser.get_type_counts())
 
 @app.route('/diagrams')
+@conditional('CACHE_CONTROL_PAGES')
+@compressed
 def list_diagrams():
-    """List all available diagrams"""
+    """List all available diagrams, or those matching the search query ``q``"""
+    query = request.args.get('q', '').strip()
     diagrams = parser.get_all_diagrams()
+    # Matches go in their own variable: ``diagrams`` is the whole catalog,
+    # which the navbar (cached once per catalog version) also renders
+    results = (parser.catalog.search_index.search(query, limit=app.config['SEARCH_MAX_LIMIT']).diagrams
+               if query else None)
     return render_template('list_diagrams.html', 
-                         diagrams=diagrams)
+                         diagrams=diagrams,
+                         results=results,
+                         query=query,
+                         type_counts=parser.get_type_counts())
+
+def render_diagram_page(diagram):
+    """Diagram page with its neighbors and the diagrams of the same type for navigation"""
+    previous_diagram, next_diagram = parser.get_neighbors(diagram.id)
+    return render_template('diagram.html',
+                         diagram=diagram,
+                         previous_diagram=previous_diagram,
+                         next_diagram=next_diagram,
+                         related_diagrams=parser.get_diagrams_by_type(diagram.type))
 
 @app.route('/diagram/<int:section_id>')
+@conditional('CACHE_CONTROL_PAGES')
 def show_diagram(section_id):
     """Display a specific diagram by section ID"""
     try:
@@ -75,16 +482,36 @@ def show_diagram(section_id):
         if not diagram:
             abort(404, description="Diagram not found")
         
-        # Get all diagrams for navigation
-        all_diagrams = parser.get_all_diagrams()
-        
-        return render_template('diagram.html',
-                             diagram=diagram,
-                             diagrams=all_diagrams)
+        return render_diagram_page(diagram)
     except Exception as e:
         abort(500, description=str(e))
 
+@app.route('/diagram/<int:diagram_id>.svg')
+def diagram_svg(diagram_id):
+    """Server-rendered SVG of a diagram. Until it has been rendered this is a
+    404, and clients render the diagram themselves.
+    """
+    diagram = parser.get_diagram_by_id(diagram_id)
+    if diagram is None:
+        return jsonify({'error': 'Diagram not found'}), 404
+    if prerenderer is None:
+        return jsonify({'error': 'Server-side rendering is disabled'}), 404
+    key, path = prerenderer.lookup(diagram.content)
+    if path is None:
+        return jsonify({'error': 'Diagram not rendered yet'}), 404
+    
+    try:
+        response = send_file(path, mimetype='image/svg+xml', etag=key, conditional=True)
+    except FileNotFoundError:
+        # Pruned since the lookup
+        return jsonify({'error': 'Diagram not rendered yet'}), 404
+    response.headers['Cache-Control'] = app.config['CACHE_CONTROL_API']
+    # Opened directly, the SVG must not run scripts or load anything
+    response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+    return response
+
 @app.route('/diagram/section/<int:section_num>')
+@conditional('CACHE_CONTROL_PAGES')
 def show_diagram_by_section(section_num):
     """Display diagram by section number (1-indexed)"""
     try:
@@ -92,22 +519,232 @@ def show_diagram_by_section(section_num):
         if not diagram:
             abort(404, description="Diagram not found")
         
-        # Get all diagrams for navigation
-        all_diagrams = parser.get_all_diagrams()
-        
-        return render_template('diagram.html',
-                             diagram=diagram,
-                             diagrams=all_diagrams)
+        return render_diagram_page(diagram)
     except Exception as e:
         abort(500, description=str(e))
 
+def parse_fields(value):
+    """Fields requested with ``fields=a,b,c``; None means every field"""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in DiagramRecord.FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. "
+                         f"Available: {', '.join(DiagramRecord.FIELDS)}")
+    return fields
+
+def project(diagram, fields):
+    if fields is None:
+        return diagram
+    return {field: diagram[field] for field in fields}
+
 @app.route('/api/diagrams')
+@conditional('CACHE_CONTROL_API', catalog_etag)
+@compressed
 def api_get_diagrams():
-    """API endpoint to get all diagrams"""
-    diagrams = parser.get_all_diagrams()
-    return jsonify(diagrams)
+    """API endpoint to get all diagrams.
+    
+    Optional query parameters:
+        type      only diagrams of this type
+        fields    comma-separated fields to include, e.g. id,title,type,section
+        page      1-based page number; with per_page, returns one page and sets
+                  X-Total-Count and a Link header for navigation
+        per_page  page size (default API_DEFAULT_PER_PAGE, capped at API_MAX_PER_PAGE)
+        format    'ndjson' for newline-delimited JSON instead of a JSON array
+    
+    Unpaginated responses are streamed, so the body is never built in memory.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    diagram_type = request.args.get('type')
+    if diagram_type:
+        diagrams = parser.get_diagrams_by_type(diagram_type)
+    else:
+        diagrams = parser.get_all_diagrams()
+    
+    if 'page' in request.args or 'per_page' in request.args:
+        per_page = request.args.get('per_page', app.config['API_DEFAULT_PER_PAGE'], type=int)
+        per_page = max(1, min(per_page, app.config['API_MAX_PER_PAGE']))
+        page = max(1, request.args.get('page', 1, type=int))
+        total = len(diagrams)
+        start = (page - 1) * per_page
+        
+        response = jsonify([project(diagram, fields) for diagram in diagrams[start:start + per_page]])
+        response.headers['X-Total-Count'] = str(total)
+        
+        links = []
+        last_page = max(1, -(-total // per_page))
+        args = request.args.to_dict()
+        for rel, target in (('first', 1), ('prev', page - 1), ('next', page + 1), ('last', last_page)):
+            if 1 <= target <= last_page:
+                args.update(page=target, per_page=per_page)
+                links.append(f'<{url_for("api_get_diagrams", **args)}>; rel="{rel}"')
+        response.headers['Link'] = ', '.join(links)
+        return response
+    
+    dumps = app.json.dumps
+    items = (project(diagram, fields) for diagram in diagrams)
+    if request.args.get('format') == 'ndjson':
+        return app.response_class(timed_stream(ndjson_chunks(items, dumps)), mimetype='application/x-ndjson')
+    return app.response_class(timed_stream(json_array_chunks(items, dumps)), mimetype='application/json')
+
+def parse_ids(values):
+    """Diagram ids from ``ids=1,2,3`` and/or repeated ``ids`` values, without duplicates"""
+    ids = []
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                ids.append(int(part))
+            except ValueError:
+                raise ValueError(f"Invalid diagram id: {part!r}")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("No diagram ids given. Use ids=1,2,3")
+    if len(ids) > app.config['API_MAX_BATCH_IDS']:
+        raise ValueError(f"Too many diagram ids: {len(ids)} (at most {app.config['API_MAX_BATCH_IDS']})")
+    return ids
+
+def diagrams_batch(values, fields_value, neighbors=False):
+    try:
+        ids = parse_ids(values)
+        fields = parse_fields(fields_value)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    diagrams = []
+    missing = []
+    for diagram_id in ids:
+        diagram = parser.get_diagram_by_id(diagram_id)
+        if diagram is None:
+            missing.append(diagram_id)
+        elif neighbors:
+            previous_diagram, next_diagram = parser.get_neighbors(diagram_id)
+            diagrams.append({**project(diagram, fields),
+                             'previous_id': previous_diagram.id if previous_diagram else None,
+                             'next_id': next_diagram.id if next_diagram else None})
+        else:
+            diagrams.append(project(diagram, fields))
+    return jsonify({'diagrams': diagrams, 'missing': missing})
+
+@app.route('/api/diagrams/batch')
+@conditional('CACHE_CONTROL_API', catalog_etag)
+@compressed
+def api_get_diagrams_batch():
+    """Several diagrams in one request, in the order of their ids.
+    
+    Query parameters:
+        ids       comma-separated diagram ids (at most API_MAX_BATCH_IDS)
+        fields    comma-separated fields to include, as for /api/diagrams
+        neighbors '1' to add the previous_id and next_id of each diagram in
+                  catalog order (null at either end)
+    
+    Returns {"diagrams": [...], "missing": [ids not found]}.
+    """
+    return diagrams_batch(request.args.getlist('ids'), request.args.get('fields'),
+                          neighbors=request.args.get('neighbors') == '1')
+
+@app.route('/api/diagrams/batch', methods=['POST'])
+def api_post_diagrams_batch():
+    """The batch endpoint for id lists too long for a URL, posted as a form
+    (``ids`` and ``fields``) or as JSON ({"ids": [...], "fields": "..."})"""
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('ids'), list):
+            return jsonify({'error': 'Expected a JSON object with an "ids" list'}), 400
+        fields = body.get('fields')
+        if isinstance(fields, list):
+            fields = ','.join(map(str, fields))
+        return diagrams_batch([','.join(map(str, body['ids']))], fields)
+    return diagrams_batch(request.form.getlist('ids'), request.form.get('fields'))
+
+export_layouts = ExportLayoutCache(app.config['EXPORT_LAYOUT_CACHE_BYTES'])
+
+def export_etag(catalog, **view_args):
+    """Strong validator of one export, used by If-Range to resume downloads"""
+    h = hashlib.blake2b(repr(sorted(request.args.items(multi=True))).encode('utf-8'), digest_size=4)
+    return f"{catalog.version}-{h.hexdigest()}"
+
+def stream_export(export, key, version):
+    yield from export.chunks()
+    # Complete: later range requests can seek straight into it
+    export_layouts.put(key, version, export.layout)
+
+@app.route('/api/export')
+@conditional('CACHE_CONTROL_API', export_etag)
+def api_export():
+    """Download the catalog as NDJSON (format=ndjson, the default) or as a zip
+    archive with one .mmd file per diagram (format=zip).
+    
+    Optional query parameters:
+        type      only diagrams of this type
+        sections  section range: START-END, START-, -END or a single number
+    
+    The export is streamed as it is generated. Single byte ranges are
+    supported (with If-Range), so interrupted downloads can be resumed.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    try:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format: {export_format}. Available: {', '.join(EXPORT_FORMATS)}")
+        first_section, last_section = parse_section_range(request.args.get('sections'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    catalog = parser.catalog
+    diagram_type = request.args.get('type')
+    key = (export_format, diagram_type, first_section, last_section)
+    layout = export_layouts.get(key, catalog.version)
+    if layout:
+        positions = layout.positions
+    else:
+        type_positions = catalog.type_index().get(diagram_type, ()) if diagram_type else None
+        positions = select_positions(catalog.records, type_positions, first_section, last_section)
+    export = CatalogExport(catalog.records, positions, export_format, app.json.dumps,
+                           catalog.last_modified, layout)
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    headers = {
+        'Content-Disposition': f'attachment; filename="mermaid-diagrams.{extension}"',
+        'Accept-Ranges': 'bytes'
+    }
+    byte_range = request.range
+    # A range applies to the representation the client has, as named by If-Range
+    # (an If-Range date is treated as stale, which is always safe)
+    if_range = request.if_range
+    if (byte_range and len(byte_range.ranges) == 1 and if_range.date is None
+            and if_range.etag in (None, export_etag(catalog))):
+        layout = export.build_layout()
+        export_layouts.put(key, catalog.version, layout)
+        bounds = byte_range.range_for_length(layout.size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{layout.size}'
+            return app.response_class(status=416, headers=headers)
+        start, stop = bounds
+        response = app.response_class(export.range_chunks(start, stop), status=206,
+                                      mimetype=mimetype, headers=headers)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{layout.size}'
+        response.content_length = stop - start
+        return response
+    
+    if request.method == 'HEAD':
+        # Download managers ask for the size before fetching in parts
+        layout = export.build_layout()
+        export_layouts.put(key, catalog.version, layout)
+    response = app.response_class(timed_stream(stream_export(export, key, catalog.version)),
+                                  mimetype=mimetype, headers=headers)
+    if layout is not None:
+        response.content_length = layout.size
+    return response
 
 @app.route('/api/diagram/<int:diagram_id>')
+@conditional('CACHE_CONTROL_API', diagram_etag)
 def api_get_diagram(diagram_id):
     """API endpoint to get specific diagram"""
     diagram = parser.get_diagram_by_id(diagram_id)
@@ -116,14 +753,78 @@ def api_get_diagram(diagram_id):
     return jsonify(diagram)
 
 @app.route('/api/search')
+@compressed
 def api_search_diagrams():
     """Search diagrams by keyword"""
     query = request.args.get('q', '')
     if not query:
         return jsonify([])
     
-    results = parser.search_diagrams(query)
-    return jsonify(results)
+    limit = request.args.get('limit', app.config['SEARCH_DEFAULT_LIMIT'], type=int)
+    limit = max(1, min(limit, app.config['SEARCH_MAX_LIMIT']))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    
+    catalog = parser.catalog
+    
+    def run_search():
+        start = time.perf_counter()
+        results = catalog.search_index.search(query, limit=limit, offset=offset)
+        record_timing('search', time.perf_counter() - start)
+        return CachedSearch(app.json.response(results.diagrams).get_data(), results.total)
+    
+    if app.config['SEARCH_CACHE_BYTES']:
+        results = search_cache.get_or_compute(search_cache_key(query, limit, offset), catalog.version, run_search)
+    else:
+        results = run_search()
+    response = app.response_class(results.body, mimetype='application/json')
+    response.headers['X-Total-Count'] = str(results.total)
+    return response
+
+@app.route('/api/suggest')
+def api_suggest():
+    """Title suggestions for a partially typed search query"""
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify([])
+    
+    limit = request.args.get('limit', app.config['SUGGEST_DEFAULT_LIMIT'], type=int)
+    limit = max(1, min(limit, app.config['SUGGEST_MAX_LIMIT']))
+    
+    start = time.perf_counter()
+    suggestions = parser.suggest(query, limit=limit)
+    record_timing('search', time.perf_counter() - start)
+    return jsonify([suggestion._asdict() for suggestion in suggestions])
+
+if app.config['METRICS_ENABLED']:
+    @app.route(app.config['METRICS_PATH'])
+    def prometheus_metrics():
+        """Metrics of this worker process in the Prometheus text format"""
+        return app.response_class(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
+if profiling:
+    def profiling_authorized():
+        authorization = request.authorization
+        return has_profiling_token(authorization.token if authorization and authorization.type == 'bearer'
+                                   else request.args.get('token'))
+    
+    @app.route(app.config['PROFILING_PATH'])
+    def list_profiles():
+        """The slowest profiled requests of this worker process, slowest first"""
+        if not profiling_authorized():
+            return jsonify({'error': 'Profiling token required'}), 403
+        return jsonify([profile.summary() for profile in profiles.profiles()])
+    
+    @app.route(f"{app.config['PROFILING_PATH']}/<int:profile_id>")
+    def show_profile(profile_id):
+        """One request profile with its cProfile report (as text with ?format=text)"""
+        if not profiling_authorized():
+            return jsonify({'error': 'Profiling token required'}), 403
+        profile = profiles.get(profile_id)
+        if profile is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        if request.args.get('format') == 'text':
+            return app.response_class(profile.report, mimetype='text/plain')
+        return jsonify(profile._asdict())
 
 @app.errorhandler(404)
 def page_not_found(e):
@@ -152,4 +853,8 @@ def internal_error(e):
                          diagrams=parser.get_all_diagrams()), 500
 
 if __name__ == '__main__':
+    # With the debug reloader this also runs in the watching parent, which
+    # must not claim the SVG cache
+    if prerenderer is not None and (not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN')):
+        prerenderer.sync(parser.catalog)
     app.run(debug=app.config['DEBUG'], port=5000)
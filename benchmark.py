@@ -0,0 +1,214 @@
+"""Benchmark the parser, catalog lookups, search and routes on synthetic catalogs.
+
+Usage:
+    python benchmark.py [--sizes 100 10000 ...] [--save FILE] [--compare FILE]
+
+Each catalog size runs in a fresh process, so peak RSS is per size. Reference
+files are generated once per size and seed under --data-dir and reused.
+--save writes the results as JSON; --compare reports the change against such
+a baseline and exits with status 1 when a timing regressed by more than
+--threshold.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.synthetic_catalog import WORDS, generate_reference_file
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+SEARCH_QUERIES = ('payment', 'user login', 'sched', 'order queue worker', 'architecture', 'zzz')
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(operation, args_list, budget: float) -> dict:
+    """Time ``operation`` over ``args_list`` (cycled) until it is exhausted or
+    ``budget`` seconds have passed, always at least once"""
+    samples = []
+    deadline = time.perf_counter() + budget
+    for args in args_list:
+        start = time.perf_counter()
+        operation(*args)
+        samples.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    total = sum(samples)
+    return {
+        'ops': len(samples),
+        'ops_per_sec': len(samples) / total if total else float('inf'),
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000
+    }
+
+
+def run_size(path: str, sections: int, budget: float, repeat: int) -> dict:
+    """Benchmarks for one catalog, run in the current process"""
+    from utils.diagram_parser import DiagramParser
+
+    results = {}
+    start = time.perf_counter()
+    parser = DiagramParser(path)
+    load_seconds = time.perf_counter() - start
+    results['load'] = {'seconds': load_seconds, 'sections_per_sec': sections / load_seconds,
+                       'diagrams': len(parser.diagrams)}
+    results['peak_rss_after_load_mb'] = peak_rss_mb()
+
+    rng = random.Random(0)
+    ids = [(rng.randint(1, sections),) for _ in range(repeat)]
+    results['get_diagram_by_id'] = measure(parser.get_diagram_by_id, ids, budget)
+    results['get_diagram_by_section'] = measure(parser.get_diagram_by_section, ids, budget)
+
+    queries = [(SEARCH_QUERIES[i % len(SEARCH_QUERIES)],) for i in range(repeat)]
+    # The first query pays for building the search index on lazily indexed catalogs
+    results['search_diagrams'] = measure(lambda q: parser.search_diagrams(q, limit=20), queries, budget)
+
+    import app as app_module
+    app_module.parser = parser
+    app_module.app.config['RELOAD_ON_CHANGE'] = False
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app_module.app.test_client()
+
+    routes = {
+        'GET /': lambda: '/',
+        'GET /diagrams': lambda: '/diagrams',
+        'GET /diagram/<id>': lambda: f'/diagram/{rng.randint(1, sections)}',
+        'GET /api/diagrams (page)': lambda: f'/api/diagrams?page={rng.randint(1, max(1, sections // 50))}',
+        'GET /api/diagrams': lambda: '/api/diagrams',
+        'GET /api/diagram/<id>': lambda: f'/api/diagram/{rng.randint(1, sections)}',
+        'GET /api/diagrams/batch': lambda: f'/api/diagrams/batch?ids={",".join(str(rng.randint(1, sections)) for _ in range(10))}',
+        'GET /api/search': lambda: f'/api/search?q={rng.choice(WORDS)}',
+        'GET /api/suggest': lambda: f'/api/suggest?q={rng.choice(WORDS)} {rng.choice(WORDS)[:3]}'
+    }
+    for name, url in routes.items():
+        def request(url):
+            response = client.get(url)
+            response.get_data()
+            assert response.status_code == 200, (url, response.status_code)
+        # The first request fills the template, fragment and index caches
+        cold = measure(request, [(url(),)], budget)
+        results[name] = measure(request, [(url(),) for _ in range(repeat)], budget)
+        results[name]['cold_ms'] = cold['p50_ms']
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def run_isolated(path: str, sections: int, budget: float, repeat: int) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), '--run', path, str(sections),
+               '--budget', str(budget), '--repeat', str(repeat)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def print_results(sections: int, results: dict, baseline: dict = None):
+    load = results['load']
+    print(f"\n{sections} sections: load {load['seconds']:.3f}s ({load['sections_per_sec']:,.0f} sections/s), "
+          f"peak RSS {results['peak_rss_after_load_mb']:.0f} MB after load, {results['peak_rss_mb']:.0f} MB total")
+    print(f"  {'benchmark':<28}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'cold ms':>10}{'vs base':>10}")
+    for name, result in results.items():
+        if not isinstance(result, dict) or 'p50_ms' not in result:
+            continue
+        change = ''
+        if baseline and name in baseline:
+            change = f"{result['p50_ms'] / baseline[name]['p50_ms']:.2f}x" if baseline[name]['p50_ms'] else ''
+        cold = f"{result['cold_ms']:.2f}" if 'cold_ms' in result else ''
+        print(f"  {name:<28}{result['ops_per_sec']:>12,.0f}{result['p50_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{cold:>10}{change:>10}")
+
+
+def regressions(sections: int, results: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    if results['load']['seconds'] > baseline['load']['seconds'] * threshold:
+        found.append(f"{sections}: load {baseline['load']['seconds']:.3f}s -> {results['load']['seconds']:.3f}s")
+    for name, result in results.items():
+        if isinstance(result, dict) and 'p50_ms' in result and name in baseline:
+            before = baseline[name]['p50_ms']
+            if before and result['p50_ms'] > before * threshold:
+                found.append(f"{sections}: {name} p50 {before:.3f}ms -> {result['p50_ms']:.3f}ms")
+    return found
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Benchmark the diagram viewer on synthetic catalogs')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help='catalog sizes in sections (default: %(default)s)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='generator seed (default: %(default)s)')
+    arg_parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'),
+                            help='where generated reference files are kept (default: %(default)s)')
+    arg_parser.add_argument('--budget', type=float, default=2.0,
+                            help='time limit per benchmark in seconds (default: %(default)s)')
+    arg_parser.add_argument('--repeat', type=int, default=1000,
+                            help='maximum operations per benchmark (default: %(default)s)')
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    arg_parser.add_argument('--compare', help='baseline JSON file to compare against')
+    arg_parser.add_argument('--threshold', type=float, default=1.25,
+                            help='slowdown factor reported as a regression (default: %(default)s)')
+    arg_parser.add_argument('--run', nargs=2, metavar=('FILE', 'SECTIONS'), help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.run:
+        results = run_size(args.run[0], int(args.run[1]), args.budget, args.repeat)
+        print(json.dumps(results))
+        return 0
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    all_results = {}
+    found = []
+    for sections in args.sizes:
+        path = os.path.join(args.data_dir, f'synthetic_{sections}_{args.seed}.txt')
+        if not os.path.exists(path):
+            print(f"Generating {path}...")
+            generate_reference_file(path, sections, args.seed)
+        results = run_isolated(path, sections, args.budget, args.repeat)
+        all_results[str(sections)] = results
+        size_baseline = baseline.get(str(sections))
+        print_results(sections, results, size_baseline)
+        if size_baseline:
+            found.extend(regressions(sections, results, size_baseline, args.threshold))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'results': all_results
+            }, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if found:
+        print(f"\nRegressions (slower than {args.threshold}x the baseline):")
+        for line in found:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,10 +7,131 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     MESSAGE = "Mermaid Diagram Viewer"
     
-    # Diagram configuration
+    # Diagram configuration. DIAGRAM_FILE may also name a directory (every *.txt
+    # file in it is loaded) or a glob pattern such as 'static/data/mermaid_*.txt'.
+    # Multiple files are parsed in parallel by up to PARSE_WORKERS processes
+    # (None uses every CPU).
     DIAGRAM_FILE = 'static/data/mermaid_ref.txt'
+    PARSE_WORKERS = None
+    
+    # Optional precompiled bundle (see utils/build_bundle.py). When set, workers
+    # memory-map it instead of parsing DIAGRAM_FILE, and it is rebuilt
+    # automatically whenever it no longer matches the source files: by one
+    # process at a time, holding DIAGRAM_BUNDLE.lock, the others mapping the
+    # bundle it wrote.
+    DIAGRAM_BUNDLE = os.environ.get('DIAGRAM_BUNDLE')
     DIAGRAM_TYPES = ['architecture', 'schema', 'flow', 'sequence', 'erDiagram', 'stateDiagram']
     
+    # /api/export keeps the byte layout of recent exports (a few bytes per
+    # diagram) so that range requests can seek into them
+    EXPORT_LAYOUT_CACHE_BYTES = 32 * 1024 * 1024
+    
+    # Search settings
+    SEARCH_DEFAULT_LIMIT = 20
+    SEARCH_MAX_LIMIT = 100
+    # Serialized /api/search result pages, keyed by the query's tokens, are kept
+    # for SEARCH_CACHE_TTL seconds within SEARCH_CACHE_BYTES; 0 disables the cache
+    SEARCH_CACHE_BYTES = 16 * 1024 * 1024
+    SEARCH_CACHE_TTL = 300
+    SUGGEST_DEFAULT_LIMIT = 8
+    SUGGEST_MAX_LIMIT = 20
+    
+    # /api/diagrams pagination
+    API_DEFAULT_PER_PAGE = 50
+    API_MAX_PER_PAGE = 500
+    # Most diagrams fetched by one /api/diagrams/batch request
+    API_MAX_BATCH_IDS = 100
+    
+    # Reload DIAGRAM_FILE when it changes on disk. The check is a stat call made
+    # at most every RELOAD_CHECK_INTERVAL seconds, either on incoming requests or
+    # from a background thread when RELOAD_WATCHER is enabled.
+    RELOAD_ON_CHANGE = True
+    RELOAD_CHECK_INTERVAL = 2.0
+    RELOAD_WATCHER = False
+    
+    # HTTP caching. Catalog pages and API responses carry ETags derived from the
+    # catalog version and are answered with 304 Not Modified when the client's
+    # copy is current; these set their Cache-Control headers.
+    CACHE_CONTROL_PAGES = 'no-cache'
+    CACHE_CONTROL_API = 'no-cache'
+    
+    # Compressed responses (gzip, and brotli when the package is installed) for
+    # the list and search endpoints, cached per catalog version within a total
+    # budget of COMPRESSION_CACHE_BYTES. Bodies larger than
+    # RESPONSE_CACHE_MAX_BYTES once compressed are sent without being cached;
+    # range requests are passed through uncompressed.
+    COMPRESSION_ENABLED = True
+    COMPRESSION_CACHE_BYTES = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    
+    # Leave diagram bodies out of catalog pages: mermaid-loader.js fetches each
+    # one from /api/diagram/<id> and renders it when it scrolls into view
+    LAZY_RENDERING = True
+    
+    # On diagram pages, prefetch the previous and next diagrams and switch to
+    # them client-side instead of loading a new page
+    PREFETCH_NAVIGATION = True
+    
+    # Server-side rendering. Diagrams are rendered to SVG by SVG_RENDERER: 'mmdc'
+    # (the mermaid CLI, SVG_RENDERER_COMMAND), 'stub' for tests, 'auto' for mmdc
+    # when it is installed, or 'none'. SVG_RENDER_WORKERS background threads
+    # render every diagram of a new catalog into SVG_CACHE_DIR, keyed by a hash
+    # of the source, and /diagram/<id>.svg serves them. Until a diagram's SVG is
+    # cached, pages render it in the browser. The cache is pruned of its least
+    # recently used SVGs beyond SVG_CACHE_MAX_BYTES, and diagrams that failed to
+    # render are retried after SVG_RENDER_RETRY_SECONDS, then at doubling intervals.
+    SVG_RENDERER = os.environ.get('SVG_RENDERER', 'auto')
+    SVG_RENDERER_COMMAND = os.environ.get('SVG_RENDERER_COMMAND', 'mmdc')
+    SVG_RENDERER_PUPPETEER_CONFIG = os.environ.get('PUPPETEER_CONFIG')
+    SVG_RENDER_TIMEOUT = 30
+    SVG_RENDER_WORKERS = 2
+    SVG_RENDER_RETRY_SECONDS = 60
+    SVG_CACHE_DIR = os.environ.get('SVG_CACHE_DIR', 'svg_cache')
+    SVG_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    
+    # Rendered template fragments that list the whole catalog (navbar quick
+    # links, the diagram table, related diagrams), cached per catalog version
+    # within FRAGMENT_CACHE_BYTES; 0 disables the cache. FRAGMENT_CACHE_VERIFY
+    # renders every cached fragment again and fails the request if it changed
+    # (for tests: a fragment must not read page data missing from its key).
+    FRAGMENT_CACHE_BYTES = 64 * 1024 * 1024
+    FRAGMENT_CACHE_VERIFY = False
+    
+    # Observability. Request latency, template render, JSON serialization and
+    # search times, catalog reloads and cache counters are exported in the
+    # Prometheus text format at METRICS_PATH (per worker process). Requests are
+    # logged as JSON lines: every server error and every request slower than
+    # LOG_SLOW_REQUEST_MS, plus a LOG_REQUEST_SAMPLE_RATE fraction of the rest.
+    METRICS_ENABLED = True
+    METRICS_PATH = '/metrics'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_REQUEST_SAMPLE_RATE = 0.01
+    LOG_SLOW_REQUEST_MS = 500
+    
+    # Per-request profiling (per worker process; needs PROFILING_TOKEN). A
+    # request carrying the token in an X-Profile header or a profile= query
+    # parameter runs under cProfile, and so does a PROFILING_SAMPLE_RATE fraction
+    # of all requests, kept only when slower than PROFILING_THRESHOLD_MS. The
+    # PROFILING_KEEP slowest profiles are served at PROFILING_PATH to clients
+    # sending the token as a bearer token.
+    PROFILING_ENABLED = False
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_SAMPLE_RATE = 0.0
+    PROFILING_THRESHOLD_MS = 500
+    PROFILING_KEEP = 20
+    PROFILING_PATH = '/admin/profiles'
+    
+    # Production serving (gunicorn.conf.py). With SERVER_PRELOAD the catalog is
+    # loaded once in the gunicorn master and shared copy-on-write by the
+    # SERVER_WORKERS worker processes, each serving SERVER_THREADS requests at a
+    # time. Serving from DIAGRAM_BUNDLE keeps the diagrams themselves in the
+    # page cache, shared by every worker. A worker that reloads the catalog
+    # after a change gets a private copy of the new one.
+    SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+    SERVER_TIMEOUT = 30
+    SERVER_PRELOAD = True
+    
     # App settings
     APP_NAME = "Mermaid Diagram Viewer"
     DEBUG = True
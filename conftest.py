@@ -0,0 +1,61 @@
+import pytest
+
+from utils.catalog import DiagramRecord
+
+# A small reference file: a line of prose, then three numbered diagram sections
+REFERENCE = """Architecture notes
+
+1. System Overview
+
+graph TD
+    A --> B
+
+2. Login Flow
+
+sequenceDiagram
+    A->>B: hi
+
+3. Orders
+
+erDiagram
+    CUSTOMER ||--o{ ORDER : places
+"""
+
+
+@pytest.fixture
+def reference():
+    return REFERENCE
+
+
+@pytest.fixture
+def write_reference(tmp_path):
+    """Write a reference file (REFERENCE unless ``text`` is given) and return its path"""
+    def write(text=REFERENCE, name='diagrams.txt', directory=None):
+        path = (directory or tmp_path) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def make_record():
+    """Build a DiagramRecord; the section defaults to the id"""
+    def make(diagram_id, title=None, content='graph TD\n    A --> B', diagram_type='graph', section=None):
+        return DiagramRecord(diagram_id, title or f'Diagram {diagram_id}', content, diagram_type,
+                             diagram_id if section is None else section, 'diagrams.txt')
+    return make
+
+
+@pytest.fixture
+def source(write_reference):
+    return write_reference()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Imported here: loading the app loads the configured catalog
+    from app import app
+    # Fail any page whose cached fragments depend on more than their keys
+    monkeypatch.setattr(app.jinja_env, 'fragment_cache_verify', True)
+    return app.test_client()
@@ -0,0 +1,45 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py app:app
+
+With SERVER_PRELOAD the app, and with it the diagram catalog, is loaded once
+in the master and shared copy-on-write by the forked workers instead of being
+parsed again by each of them.
+"""
+import gc
+import os
+
+from config import Config
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = Config.SERVER_TIMEOUT
+preload_app = Config.SERVER_PRELOAD
+
+if preload_app:
+    # No collections while the catalog is built: freed objects would leave
+    # holes in pages the workers share, and later get reused and dirtied
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from app import parser
+        parser.prepare_for_fork()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Move everything allocated so far out of the collector's reach, so
+        # collections in the workers never write to the shared pages
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    # Prerender the catalog's SVGs from the workers, never the master: one
+    # worker wins the cache directory's lock and does it. Without preload this
+    # loads the app in the worker a little earlier than gunicorn would.
+    from app import parser, prerenderer
+    if prerenderer is not None:
+        prerenderer.sync(parser.catalog)
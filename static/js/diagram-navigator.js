@@ -0,0 +1,246 @@
+/**
+ * Diagram Navigator
+ * Previous/next navigation on diagram pages without full page loads
+ *
+ * The neighbors of the current diagram are fetched with one /api/diagrams/batch
+ * request while the browser is idle, along with the ids of their own neighbors
+ * (ids are not contiguous across the files of a multi-file catalog). Following a link to a diagram that has
+ * been fetched swaps it into the page and updates the URL with the History
+ * API; any other link is an ordinary page load.
+ */
+
+const TYPE_BADGES = {
+    graph: ['bg-success', 'Flowchart'],
+    sequence: ['bg-info', 'Sequence Diagram'],
+    er: ['bg-warning', 'ER Diagram'],
+    state: ['bg-danger', 'State Diagram']
+};
+
+class DiagramNavigator {
+    constructor(navigation) {
+        this.navigation = navigation;
+        this.previousLink = document.getElementById('previous-diagram-link');
+        this.nextLink = document.getElementById('next-diagram-link');
+        this.related = document.getElementById('related-diagrams');
+        this.relatedStyle = document.getElementById('related-current-style');
+        this.container = document.getElementById('mermaid-diagram');
+
+        // Fetched diagrams by id, least recently used first
+        this.cache = new Map();
+        this.maxCached = 20;
+        this.prefetchController = null;
+        this.renderSequence = 0;
+
+        this.current = this.readCurrentDiagram();
+        this.titleSuffix = document.title.substring(this.current.title.length);
+        this.remember(this.current);
+
+        [this.previousLink, this.nextLink].forEach(link => {
+            link.addEventListener('click', (event) => this.follow(event, this.linkedId(link)));
+        });
+        this.related.addEventListener('click', (event) => {
+            const link = event.target.closest('a[data-diagram-id]');
+            if (link) {
+                this.follow(event, Number(link.dataset.diagramId));
+            }
+        });
+        window.addEventListener('popstate', (event) => {
+            const diagramId = event.state && event.state.diagramId;
+            if (diagramId && this.cache.has(diagramId)) {
+                this.show(this.cache.get(diagramId));
+            } else if (diagramId) {
+                window.location.reload();
+            }
+        });
+
+        history.replaceState({ diagramId: this.current.id }, '', window.location.href);
+        this.schedulePrefetch();
+    }
+
+    readCurrentDiagram() {
+        const optionalId = (value) => value ? Number(value) : null;
+        return {
+            id: Number(this.navigation.dataset.diagramId),
+            previousId: optionalId(this.navigation.dataset.previousId),
+            nextId: optionalId(this.navigation.dataset.nextId),
+            title: document.getElementById('diagram-title').textContent,
+            type: this.navigation.dataset.diagramType,
+            section: Number(document.getElementById('info-section').textContent),
+            source: document.getElementById('info-source').textContent || null,
+            content: document.getElementById('mermaid-code').textContent
+        };
+    }
+
+    linkedId(link) {
+        return Number(link.getAttribute('href').split('/').pop());
+    }
+
+    remember(diagram) {
+        this.cache.delete(diagram.id);
+        this.cache.set(diagram.id, diagram);
+        if (this.cache.size > this.maxCached) {
+            this.cache.delete(this.cache.keys().next().value);
+        }
+    }
+
+    follow(event, diagramId) {
+        // Leave new-tab and new-window clicks to the browser
+        if (event.button !== 0 || event.ctrlKey || event.metaKey || event.shiftKey || event.altKey) {
+            return;
+        }
+        const diagram = this.cache.get(diagramId);
+        if (!diagram) {
+            return;
+        }
+        event.preventDefault();
+        this.remember(diagram);
+        history.pushState({ diagramId }, '', `/diagram/${diagramId}`);
+        this.show(diagram);
+    }
+
+    schedulePrefetch() {
+        const whenIdle = window.requestIdleCallback || ((callback) => setTimeout(callback, 200));
+        whenIdle(() => this.prefetch());
+    }
+
+    async prefetch() {
+        const ids = [this.current.previousId, this.current.nextId]
+            .filter(id => id !== null && !this.cache.has(id));
+        if (!ids.length) {
+            return;
+        }
+
+        if (this.prefetchController) {
+            this.prefetchController.abort();
+        }
+        const controller = new AbortController();
+        this.prefetchController = controller;
+        try {
+            const response = await fetch(`/api/diagrams/batch?ids=${ids.join(',')}&neighbors=1`,
+                                         { signal: controller.signal });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const batch = await response.json();
+            batch.diagrams.forEach(({ previous_id, next_id, ...diagram }) => {
+                this.remember({ ...diagram, previousId: previous_id, nextId: next_id });
+            });
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Error prefetching diagrams:', error);
+            }
+        } finally {
+            if (this.prefetchController === controller) {
+                this.prefetchController = null;
+            }
+        }
+    }
+
+    show(diagram) {
+        const previous = this.current;
+        this.current = diagram;
+
+        document.title = diagram.title + this.titleSuffix;
+        document.getElementById('diagram-title').textContent = diagram.title;
+        const [badgeClass, badgeLabel] = TYPE_BADGES[diagram.type] || ['bg-secondary', diagram.type];
+        const typeBadge = document.getElementById('diagram-badges').firstElementChild;
+        typeBadge.className = `badge ${badgeClass}`;
+        typeBadge.textContent = badgeLabel;
+        document.getElementById('diagram-section-badge').textContent = `Section ${diagram.section}`;
+
+        document.getElementById('info-id').textContent = diagram.id;
+        document.getElementById('info-type').textContent = diagram.type;
+        document.getElementById('info-section').textContent = diagram.section;
+        document.getElementById('info-source').textContent = diagram.source || '';
+        document.getElementById('info-source-row').style.display = diagram.source ? '' : 'none';
+        document.getElementById('info-chars').textContent = [...diagram.content].length;
+        document.getElementById('info-lines').textContent = diagram.content.split('\n').length;
+        document.getElementById('mermaid-code').textContent = diagram.content;
+
+        this.navigation.dataset.diagramId = diagram.id;
+        this.navigation.dataset.diagramType = diagram.type;
+        this.navigation.dataset.previousId = diagram.previousId ?? '';
+        this.navigation.dataset.nextId = diagram.nextId ?? '';
+        this.updateLink(this.previousLink, diagram.previousId);
+        this.updateLink(this.nextLink, diagram.nextId);
+        this.relatedStyle.textContent =
+            `#related-diagrams [data-diagram-id="${diagram.id}"] { display: none !important; }`;
+        if (diagram.type !== previous.type) {
+            this.loadRelated(diagram.type);
+        }
+
+        this.render(diagram);
+        this.schedulePrefetch();
+    }
+
+    updateLink(link, diagramId) {
+        if (diagramId === null) {
+            link.style.display = 'none';
+            return;
+        }
+        link.href = `/diagram/${diagramId}`;
+        link.querySelector('.badge').textContent = diagramId;
+        link.style.display = '';
+    }
+
+    async loadRelated(diagramType) {
+        try {
+            const response = await fetch(`/api/diagrams?type=${encodeURIComponent(diagramType)}&fields=id,title`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const diagrams = await response.json();
+            if (this.current.type !== diagramType) {
+                return;
+            }
+            this.related.replaceChildren(...diagrams.map(diagram => {
+                const link = document.createElement('a');
+                link.href = `/diagram/${diagram.id}`;
+                link.dataset.diagramId = diagram.id;
+                link.className = 'list-group-item list-group-item-action';
+                const title = document.createElement('small');
+                title.textContent = diagram.title;
+                link.appendChild(title);
+                return link;
+            }));
+        } catch (error) {
+            console.error('Error loading related diagrams:', error);
+        }
+    }
+
+    async render(diagram) {
+        const sequence = ++this.renderSequence;
+        let svg = window.mermaidLoader ? await window.mermaidLoader.fetchPrerenderedSvg(diagram.id) : null;
+        if (svg === null && typeof mermaid === 'undefined') {
+            this.container.textContent = diagram.content;
+            return;
+        }
+        try {
+            if (svg === null) {
+                svg = (await mermaid.render(`mermaid-navigated-${diagram.id}-${sequence}`, diagram.content)).svg;
+            }
+            // A later navigation may have finished first
+            if (sequence === this.renderSequence) {
+                this.container.innerHTML = svg;
+            }
+        } catch (error) {
+            console.error(`Failed to render diagram ${diagram.id}:`, error);
+            if (sequence === this.renderSequence) {
+                this.container.textContent = diagram.content;
+            }
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const navigation = document.getElementById('diagram-navigation');
+    // Error pages show a placeholder diagram with id 0
+    if (navigation && navigation.dataset.diagramId !== '0') {
+        window.diagramNavigator = new DiagramNavigator(navigation);
+    }
+});
+
+// Export for module usage
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = DiagramNavigator;
+}
@@ -1,6 +1,13 @@
 /**
  * Mermaid Diagram Loader
  * Handles dynamic loading and rendering of Mermaid diagrams
+ *
+ * Lazy placeholders (<div data-mermaid-lazy data-diagram-id="...">) carry no
+ * diagram source: it is fetched from /api/diagram/<id> when the placeholder
+ * scrolls into view, and rendered through a bounded queue.
+ *
+ * When the server renders diagrams (<body data-svg-prerendering>), the SVG it
+ * has cached at /diagram/<id>.svg is used instead of rendering in the browser.
  */
 
 class MermaidLoader {
@@ -9,6 +16,20 @@ class MermaidLoader {
         this.diagrams = [];
         this.currentTheme = 'default';
         this.zoomLevel = 1;
+
+        // Lazy rendering
+        this.lazyObserver = null;
+        this.lazyElements = new Set();
+        this.renderQueue = [];
+        this.activeRenders = 0;
+        this.maxConcurrentRenders = 2;
+        this.maxQueuedRenders = 32;
+        // Rendered SVGs keyed by theme and diagram id, least recently used first
+        this.svgCache = new Map();
+        this.maxCachedSvgs = 100;
+        this.renderSequence = 0;
+        // Theme of the SVGs rendered by the server
+        this.prerenderedTheme = 'default';
     }
 
     initialize() {
@@ -58,6 +79,7 @@ class MermaidLoader {
 
             this.initialized = true;
             this.renderAllDiagrams();
+            this.setupLazyRendering();
             this.setupEventListeners();
             
             console.log('MermaidLoader initialized');
@@ -71,7 +93,8 @@ class MermaidLoader {
     renderAllDiagrams() {
         if (!this.initialized) return;
 
-        const diagramElements = document.querySelectorAll('.mermaid-preview, .mermaid-container .mermaid');
+        const diagramElements = document.querySelectorAll(
+            '.mermaid-preview:not([data-mermaid-lazy]), .mermaid-container .mermaid:not([data-mermaid-lazy])');
         diagramElements.forEach((element, index) => {
             this.renderDiagram(element, index);
         });
@@ -120,6 +143,136 @@ class MermaidLoader {
         }
     }
 
+    setupLazyRendering() {
+        if ('IntersectionObserver' in window) {
+            this.lazyObserver = new IntersectionObserver((entries) => {
+                entries.forEach((entry) => {
+                    if (entry.isIntersecting) {
+                        this.lazyObserver.unobserve(entry.target);
+                        this.enqueueRender(entry.target);
+                    }
+                });
+            }, { rootMargin: '200px 0px' });
+        }
+        this.observeLazyDiagrams(document);
+    }
+
+    observeLazyDiagrams(root) {
+        const placeholders = root.querySelectorAll ? Array.from(root.querySelectorAll('[data-mermaid-lazy]')) : [];
+        if (root.hasAttribute && root.hasAttribute('data-mermaid-lazy')) {
+            placeholders.push(root);
+        }
+        placeholders.forEach(element => this.observeLazyDiagram(element));
+    }
+
+    observeLazyDiagram(element) {
+        if (this.lazyObserver) {
+            this.lazyObserver.observe(element);
+        } else {
+            // No IntersectionObserver: render everything, still through the queue
+            this.enqueueRender(element);
+        }
+    }
+
+    enqueueRender(element) {
+        if (element.dataset.mermaidState === 'queued') return;
+        element.dataset.mermaidState = 'queued';
+        this.renderQueue.push(element);
+
+        if (this.lazyObserver && this.renderQueue.length > this.maxQueuedRenders) {
+            // Scrolling faster than we render: drop the oldest request, which is
+            // the most likely to be off screen again, and wait for it to reappear
+            const dropped = this.renderQueue.shift();
+            delete dropped.dataset.mermaidState;
+            this.lazyObserver.observe(dropped);
+        }
+        this.drainRenderQueue();
+    }
+
+    drainRenderQueue() {
+        while (this.activeRenders < this.maxConcurrentRenders && this.renderQueue.length > 0) {
+            const element = this.renderQueue.shift();
+            this.activeRenders++;
+            this.renderLazyDiagram(element)
+                .catch((error) => {
+                    console.error(`Failed to render diagram ${element.dataset.diagramId}:`, error);
+                    element.dataset.mermaidState = 'error';
+                    element.innerHTML = `
+                        <div class="alert alert-danger">
+                            <strong>Error rendering diagram:</strong><br>
+                            ${error.message}
+                        </div>
+                    `;
+                })
+                .finally(() => {
+                    this.activeRenders--;
+                    this.drainRenderQueue();
+                });
+        }
+    }
+
+    async fetchPrerenderedSvg(diagramId) {
+        // Returns null when the server has not rendered the diagram (yet)
+        if (!document.body.hasAttribute('data-svg-prerendering') || this.currentTheme !== this.prerenderedTheme) {
+            return null;
+        }
+        try {
+            const response = await fetch(`/diagram/${diagramId}.svg`);
+            return response.ok ? await response.text() : null;
+        } catch (error) {
+            console.warn(`Error fetching the SVG of diagram ${diagramId}:`, error);
+            return null;
+        }
+    }
+
+    async fetchDiagramSource(diagramId) {
+        const response = await fetch(`/api/diagram/${diagramId}`);
+        if (!response.ok) {
+            throw new Error(`Diagram ${diagramId} could not be loaded (HTTP ${response.status})`);
+        }
+        const diagram = await response.json();
+        return diagram.content;
+    }
+
+    async renderLazyDiagram(element) {
+        const diagramId = element.dataset.diagramId;
+        const theme = this.currentTheme;
+        const cacheKey = `${theme}:${diagramId}`;
+
+        let svg = this.svgCache.get(cacheKey);
+        if (svg !== undefined) {
+            this.svgCache.delete(cacheKey);
+        } else {
+            svg = await this.fetchPrerenderedSvg(diagramId);
+        }
+        if (svg === null) {
+            if (element.mermaidSource === undefined) {
+                element.mermaidSource = await this.fetchDiagramSource(diagramId);
+            }
+            const result = await mermaid.render(`mermaid-lazy-${diagramId}-${this.renderSequence++}`,
+                                                element.mermaidSource);
+            svg = typeof result === 'string' ? result : result.svg;
+        }
+        this.svgCache.set(cacheKey, svg);
+        if (this.svgCache.size > this.maxCachedSvgs) {
+            this.svgCache.delete(this.svgCache.keys().next().value);
+        }
+
+        element.innerHTML = svg;
+        element.dataset.mermaidState = 'rendered';
+        this.lazyElements.add(element);
+        this.applyZoom(element);
+        element.dispatchEvent(new CustomEvent('mermaid-rendered', {
+            detail: { id: diagramId }
+        }));
+
+        if (theme !== this.currentTheme) {
+            // The theme was switched while this diagram was rendering
+            delete element.dataset.mermaidState;
+            this.observeLazyDiagram(element);
+        }
+    }
+
     setupEventListeners() {
         // Theme switcher (if any theme buttons exist)
         document.querySelectorAll('[data-mermaid-theme]').forEach(button => {
@@ -135,8 +288,9 @@ class MermaidLoader {
                 if (mutation.type === 'childList') {
                     mutation.addedNodes.forEach((node) => {
                         if (node.nodeType === 1) { // Element node
+                            this.observeLazyDiagrams(node);
                             const mermaidElements = node.querySelectorAll ? 
-                                node.querySelectorAll('.mermaid') : [];
+                                node.querySelectorAll('.mermaid:not([data-mermaid-lazy])') : [];
                             mermaidElements.forEach((element, index) => {
                                 this.renderDiagram(element, this.diagrams.length + index);
                             });
@@ -174,6 +328,15 @@ class MermaidLoader {
                 });
             });
 
+            // Lazy diagrams are re-rendered once visible, from the cache when
+            // they were already shown in this theme
+            this.lazyElements.forEach(element => {
+                if (element.dataset.mermaidState === 'rendered') {
+                    delete element.dataset.mermaidState;
+                    this.observeLazyDiagram(element);
+                }
+            });
+
             // Update theme buttons
             document.querySelectorAll('[data-mermaid-theme]').forEach(button => {
                 if (button.dataset.mermaidTheme === theme) {
@@ -215,6 +378,9 @@ class MermaidLoader {
         this.diagrams.forEach(diagram => {
             this.applyZoom(diagram.element);
         });
+        this.lazyElements.forEach(element => {
+            this.applyZoom(element);
+        });
     }
 
     exportDiagram(diagramId, format = 'svg') {
@@ -0,0 +1,143 @@
+/**
+ * Search Suggestions
+ * Autocomplete for search inputs marked with data-suggest, backed by /api/suggest
+ *
+ * Requests are sent once typing pauses, and a request still in flight is
+ * aborted when the query changes, so stale suggestions never replace newer ones.
+ */
+
+class SearchSuggest {
+    constructor(input, { delay = 150, limit = 8 } = {}) {
+        this.input = input;
+        this.delay = delay;
+        this.limit = limit;
+        this.timer = null;
+        this.controller = null;
+        this.lastQuery = '';
+        this.activeIndex = -1;
+
+        this.menu = document.createElement('ul');
+        this.menu.className = 'dropdown-menu search-suggestions';
+        this.menu.setAttribute('role', 'listbox');
+        this.input.parentElement.classList.add('position-relative');
+        this.input.after(this.menu);
+        this.input.setAttribute('autocomplete', 'off');
+
+        this.input.addEventListener('input', () => this.schedule());
+        this.input.addEventListener('keydown', (event) => this.handleKey(event));
+        this.input.addEventListener('blur', () => setTimeout(() => this.hide(), 150));
+        if (this.input.form) {
+            this.input.form.addEventListener('submit', (event) => this.handleSubmit(event));
+        }
+    }
+
+    schedule() {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.fetchSuggestions(), this.delay);
+    }
+
+    async fetchSuggestions() {
+        const query = this.input.value.trim();
+        if (query === this.lastQuery) {
+            return;
+        }
+        this.lastQuery = query;
+
+        if (this.controller) {
+            this.controller.abort();
+            this.controller = null;
+        }
+        if (!query) {
+            this.hide();
+            return;
+        }
+
+        const controller = new AbortController();
+        this.controller = controller;
+        try {
+            const response = await fetch(`/api/suggest?q=${encodeURIComponent(query)}&limit=${this.limit}`,
+                                         { signal: controller.signal });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            this.show(await response.json());
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Error fetching suggestions:', error);
+            }
+        } finally {
+            if (this.controller === controller) {
+                this.controller = null;
+            }
+        }
+    }
+
+    show(suggestions) {
+        this.menu.replaceChildren(...suggestions.map(suggestion => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.className = 'dropdown-item text-truncate';
+            link.href = `/diagram/${suggestion.id}`;
+            link.textContent = suggestion.title;
+            // Navigate before the input's blur hides the menu
+            link.addEventListener('mousedown', (event) => event.preventDefault());
+            item.appendChild(link);
+            return item;
+        }));
+        this.activeIndex = -1;
+        this.menu.classList.toggle('show', suggestions.length > 0);
+    }
+
+    hide() {
+        this.menu.classList.remove('show');
+        this.activeIndex = -1;
+    }
+
+    links() {
+        return Array.from(this.menu.querySelectorAll('a'));
+    }
+
+    setActive(index) {
+        const links = this.links();
+        if (!links.length) {
+            return;
+        }
+        this.activeIndex = (index + links.length) % links.length;
+        links.forEach((link, i) => link.classList.toggle('active', i === this.activeIndex));
+    }
+
+    handleKey(event) {
+        if (!this.menu.classList.contains('show')) {
+            return;
+        }
+        if (event.key === 'ArrowDown') {
+            event.preventDefault();
+            this.setActive(this.activeIndex + 1);
+        } else if (event.key === 'ArrowUp') {
+            event.preventDefault();
+            this.setActive(this.activeIndex - 1);
+        } else if (event.key === 'Enter' && this.activeIndex >= 0) {
+            event.preventDefault();
+            window.location.href = this.links()[this.activeIndex].href;
+        } else if (event.key === 'Escape') {
+            this.hide();
+        }
+    }
+
+    handleSubmit(event) {
+        // Open the highlighted suggestion; otherwise submit to the results page
+        if (this.menu.classList.contains('show') && this.activeIndex >= 0) {
+            event.preventDefault();
+            window.location.href = this.links()[this.activeIndex].href;
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('input[data-suggest]').forEach(input => new SearchSuggest(input));
+});
+
+// Export for module usage
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = SearchSuggest;
+}
@@ -0,0 +1,102 @@
+import json
+
+from app import app, parser
+from utils.streaming import json_array_chunks, ndjson_chunks
+
+
+def all_ids():
+    return [diagram.id for diagram in parser.get_all_diagrams()]
+
+
+def test_pagination_headers(client):
+    total = len(all_ids())
+    response = client.get('/api/diagrams?page=2&per_page=3&fields=id')
+    assert response.status_code == 200
+    assert response.get_json() == [{'id': diagram_id} for diagram_id in all_ids()[3:6]]
+    assert response.headers['X-Total-Count'] == str(total)
+    links = dict(reversed(part.split('; ')) for part in response.headers['Link'].split(', '))
+    last_page = -(-total // 3)
+    assert links['rel="first"'] == '</api/diagrams?page=1&per_page=3&fields=id>'
+    assert links['rel="prev"'] == '</api/diagrams?page=1&per_page=3&fields=id>'
+    assert links['rel="next"'] == '</api/diagrams?page=3&per_page=3&fields=id>'
+    assert links['rel="last"'] == f'</api/diagrams?page={last_page}&per_page=3&fields=id>'
+
+
+def test_pagination_bounds(client):
+    first = client.get('/api/diagrams?page=1&per_page=3')
+    assert 'rel="prev"' not in first.headers['Link']
+    # Out of range pages are empty, nonsensical values are clamped
+    assert client.get('/api/diagrams?page=1000&per_page=3').get_json() == []
+    assert client.get('/api/diagrams?page=-4&per_page=3').get_json() == first.get_json()
+    assert len(client.get('/api/diagrams?per_page=0').get_json()) == 1
+    capped = client.get(f"/api/diagrams?per_page={app.config['API_MAX_PER_PAGE'] + 1}")
+    assert len(capped.get_json()) == min(len(all_ids()), app.config['API_MAX_PER_PAGE'])
+    # Page only: API_DEFAULT_PER_PAGE
+    assert len(client.get('/api/diagrams?page=1').get_json()) == min(len(all_ids()),
+                                                                     app.config['API_DEFAULT_PER_PAGE'])
+
+
+def test_fields_and_type_filter(client):
+    diagrams = client.get('/api/diagrams?fields=id,type&type=graph').get_json()
+    assert diagrams and all(set(diagram) == {'id', 'type'} and diagram['type'] == 'graph' for diagram in diagrams)
+    response = client.get('/api/diagrams?fields=id,secret')
+    assert response.status_code == 400
+    assert 'secret' in response.get_json()['error']
+
+
+def test_json_array_and_ndjson_streams(client):
+    array_response = client.get('/api/diagrams')
+    ndjson_response = client.get('/api/diagrams?format=ndjson')
+    assert array_response.is_streamed and ndjson_response.is_streamed
+    assert array_response.mimetype == 'application/json'
+    assert ndjson_response.mimetype == 'application/x-ndjson'
+    diagrams = array_response.get_json()
+    assert [diagram['id'] for diagram in diagrams] == all_ids()
+    assert [json.loads(line) for line in ndjson_response.data.decode('utf-8').splitlines()] == diagrams
+
+
+def test_stream_chunking():
+    items = [{'n': n} for n in range(5)]
+    chunks = list(json_array_chunks(items, json.dumps, batch_size=2))
+    assert json.loads(''.join(chunks)) == items
+    assert len(chunks) == 5  # '[', three batches, ']'
+    assert ''.join(json_array_chunks([], json.dumps)) == '[]'
+    lines = ''.join(ndjson_chunks(items, json.dumps, batch_size=2)).splitlines()
+    assert [json.loads(line) for line in lines] == items
+
+
+def test_batch_order_missing_and_neighbors(client):
+    ids = all_ids()
+    missing_id = max(ids) + 1
+    query = f'{ids[1]},{ids[0]},{missing_id},{ids[1]}&ids={ids[-1]}'
+    body = client.get(f'/api/diagrams/batch?ids={query}&fields=id&neighbors=1').get_json()
+    # Requested order, duplicates dropped, neighbors null at the ends
+    assert body['diagrams'] == [
+        {'id': ids[1], 'previous_id': ids[0], 'next_id': ids[2] if len(ids) > 2 else None},
+        {'id': ids[0], 'previous_id': None, 'next_id': ids[1]},
+        {'id': ids[-1], 'previous_id': ids[-2], 'next_id': None},
+    ]
+    assert body['missing'] == [missing_id]
+    assert 'previous_id' not in client.get(f'/api/diagrams/batch?ids={ids[0]}').get_json()['diagrams'][0]
+
+
+def test_batch_rejects_bad_ids(client):
+    limit = app.config['API_MAX_BATCH_IDS']
+    assert client.get('/api/diagrams/batch?ids=1,x').status_code == 400
+    assert client.get('/api/diagrams/batch').status_code == 400
+    too_many = ','.join(map(str, range(1, limit + 2)))
+    response = client.get(f'/api/diagrams/batch?ids={too_many}')
+    assert response.status_code == 400 and 'Too many' in response.get_json()['error']
+    # Duplicates count once against the limit
+    assert client.get(f"/api/diagrams/batch?ids={','.join(['1'] * (limit + 1))}").status_code == 200
+
+
+def test_batch_post(client):
+    ids = all_ids()[:2]
+    expected = client.get(f"/api/diagrams/batch?ids={ids[0]},{ids[1]}&fields=id,title").get_json()
+    as_json = client.post('/api/diagrams/batch', json={'ids': ids, 'fields': ['id', 'title']})
+    assert as_json.get_json() == expected
+    as_form = client.post('/api/diagrams/batch', data={'ids': [str(ids[0]), str(ids[1])], 'fields': 'id,title'})
+    assert as_form.get_json() == expected
+    assert set(expected['diagrams'][0]) == {'id', 'title'}
+    assert client.post('/api/diagrams/batch', json={'ids': 'oops'}).status_code == 400
@@ -0,0 +1,80 @@
+import struct
+
+import pytest
+
+from utils.bundle import HEADER, BundleCatalog, BundleError, CatalogBundle
+from utils.diagram_parser import DiagramParser, build_bundle
+
+
+def test_round_trip(source, tmp_path):
+    bundle_path = str(tmp_path / 'catalog.bundle')
+    build_bundle(source, bundle_path)
+    catalog = BundleCatalog(CatalogBundle(bundle_path))
+    parsed = DiagramParser(source).catalog
+
+    assert len(catalog.records) == 3
+    assert [dict(record) for record in catalog.records] == [dict(record) for record in parsed.records]
+    assert catalog.records[-1].source == source
+    assert catalog.version == parsed.version
+    assert catalog.get_by_id(2)['title'] == 'Login Flow'
+    assert catalog.get_by_id(4) is None
+    assert catalog.get_by_section(3)['type'] == 'er'
+    assert {name: list(positions) for name, positions in catalog.type_index().items()} == {
+        'graph': [0], 'sequence': [1], 'er': [2]}
+    assert [record['id'] for record in catalog.search_index.search('login').diagrams] == [2]
+    with pytest.raises(TypeError):
+        catalog.add(parsed.records[0])
+
+
+def test_version_mismatch(source, tmp_path):
+    bundle_path = tmp_path / 'catalog.bundle'
+    build_bundle(source, str(bundle_path))
+    data = bytearray(bundle_path.read_bytes())
+    magic, version = struct.unpack_from('<8sI', data)
+    struct.pack_into('<8sI', data, 0, magic, version - 1)
+    bundle_path.write_bytes(bytes(data))
+    with pytest.raises(BundleError, match='version'):
+        CatalogBundle(str(bundle_path))
+
+
+def test_truncated_bundle(tmp_path):
+    bundle_path = tmp_path / 'catalog.bundle'
+    bundle_path.write_bytes(b'\0' * (HEADER.size - 1))
+    with pytest.raises(BundleError, match='truncated'):
+        CatalogBundle(str(bundle_path))
+
+
+def test_parser_rebuilds_stale_bundle(source, tmp_path):
+    bundle_path = str(tmp_path / 'catalog.bundle')
+    DiagramParser(source, bundle_path=bundle_path)
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('\n4. States\n\nstateDiagram-v2\n    [*] --> A\n')
+    parser = DiagramParser(source, bundle_path=bundle_path)
+    assert isinstance(parser.catalog, BundleCatalog)
+    assert parser.get_diagram_by_id(4)['type'] == 'state'
+
+
+def test_reload_maps_a_bundle_another_process_rebuilt(source, tmp_path, monkeypatch):
+    bundle_path = str(tmp_path / 'catalog.bundle')
+    first = DiagramParser(source, bundle_path=bundle_path)
+    second = DiagramParser(source, bundle_path=bundle_path)
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('\n4. States\n\nstateDiagram-v2\n    [*] --> A\n')
+    assert first.reload()
+    parsed = []
+    monkeypatch.setattr('utils.diagram_parser.parse_files', lambda *args: parsed.append(args))
+    assert second.reload()
+    assert parsed == []
+    assert second.get_diagram_by_id(4)['type'] == 'state'
+
+
+def test_reload_parses_without_a_process_pool(tmp_path, write_reference, monkeypatch):
+    sources = tmp_path / 'sources'
+    write_reference(name='a.txt', directory=sources)
+    path = write_reference(name='b.txt', directory=sources)
+    parser = DiagramParser(str(sources), workers=4, bundle_path=str(tmp_path / 'catalog.bundle'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n4. States\n\nstateDiagram-v2\n    [*] --> A\n')
+    monkeypatch.setattr('utils.diagram_parser.ProcessPoolExecutor', None)
+    assert parser.reload()
+    assert len(parser.get_all_diagrams()) == 7
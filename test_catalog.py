@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from utils.catalog import PREVIEW_LENGTH, DiagramCatalog, DiagramRecord
+
+
+def test_record_behaves_like_a_dict(make_record):
+    diagram = make_record(1)
+    assert dict(diagram) == {'id': 1, 'title': 'Diagram 1', 'content': 'graph TD\n    A --> B',
+                             'type': 'graph', 'section': 1}
+    assert json.loads(json.dumps(diagram.to_dict())) == dict(diagram)
+    assert diagram['title'] == diagram.title
+    # The source file is an attribute, not part of the client-visible mapping
+    assert diagram.source == 'diagrams.txt'
+    with pytest.raises(KeyError):
+        diagram['source']
+    assert not hasattr(diagram, '__dict__')
+    assert DiagramRecord.from_dict(dict(diagram)).to_dict() == diagram.to_dict()
+
+
+def test_digest_covers_visible_fields(make_record):
+    assert make_record(1).digest() == make_record(1).digest()
+    assert make_record(1).digest() != make_record(1, content='graph LR\n    A --> B').digest()
+    assert make_record(1).digest() != make_record(1, section=2).digest()
+
+
+def test_lookups(make_record):
+    catalog = DiagramCatalog([make_record(1), make_record(2, diagram_type='er'), make_record(3),
+                              make_record(5, section=4)])
+    assert len(catalog) == 4
+    assert catalog.get_by_id(2).type == 'er'
+    assert catalog.get_by_id(4) is None
+    assert catalog.get_by_section(4).id == 5
+    assert catalog.position_of_id(5) == 3
+    assert [diagram.id for diagram in catalog.get_by_type('graph')] == [1, 3, 5]
+    assert len(catalog.get_by_type('state')) == 0
+    assert catalog.type_counts() == [('graph', 3), ('er', 1)]
+
+
+def test_first_record_wins_for_duplicate_keys(make_record):
+    catalog = DiagramCatalog([make_record(1, section=7, title='First'),
+                              make_record(1, section=7, title='Second')])
+    assert catalog.get_by_id(1).title == 'First'
+    assert catalog.get_by_section(7).title == 'First'
+    assert len(catalog) == 2
+
+
+def test_neighbors_follow_catalog_order(make_record):
+    catalog = DiagramCatalog([make_record(1), make_record(100001), make_record(100002)])
+    assert catalog.neighbors(1) == (None, catalog.records[1])
+    assert catalog.neighbors(100001) == (catalog.records[0], catalog.records[2])
+    assert catalog.neighbors(100002)[1] is None
+    assert catalog.neighbors(2) == (None, None)
+
+
+def test_sections_are_derived_from_records(make_record):
+    long_content = 'graph TD\n' + '    A --> B\n' * 20
+    catalog = DiagramCatalog([make_record(1, content=long_content), make_record(2)])
+    section = catalog.sections[0]
+    assert section['number'] == 1 and section['title'] == 'Diagram 1'
+    assert section['content_preview'] == long_content[:PREVIEW_LENGTH] + '...'
+    assert catalog.sections[1].to_dict()['content_preview'] == 'graph TD\n    A --> B'
+    assert [s['number'] for s in catalog.sections[:2]] == [1, 2]
+
+
+def test_content_version_tracks_records(make_record):
+    assert (DiagramCatalog([make_record(1)]).content_version()
+            == DiagramCatalog([make_record(1)]).content_version()
+            != DiagramCatalog([make_record(1, title='Renamed')]).content_version())
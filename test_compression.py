@@ -0,0 +1,71 @@
+import gzip
+import json
+import zlib
+
+import pytest
+
+from app import app, parser
+from utils.response_cache import available_encodings, brotli, compress_chunks
+
+
+@pytest.mark.parametrize('path', ['/diagrams', '/api/diagrams', '/api/diagrams?format=ndjson'])
+def test_gzip_when_accepted(client, path):
+    plain = client.get(path)
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.data) == plain.data
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+
+
+def test_streamed_list_is_compressed(client):
+    response = client.get('/api/diagrams', headers={'Accept-Encoding': 'gzip'})
+    assert response.is_streamed
+    assert [diagram['id'] for diagram in json.loads(gzip.decompress(response.data))] == [
+        diagram['id'] for diagram in parser.get_all_diagrams()]
+    # The compressed representation has its own validator
+    assert response.headers['ETag'].endswith('-gzip"')
+    revalidated = client.get('/api/diagrams', headers={'Accept-Encoding': 'gzip',
+                                                       'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_cached_body_is_reused(client):
+    first = client.get('/diagrams?q=flow', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/diagrams?q=flow', headers={'Accept-Encoding': 'gzip'})
+    assert second.data == first.data
+    assert not second.is_streamed
+
+
+@pytest.mark.skipif(brotli is None, reason='brotli is not installed')
+def test_brotli_preferred(client):
+    response = client.get('/api/diagrams', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data))
+
+
+def test_unavailable_encoding_is_not_used(client):
+    response = client.get('/api/diagrams', headers={'Accept-Encoding': 'br' if brotli is None else 'zstd'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compression_disabled(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESSION_ENABLED', False)
+    response = client.get('/api/diagrams', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_range_requests_are_not_compressed(client):
+    response = client.get('/api/diagrams', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-9'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_flushed_chunks_decode_as_they_arrive():
+    decompressor = zlib.decompressobj(31)
+    chunks = [b'{"id": %d}\n' % i for i in range(3)]
+    for chunk, part in zip(chunks, compress_chunks(iter(chunks), 'gzip', flush=True)):
+        assert decompressor.decompress(part) == chunk
+    assert available_encodings()[-1] == 'gzip'
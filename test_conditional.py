@@ -0,0 +1,57 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import app, parser
+
+
+@pytest.mark.parametrize('path, policy', [('/', 'CACHE_CONTROL_PAGES'), ('/diagram/1', 'CACHE_CONTROL_PAGES'),
+                                          ('/api/diagrams', 'CACHE_CONTROL_API'),
+                                          ('/api/diagram/1', 'CACHE_CONTROL_API')])
+def test_validators_and_policy(client, path, policy):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Cache-Control'] == app.config[policy]
+    assert response.last_modified is not None
+
+    revalidated = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    # A 304 carries the headers a cache needs to refresh its copy (RFC 9110
+    # 15.4.5); Werkzeug drops Last-Modified from it, which the RFC allows
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+    assert revalidated.headers['Cache-Control'] == app.config[policy]
+    assert ('Accept-Encoding' in revalidated.vary) == ('Accept-Encoding' in response.vary)
+
+
+def test_any_listed_etag_matches(client):
+    etag = client.get('/api/diagrams').headers['ETag']
+    assert client.get('/api/diagrams', headers={'If-None-Match': f'"other", {etag}'}).status_code == 304
+    assert client.get('/api/diagrams', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client):
+    last_modified = client.get('/api/diagrams').last_modified
+    later = format_datetime(last_modified + timedelta(seconds=1), usegmt=True)
+    earlier = format_datetime(last_modified - timedelta(seconds=1), usegmt=True)
+    assert client.get('/api/diagrams', headers={'If-Modified-Since': later}).status_code == 304
+    assert client.get('/api/diagrams', headers={'If-Modified-Since': earlier}).status_code == 200
+    # If-None-Match takes precedence
+    assert client.get('/api/diagrams', headers={'If-Modified-Since': later,
+                                                'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_diagram_etag_follows_its_content(client):
+    first = client.get('/api/diagram/1').headers['ETag']
+    assert first.strip('"') == parser.get_diagram_by_id(1).digest()
+    assert client.get('/api/diagram/2').headers['ETag'] != first
+    missing = client.get('/api/diagram/999999')
+    assert missing.status_code == 404
+    assert 'ETag' not in missing.headers
+
+
+def test_last_modified_is_the_newest_source_mtime(client):
+    last_modified = client.get('/').last_modified
+    assert last_modified == datetime.fromtimestamp(int(parser.catalog.last_modified), timezone.utc)
@@ -0,0 +1,87 @@
+import gc
+import warnings
+
+import pytest
+
+from utils.diagram_parser import (DiagramParser, IdCollisionError, file_id_bases, iter_diagrams, iter_sections,
+                                  parse_file, source_root)
+
+def test_sections_split_on_headers(reference):
+    sections = list(iter_sections(reference.split('\n')))
+    assert [(section.number, section.title) for section in sections] == [
+        (1, 'System Overview'), (2, 'Login Flow'), (3, 'Orders')]
+
+
+def test_indented_headers(reference, write_reference):
+    indented = '\n'.join('  ' + line if line[:1].isdigit() else line for line in reference.split('\n'))
+    records = list(iter_diagrams(write_reference(indented)))
+    assert [(record.id, record.section, record.title, record.type) for record in records] == [
+        (1, 1, 'System Overview', 'graph'), (2, 2, 'Login Flow', 'sequence'), (3, 3, 'Orders', 'er')]
+
+
+def test_streamed_records_match_parser(source):
+    parser = DiagramParser(source)
+    assert [dict(record) for record in iter_diagrams(source)] == [dict(d) for d in parser.get_all_diagrams()]
+    assert parser.get_diagram_by_id(2)['content'] == 'sequenceDiagram\nA->>B: hi'
+
+
+def test_hashed_reads_close_the_file(source, recwarn):
+    with warnings.catch_warnings():
+        warnings.simplefilter('always', ResourceWarning)
+        parsed, reparsed, reused = parse_file(source)
+        gc.collect()
+    assert [section.number for section in parsed.sections] == [1, 2, 3]
+    assert not [w for w in recwarn if issubclass(w.category, ResourceWarning)]
+
+
+def test_single_file_ids_start_at_one(source):
+    parser = DiagramParser(source)
+    assert [diagram['id'] for diagram in parser.get_all_diagrams()] == [1, 2, 3]
+    previous_diagram, next_diagram = parser.get_neighbors(1)
+    assert previous_diagram is None and next_diagram['id'] == 2
+
+
+def test_multi_file_ids_are_stable(tmp_path, reference, write_reference):
+    write_reference(name='m.txt')
+    ids = {diagram['title']: diagram['id'] for diagram in DiagramParser(str(tmp_path)).get_all_diagrams()}
+    # A file that sorts first leaves the ids of the others alone
+    write_reference(reference.replace('System Overview', 'Data Model'), 'a.txt')
+    parser = DiagramParser(str(tmp_path))
+    diagrams = parser.get_all_diagrams()
+    assert len(diagrams) == 6
+    assert {d['title']: d['id'] for d in diagrams if d.source.endswith('m.txt')} == ids
+    # Neighbors follow catalog order across the gap between the files' id blocks
+    last = [d for d in diagrams if d.source.endswith('a.txt')][-1]
+    assert parser.get_neighbors(last['id'])[1]['id'] == ids['System Overview']
+    assert parser.get_neighbors(ids['System Overview'])[0]['id'] == last['id']
+
+
+def test_bundle_ids_match_parsed_ids(tmp_path, write_reference):
+    source_dir = tmp_path / 'sources'
+    write_reference(name='a.txt', directory=source_dir)
+    write_reference(name='b.txt', directory=source_dir)
+    parsed = DiagramParser(str(source_dir))
+    bundled = DiagramParser(str(source_dir), bundle_path=str(tmp_path / 'catalog.bundle'))
+    assert [d['id'] for d in bundled.get_all_diagrams()] == [d['id'] for d in parsed.get_all_diagrams()]
+    assert [d['id'] for d in bundled.iter_diagrams()] == [d['id'] for d in parsed.get_all_diagrams()]
+
+
+def test_same_file_name_in_different_directories(tmp_path, write_reference):
+    write_reference(directory=tmp_path / 'a')
+    write_reference(directory=tmp_path / 'b')
+    parser = DiagramParser(str(tmp_path / '*' / '*.txt'))
+    ids = [diagram['id'] for diagram in parser.get_all_diagrams()]
+    assert len(set(ids)) == 6
+    # Ids come from the path below the pattern's fixed directories
+    assert source_root(str(tmp_path / '*' / '*.txt')) == str(tmp_path)
+    path = str(tmp_path / 'b' / 'diagrams.txt')
+    assert file_id_bases([path], str(tmp_path))[path] == file_id_bases(['b/diagrams.txt'], '.')['b/diagrams.txt']
+    assert ids[3] < 2 ** 53
+
+
+def test_id_block_collisions_are_errors(tmp_path, write_reference, monkeypatch):
+    write_reference(name='a.txt')
+    write_reference(name='b.txt')
+    monkeypatch.setattr('utils.diagram_parser.FILE_ID_SLOTS', 1)
+    with pytest.raises(IdCollisionError, match='same block'):
+        DiagramParser(str(tmp_path))
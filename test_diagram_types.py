@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from utils.diagram_parser import DiagramParser
+from utils.diagram_types import MAX_PREAMBLE_LINES, UNKNOWN_TYPE, detect_diagram_type
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data')
+
+# (section, type) of every diagram in the shipped reference files
+SAMPLE_TYPES = {
+    'mermaid_attendance.txt': [(1, 'graph'), (2, 'er'), (3, 'sequence'), (4, 'flowchart'), (5, 'graph'),
+                               (6, 'sequence'), (7, 'graph'), (10, 'er'), (11, 'er'), (12, 'er')],
+    'mermaid_ref.txt': [(1, 'graph'), (2, 'er'), (3, 'sequence'), (4, 'flowchart'), (5, 'sequence'),
+                        (6, 'state'), (7, 'graph'), (8, 'graph'), (9, 'graph'), (10, 'flowchart')],
+    'mermaid_result.txt': [(1, 'graph'), (2, 'er'), (3, 'flowchart'), (4, 'graph'), (5, 'graph'),
+                           (6, 'flowchart'), (7, 'sequence'), (8, 'flowchart')]
+}
+
+
+@pytest.mark.parametrize('file_name', sorted(SAMPLE_TYPES))
+def test_sample_file_types(file_name):
+    parser = DiagramParser(os.path.join(DATA_DIR, file_name))
+    types = [(diagram['section'], diagram['type']) for diagram in parser.get_all_diagrams()]
+    assert types == SAMPLE_TYPES[file_name]
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('graph TD\n    A --> B', 'graph'),
+    ('flowchart-elk LR\n    A --> B', 'flowchart'),
+    ('stateDiagram-v2\n    [*] --> A', 'state'),
+    ('---\ntitle: Orders\n---\nerDiagram\n    A ||--o{ B : has', 'er'),
+    ('%%{init: {"theme": "dark"}}%%\n%% a comment\nsequenceDiagram\n    A->>B: hi', 'sequence'),
+    ('%%{\n  init: {"theme": "dark"}\n}%%\ngantt\n    title Plan', 'gantt'),
+    # Prose before the diagram, with and without a blank line
+    ('Component Interaction Diagram\n\ngraph LR\n    A --> B', 'graph'),
+    ('Login flow\nsequenceDiagram\n    A->>B: hi', 'sequence'),
+    ('', UNKNOWN_TYPE),
+    ('just some text', UNKNOWN_TYPE),
+])
+def test_detect_diagram_type(content, expected):
+    assert detect_diagram_type(content) == expected
+
+
+def test_keyword_after_long_preamble_is_not_found():
+    content = 'prose\n' * (MAX_PREAMBLE_LINES + 1) + 'graph TD\n    A --> B'
+    assert detect_diagram_type(content) == UNKNOWN_TYPE
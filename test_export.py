@@ -0,0 +1,66 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from app import parser
+
+
+def test_ndjson_export(client):
+    response = client.get('/api/export')
+    assert response.status_code == 200
+    lines = response.data.decode('utf-8').splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [diagram['id'] for diagram in parser.get_all_diagrams()]
+
+
+def test_zip_export_is_valid(client):
+    response = client.get('/api/export?format=zip')
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert len(names) == len(parser.get_all_diagrams())
+        first = parser.get_all_diagrams()[0]
+        assert archive.read(names[0]).decode('utf-8') == first['content']
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'zip'])
+def test_ranges_match_full_export(client, export_format):
+    full = client.get(f'/api/export?format={export_format}')
+    etag = full.headers['ETag']
+    size = len(full.data)
+    for first, last in [(0, 0), (100, 199), (size // 2, size - 1)]:
+        response = client.get(f'/api/export?format={export_format}',
+                              headers={'Range': f'bytes={first}-{last}', 'If-Range': etag})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f'bytes {first}-{last}/{size}'
+        assert response.data == full.data[first:last + 1]
+    # Suffix range: the last bytes, which for a zip are the end of central directory record
+    response = client.get(f'/api/export?format={export_format}', headers={'Range': 'bytes=-22'})
+    assert response.status_code == 206
+    assert response.data == full.data[-22:]
+
+
+def test_resumed_zip_download_is_valid(client):
+    full = client.get('/api/export?format=zip')
+    head = full.data[:len(full.data) // 3]
+    rest = client.get('/api/export?format=zip', headers={'Range': f'bytes={len(head)}-',
+                                                          'If-Range': full.headers['ETag']})
+    assert rest.status_code == 206
+    with zipfile.ZipFile(io.BytesIO(head + rest.data)) as archive:
+        assert archive.testzip() is None
+
+
+def test_stale_if_range_gets_the_full_export(client):
+    full = client.get('/api/export')
+    response = client.get('/api/export', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == full.data
+
+
+def test_unsatisfiable_range(client):
+    size = len(client.get('/api/export').data)
+    response = client.get('/api/export', headers={'Range': f'bytes={size}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{size}'
@@ -0,0 +1,58 @@
+import pytest
+from jinja2 import DictLoader, Environment
+
+from utils.fragment_cache import FragmentCache, FragmentCacheError, FragmentCacheExtension
+
+
+@pytest.fixture
+def env():
+    env = Environment(extensions=[FragmentCacheExtension])
+    env.fragment_cache = FragmentCache(1024 * 1024)
+    env.catalog_version = 'v1'
+    env.fragment_cache_version = lambda: env.catalog_version
+    return env
+
+
+def test_hits_and_misses(env):
+    calls = []
+    template = env.from_string("{% cache 'list', kind %}{{ render(kind) }}{% endcache %}")
+    render = lambda kind: calls.append(kind) or kind.upper()
+    assert template.render(kind='graph', render=render) == 'GRAPH'
+    assert template.render(kind='graph', render=render) == 'GRAPH'
+    assert template.render(kind='er', render=render) == 'ER'
+    assert calls == ['graph', 'er']
+    assert (env.fragment_cache.hits, env.fragment_cache.misses) == (1, 2)
+
+
+def test_new_catalog_version_invalidates(env):
+    template = env.from_string("{% cache 'count' %}{{ items|length }}{% endcache %}")
+    assert template.render(items=[1, 2]) == '2'
+    assert template.render(items=[1, 2, 3]) == '2'
+    env.catalog_version = 'v2'
+    assert template.render(items=[1, 2, 3]) == '3'
+
+
+def test_names_are_scoped_to_the_template(env):
+    env.loader = DictLoader({'first.html': "{% cache 'a' %}first{% endcache %}",
+                             'second.html': "{% cache 'a' %}second{% endcache %}"})
+    assert env.get_template('first.html').render() == 'first'
+    assert env.get_template('second.html').render() == 'second'
+
+
+def test_uncached_without_a_version(env):
+    env.fragment_cache_version = lambda: None
+    template = env.from_string("{% cache 'count' %}{{ items|length }}{% endcache %}")
+    assert template.render(items=[1]) == '1'
+    assert template.render(items=[1, 2]) == '2'
+    assert env.fragment_cache.misses == 0
+
+
+def test_verify_catches_unkeyed_page_data(env):
+    env.fragment_cache_verify = True
+    keyed = env.from_string("{% cache 'keyed', query %}{{ query }}{% endcache %}")
+    assert keyed.render(query='a') == 'a'
+    assert keyed.render(query='a') == 'a'
+    unkeyed = env.from_string("{% cache 'unkeyed' %}{{ query }}{% endcache %}")
+    unkeyed.render(query='a')
+    with pytest.raises(FragmentCacheError):
+        unkeyed.render(query='b')
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+from app import app
+from utils.metrics import MetricsRegistry, timed_iter
+
+
+def sample(text, line_start):
+    values = [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(line_start)]
+    return values[0] if values else 0.0
+
+
+def scrape(client):
+    response = client.get(app.config['METRICS_PATH'])
+    assert response.status_code == 200
+    assert response.content_type == MetricsRegistry.CONTENT_TYPE
+    return response.data.decode('utf-8')
+
+
+def test_requests_are_counted(client):
+    served = 'http_requests_total{endpoint="api_get_diagram",status="200"}'
+    before = sample(scrape(client), served)
+    client.get('/api/diagram/1')
+    text = scrape(client)
+    assert sample(text, served) == before + 1
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="api_get_diagram",le="+Inf"}' in text
+    assert sample(text, 'diagram_catalog_diagrams ') > 0
+
+
+def test_disabled_metrics_are_not_recorded(client, monkeypatch):
+    served = 'http_requests_total{endpoint="api_get_diagram",status="200"}'
+    before = sample(scrape(client), served)
+    monkeypatch.setitem(app.config, 'METRICS_ENABLED', False)
+    client.get('/api/diagram/1')
+    monkeypatch.setitem(app.config, 'METRICS_ENABLED', True)
+    assert sample(scrape(client), served) == before
+
+
+def test_endpoint_absent_when_disabled():
+    # The route is registered at import, so check a fresh process
+    code = ('from config import Config\n'
+            'Config.METRICS_ENABLED = False\n'
+            'from app import app\n'
+            'print(app.test_client().get(Config.METRICS_PATH).status_code)\n')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.split()[-1] == '404'
+
+
+def test_registry_rendering():
+    registry = MetricsRegistry()
+    counter = registry.counter('jobs_total', 'Jobs run', ['kind'])
+    histogram = registry.histogram('job_seconds', 'Job duration', buckets=(0.1, 1.0))
+    registry.callback('queue_depth', 'Jobs waiting', lambda: 3)
+    counter.inc('a "quoted"\nkind')
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+    list(timed_iter(iter([1, 2]), histogram))
+    lines = registry.render().splitlines()
+    assert 'jobs_total{kind="a \\"quoted\\"\\nkind"} 1' in lines
+    assert 'job_seconds_bucket{le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{le="1.0"} 2' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'job_seconds_count 3' in lines
+    assert 'queue_depth 3' in lines
+    assert '# TYPE queue_depth gauge' in lines
@@ -0,0 +1,30 @@
+import re
+
+from app import parser
+
+
+def quick_link_ids(page):
+    menu = re.search(rb'id="quickLinks".*?</ul>', page, re.S).group(0)
+    return [int(diagram_id) for diagram_id in re.findall(rb'href="/diagram/(\d+)"', menu)]
+
+
+def test_search_page_lists_matches(client):
+    response = client.get('/diagrams?q=login')
+    assert response.status_code == 200
+    assert b'Search Results for' in response.data
+    matches = parser.catalog.search_index.search('login').diagrams
+    rows = re.findall(rb'<tr class="diagram-row"', response.data)
+    assert len(rows) == len(matches) < len(parser.get_all_diagrams())
+
+
+def test_search_page_leaves_quick_links_alone(client):
+    client.get('/diagrams?q=login')
+    expected = [diagram.id for diagram in parser.get_all_diagrams()[:10]]
+    assert quick_link_ids(client.get('/').data) == expected
+    assert quick_link_ids(client.get('/diagrams?q=flow').data) == expected
+
+
+def test_cached_fragments_match_fresh_renders(client):
+    # The client fixture re-renders every cached fragment it serves
+    for path in ['/', '/diagrams', '/diagrams?q=login', '/diagram/1', '/diagram/2', '/diagrams?q=flow', '/']:
+        assert client.get(path).status_code == 200
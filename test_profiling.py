@@ -0,0 +1,31 @@
+import json
+
+from utils.profiling import ProfileStore, RequestProfiler, RequestProfile
+
+
+def make_profile(profile_id, duration_ms):
+    return RequestProfile(profile_id, 0.0, 'GET', '/', 'index', 200, duration_ms, 'sampled', {}, {}, '')
+
+
+def test_store_keeps_the_slowest():
+    store = ProfileStore(keep=3)
+    for profile_id, duration in enumerate([5, 50, 1, 20, 30], 1):
+        store.add(make_profile(profile_id, duration))
+    assert [profile.duration_ms for profile in store.profiles()] == [50, 30, 20]
+    assert store.get(2).duration_ms == 50
+    assert store.get(3) is None
+
+
+def test_profiler_breakdown():
+    profiler = RequestProfiler.start('requested')
+    assert profiler is not None
+    # One request is profiled at a time
+    assert RequestProfiler.start('sampled') is None
+    json.dumps([{'n': i} for i in range(1000)])
+    profile = profiler.finish(1, 'GET', '/api/diagrams', 'api_get_diagrams', 200, {'serialize': 0.001})
+    assert set(profile.breakdown_ms) == {'jinja', 'json', 'parser', 'other'}
+    assert profile.breakdown_ms['json'] > 0
+    assert profile.phases_ms == {'serialize': 1.0}
+    assert 'report' not in profile.summary()
+    # Released again once finished
+    RequestProfiler.start('sampled').discard()
@@ -0,0 +1,97 @@
+import os
+import threading
+
+from utils.diagram_parser import DiagramParser
+
+
+def edit(path, old, new):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace(old, new))
+    bump_mtime(path)
+
+
+def bump_mtime(path):
+    # Writes within one timestamp tick would otherwise look unchanged
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_sources_are_not_reloaded(source):
+    parser = DiagramParser(source)
+    catalog = parser.catalog
+    assert not parser.check_for_changes()
+    # Touched without changing the content
+    bump_mtime(source)
+    assert not parser.check_for_changes()
+    assert parser.catalog is catalog
+
+
+def test_only_changed_sections_are_reparsed(source):
+    parser = DiagramParser(source)
+    edit(source, 'A->>B: hi', 'A->>B: hello')
+    assert parser.check_for_changes()
+    assert parser.get_diagram_by_id(2)['content'] == 'sequenceDiagram\nA->>B: hello'
+    assert parser.reload_stats['reloads'] == 1
+    assert parser.reload_stats['sections_reparsed'] == 1
+    assert parser.reload_stats['sections_reused'] == 2
+
+
+def test_reload_swaps_in_a_new_catalog(source):
+    parser = DiagramParser(source)
+    old = parser.catalog
+    installed = []
+    parser.on_reload(lambda catalog: 1 / 0)  # a failing listener doesn't stop the others
+    parser.on_reload(installed.append)
+    edit(source, 'Login Flow', 'Sign-in Flow')
+    assert parser.check_for_changes()
+    new = parser.catalog
+    assert installed == [new]
+    assert new.version != old.version
+    assert [diagram.id for diagram in new.search_index.search('sign').diagrams] == [2]
+    # Readers still holding the old catalog see it unchanged
+    assert old.get_by_id(2)['title'] == 'Login Flow'
+    assert old.search_index.search('sign').total == 0
+
+
+def test_emptied_source_keeps_the_current_catalog(source):
+    parser = DiagramParser(source)
+    catalog = parser.catalog
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('nothing here\n')
+    bump_mtime(source)
+    assert not parser.check_for_changes()
+    assert parser.catalog is catalog
+
+
+def test_checks_are_throttled(source):
+    parser = DiagramParser(source)
+    assert not parser.check_for_changes(min_interval=60)
+    edit(source, 'Orders', 'Invoices')
+    assert not parser.check_for_changes(min_interval=60)
+    assert parser.check_for_changes()
+
+
+def test_readers_never_see_a_partial_catalog(source):
+    parser = DiagramParser(source)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            catalog = parser.catalog
+            if not (len(catalog) == len(catalog.sections) == 3
+                    and catalog.search_index.search('graph').total == 1):
+                errors.append(catalog.version)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for n in range(20):
+            edit(source, f'A --> B{n - 1}' if n else 'A --> B', f'A --> B{n}')
+            assert parser.check_for_changes()
+    finally:
+        stop.set()
+        reader.join()
+    assert errors == []
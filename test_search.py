@@ -0,0 +1,54 @@
+from app import app
+from utils.catalog import DiagramCatalog
+from utils.search_index import SearchIndex, tokenize
+
+
+def index_of(make_record, *records):
+    return SearchIndex(DiagramCatalog(make_record(*fields) for fields in records).records)
+
+
+def ids(result):
+    return [diagram.id for diagram in result.diagrams]
+
+
+def test_tokenize():
+    assert tokenize('Login-Flow: User_ID 42') == ['login', 'flow', 'user_id', '42']
+
+
+def test_title_matches_outrank_content_matches(make_record):
+    index = index_of(make_record, (1, 'Overview', 'graph TD\n    Login --> Home'), (2, 'Login Flow'))
+    assert ids(index.search('login')) == [2, 1]
+
+
+def test_exact_tokens_outrank_prefix_matches(make_record):
+    index = index_of(make_record, (1, 'Order Service'), (2, 'Orders'), (3, 'Payments'))
+    assert ids(index.search('order')) == [1, 2]
+    assert ids(index.search('ord')) == [1, 2]
+    assert ids(index.search('orders')) == [2]
+
+
+def test_every_term_must_match(make_record):
+    index = index_of(make_record, (1, 'Login Flow'), (2, 'Login Schema'), (3, 'Data Flow'))
+    assert ids(index.search('login flow')) == [1]
+    assert ids(index.search('FLOW')) == [1, 3]
+    assert ids(index.search('login missing')) == []
+    assert index.search('  ').total == 0
+
+
+def test_ties_keep_catalog_order_and_pages_report_the_total(make_record):
+    index = index_of(make_record, *[(n, f'Flow {n}') for n in range(1, 8)])
+    result = index.search('flow', limit=3, offset=2)
+    assert result.total == 7
+    assert ids(result) == [3, 4, 5]
+    assert ids(index.search('flow', offset=6)) == [7]
+
+
+def test_search_endpoint(client):
+    response = client.get('/api/search?q=login&limit=1')
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+    assert int(response.headers['X-Total-Count']) >= 1
+    assert client.get('/api/search').get_json() == []
+    # limit is clamped to SEARCH_MAX_LIMIT and offset to 0
+    response = client.get('/api/search?q=graph&limit=100000&offset=-5')
+    assert len(response.get_json()) == min(int(response.headers['X-Total-Count']), app.config['SEARCH_MAX_LIMIT'])
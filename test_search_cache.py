@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from app import search_cache
+from utils.lru_cache import VersionedLRUCache
+from utils.search_cache import CachedSearch, SearchResultCache, search_cache_key
+
+
+class BytesCache(VersionedLRUCache):
+    def entry_size(self, entry):
+        return len(entry)
+
+
+def test_size_bound_evicts_least_recently_used():
+    cache = BytesCache(10)
+    cache.put('a', 'v1', b'aaaa')
+    cache.put('b', 'v1', b'bbbb')
+    assert cache.get('a', 'v1') == b'aaaa'
+    cache.put('c', 'v1', b'cccc')
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') == b'aaaa' and cache.get('c', 'v1') == b'cccc'
+    assert cache.evictions == 1 and cache.stats()['bytes'] == 8
+    # Entries larger than the whole budget are not stored
+    cache.put('d', 'v1', b'd' * 11)
+    assert cache.get('d', 'v1') is None and cache.stats()['entries'] == 2
+
+
+def test_new_version_drops_old_entries():
+    cache = BytesCache(10)
+    cache.put('a', 'v1', b'aaaa')
+    assert cache.get('a', 'v2') is None
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('utils.lru_cache.time.monotonic', lambda: now[0])
+    cache = BytesCache(10, ttl=5)
+    cache.put('a', 'v1', b'aaaa')
+    now[0] += 4
+    assert cache.get('a', 'v1') == b'aaaa'
+    now[0] += 1
+    assert cache.get('a', 'v1') is None
+    assert cache.expirations == 1 and cache.stats()['bytes'] == 0
+
+
+def test_concurrent_misses_compute_once():
+    cache = BytesCache(100)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'result'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', 'v1', compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', 'v1', compute)))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while cache.coalesced < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == [b'result'] * 4 and len(calls) == 1
+    assert cache.get_or_compute('k', 'v1', compute) == b'result' and len(calls) == 1
+
+
+def test_failed_computation_is_not_cached():
+    cache = BytesCache(100)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', 'v1', fail)
+    assert cache.get_or_compute('k', 'v1', lambda: b'ok') == b'ok'
+
+
+def test_search_keys_ignore_case_and_punctuation():
+    assert search_cache_key('Login  Flow!', 20, 0) == search_cache_key('login flow', 20, 0)
+    assert search_cache_key('login flow', 20, 0) != search_cache_key('login flow', 20, 20)
+    cache = SearchResultCache(100)
+    cache.put(search_cache_key('login', 20, 0), 'v1', CachedSearch(b'[]', 0))
+    assert cache.stats()['bytes'] == 2
+
+
+def test_search_endpoint_uses_the_cache(client):
+    first = client.get('/api/search?q=Login')
+    hits = search_cache.hits
+    second = client.get('/api/search?q=login!')
+    assert second.get_data() == first.get_data()
+    assert search_cache.hits == hits + 1
@@ -0,0 +1,49 @@
+from app import app, parser
+from utils.suggest_index import SuggestIndex, identifiers, trigrams
+
+
+def titles(index, query, limit=8):
+    return [suggestion.title for suggestion in index.suggest(query, limit)]
+
+
+def test_identifiers_skip_labels_and_keywords():
+    content = 'graph TD\n    OrderService[Order placed] --> payment_gateway\n    A -->|"retry later"| B'
+    assert list(identifiers(content)) == ['orderservice', 'order', 'service', 'payment_gateway', 'payment', 'gateway']
+    assert trigrams('ab', prefix=True) == {'  a', ' ab'}
+
+
+def test_prefix_of_last_word(make_record):
+    index = SuggestIndex([make_record(1, 'Authentication Flow'), make_record(2, 'Author Index'),
+                          make_record(3, 'Orders')])
+    assert titles(index, 'auth') == ['Author Index', 'Authentication Flow']
+    assert titles(index, 'authe')[:1] == ['Authentication Flow']
+    assert titles(index, 'xyz') == []
+
+
+def test_typos_are_tolerated(make_record):
+    index = SuggestIndex([make_record(1, 'Payment Gateway'), make_record(2, 'Login Flow'),
+                          make_record(3, 'Shipping Status')])
+    assert titles(index, 'paymnet')[:1] == ['Payment Gateway']
+    assert titles(index, 'logn flow')[:1] == ['Login Flow']
+
+
+def test_title_matches_outrank_identifier_matches(make_record):
+    index = SuggestIndex([make_record(1, 'Overview', 'graph TD\n    Checkout --> Cart'),
+                          make_record(2, 'Checkout')])
+    assert titles(index, 'checkout') == ['Checkout', 'Overview']
+
+
+def test_every_word_must_match(make_record):
+    index = SuggestIndex([make_record(1, 'Login Flow'), make_record(2, 'Login Screen'),
+                          make_record(3, 'Order Flow')])
+    assert titles(index, 'login fl') == ['Login Flow']
+    assert titles(index, 'login', limit=1) == ['Login Flow']
+
+
+def test_suggest_endpoint(client):
+    assert client.get('/api/suggest').get_json() == []
+    title = parser.get_all_diagrams()[0]['title']
+    suggestions = client.get(f'/api/suggest?q={title[:-1]}&limit=1').get_json()
+    assert suggestions == [suggestion._asdict() for suggestion in parser.suggest(title[:-1], limit=1)]
+    assert len(suggestions) == 1
+    assert len(client.get(f'/api/suggest?q={title[:3]}&limit=999').get_json()) <= app.config['SUGGEST_MAX_LIMIT']
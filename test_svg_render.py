@@ -0,0 +1,120 @@
+import os
+import time
+
+import pytest
+
+from utils.diagram_parser import DiagramParser
+from utils.svg_render import (PRERENDER_QUEUE_PER_WORKER, RenderError, SVGCache, SVGPrerenderer, SVGRenderer,
+                              StubRenderer, make_renderer)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SVGCache(str(tmp_path / 'svg'))
+
+
+class FlakyRenderer(SVGRenderer):
+    """Fails the first ``failures`` renders"""
+
+    name = 'flaky'
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def render(self, content):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RenderError('timed out')
+        return b'<svg/>'
+
+
+def wait_idle(prerenderer, timeout=5):
+    deadline = time.monotonic() + timeout
+    while prerenderer.queued and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def test_make_renderer():
+    assert isinstance(make_renderer('stub'), StubRenderer)
+    assert make_renderer('none') is None
+    assert make_renderer('auto', command='no-such-mmdc') is None
+    with pytest.raises(ValueError):
+        make_renderer('dot')
+
+
+def test_cache_round_trip(cache):
+    key = cache.key('stub', 'graph TD\n    A --> B')
+    assert cache.key('stub', 'graph TD\n    A --> C') != key
+    assert cache.get(key) is None
+    cache.put(key, b'<svg/>')
+    with open(cache.get(key), 'rb') as f:
+        assert f.read() == b'<svg/>'
+
+
+def test_cache_prunes_least_recently_used(tmp_path):
+    cache = SVGCache(str(tmp_path), max_bytes=250)
+    keys = [cache.key('stub', str(i)) for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, b'x' * 100)
+        os.utime(cache.path(key), (time.time() - age, time.time() - age))
+    # keys[0] was the oldest; writing a third file pushed the cache over its limit
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is not None
+    assert cache.evictions == 1
+
+
+def test_sync_prerenders_catalog(cache, source):
+    prerenderer = SVGPrerenderer(StubRenderer(), cache, workers=2)
+    catalog = DiagramParser(source).catalog
+    prerenderer.sync(catalog)
+    wait_idle(prerenderer)
+    assert prerenderer.rendered == 3
+    key, path = prerenderer.lookup(catalog.records[2].content)
+    assert path is not None and path.endswith(f'{key}.svg')
+
+
+def test_failures_are_retried_after_backoff(cache):
+    renderer = FlakyRenderer(failures=1)
+    prerenderer = SVGPrerenderer(renderer, cache, workers=1, retry_seconds=0.2)
+    assert prerenderer.lookup('graph TD')[1] is None
+    wait_idle(prerenderer)
+    assert prerenderer.failed == 1
+    # Backing off: not retried yet
+    prerenderer.lookup('graph TD')
+    wait_idle(prerenderer)
+    assert renderer.calls == 1
+    time.sleep(0.25)
+    prerenderer.lookup('graph TD')
+    wait_idle(prerenderer)
+    assert renderer.calls == 2
+    assert prerenderer.lookup('graph TD')[1] is not None
+
+
+class SlowRenderer(SVGRenderer):
+    """Records how many renders were queued whenever one starts"""
+
+    name = 'slow'
+
+    def __init__(self):
+        self.prerenderer = None
+        self.max_queued = 0
+
+    def render(self, content):
+        self.max_queued = max(self.max_queued, self.prerenderer.queued)
+        time.sleep(0.002)
+        return b'<svg/>'
+
+
+def test_prerender_queue_is_bounded(cache, write_reference):
+    sections = ''.join(f'{n}. Diagram {n}\n\ngraph TD\n    A{n} --> B\n\n' for n in range(1, 41))
+    catalog = DiagramParser(write_reference(sections)).catalog
+    renderer = SlowRenderer()
+    prerenderer = renderer.prerenderer = SVGPrerenderer(renderer, cache, workers=2)
+    prerenderer.sync(catalog)
+    deadline = time.monotonic() + 5
+    while prerenderer.rendered < 40 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prerenderer.rendered == 40
+    assert renderer.max_queued <= 2 * PRERENDER_QUEUE_PER_WORKER
@@ -0,0 +1,39 @@
+"""Compile reference file(s) into a catalog bundle.
+
+Usage:
+    python -m utils.build_bundle [SOURCE] [-o BUNDLE] [--workers N]
+
+SOURCE defaults to Config.DIAGRAM_FILE and may be a file, a directory or a
+glob pattern; BUNDLE defaults to Config.DIAGRAM_BUNDLE.
+"""
+import argparse
+import sys
+import time
+
+from config import Config
+from utils.diagram_parser import build_bundle
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Compile mermaid reference files into a catalog bundle')
+    arg_parser.add_argument('source', nargs='?', default=Config.DIAGRAM_FILE,
+                            help='reference file, directory or glob pattern (default: %(default)s)')
+    arg_parser.add_argument('-o', '--output', default=Config.DIAGRAM_BUNDLE,
+                            help='bundle file to write (default: %(default)s)')
+    arg_parser.add_argument('--workers', type=int, default=Config.PARSE_WORKERS,
+                            help='parser processes for multi-file sources (default: CPU count)')
+    args = arg_parser.parse_args(argv)
+
+    if not args.output:
+        arg_parser.error('no output given and DIAGRAM_BUNDLE is not configured')
+
+    start = time.perf_counter()
+    files = build_bundle(args.source, args.output, args.workers)
+    count = sum(len(parsed.sections) for parsed in files)
+    print(f"Wrote {count} diagrams from {len(files)} file(s) to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
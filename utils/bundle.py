@@ -0,0 +1,295 @@
+"""Precompiled catalog bundles.
+
+A bundle is a single binary file holding everything the viewer needs from the
+reference file(s), laid out so that it can be memory-mapped and used without
+parsing:
+
+    header         magic, version, record count and the offsets of the parts below
+    metadata       JSON: the source files (path, mtime, size, digest) and type names
+    record table   one fixed-size entry per diagram (id, section, type, source and
+                   the offset/length of its title and content)
+    id index       (id, position) pairs sorted by id
+    section index  (section, position) pairs sorted by section
+    strings        the concatenated UTF-8 titles and diagram bodies
+
+Diagram records are materialized, and their text decoded, only when accessed.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent rebuilds are not serialized
+    fcntl = None
+
+from utils.catalog import DiagramCatalog, DiagramRecord, SectionList, source_version
+from utils.search_index import SearchIndex
+
+MAGIC = b'MMDBNDL\0'
+# Version 2: diagram types from the table-driven detector
+# Version 3: the detector skips prose lines before the diagram keyword
+# Version 4: per-file id blocks in multi-file mode
+# Version 5: 64-bit diagram ids, for id blocks chosen by the file's relative path
+VERSION = 5
+
+# magic, version, record count, metadata offset/length, record table offset,
+# id index offset, section index offset, strings offset
+HEADER = struct.Struct('<8sIIQQQQQQ')
+# id, section, type index, source index, title offset/length, content offset/length
+RECORD = struct.Struct('<qqHHQIQI')
+# key (id or section number), record position
+INDEX_ENTRY = struct.Struct('<qI')
+
+
+class BundleError(Exception):
+    """Raised when a bundle file is missing, truncated or of an unknown format"""
+
+
+def write_bundle(bundle_path: str, files, id_bases: Optional[Dict[str, int]] = None) -> int:
+    """Write parsed reference files to ``bundle_path`` and return the diagram count.
+
+    ``files`` are the ``ParsedFile`` values produced by the parser. Diagram ids
+    are numbered as in a parsed catalog: across all files in order, or from the
+    id in ``id_bases`` for each file's path. The bundle is written to a
+    temporary file and moved into place, so readers that still have the
+    previous bundle mapped are unaffected.
+    """
+    types: Dict[str, int] = {}
+    records = bytearray()
+    strings = bytearray()
+    id_keys = []
+    section_keys = []
+    position = 0
+
+    for source_index, parsed in enumerate(files):
+        next_id = id_bases[parsed.path] + 1 if id_bases is not None else position + 1
+        for section in parsed.sections:
+            title = section.title.encode('utf-8')
+            content = section.content.encode('utf-8')
+            type_index = types.setdefault(section.type, len(types))
+            title_offset = len(strings)
+            strings += title
+            content_offset = len(strings)
+            strings += content
+            records += RECORD.pack(next_id, section.number, type_index, source_index,
+                                   title_offset, len(title), content_offset, len(content))
+            id_keys.append((next_id, position))
+            section_keys.append((section.number, position))
+            next_id += 1
+            position += 1
+
+    metadata = json.dumps({
+        'sources': [{
+            'path': parsed.path,
+            'signature': list(parsed.signature) if parsed.signature else None,
+            'digest': parsed.digest.hex()
+        } for parsed in files],
+        'types': sorted(types, key=types.get)
+    }).encode('utf-8')
+
+    # Sorting the (key, position) pairs keeps the first position of a
+    # duplicate key leftmost, matching the catalog's first-wins lookups
+    id_index = b''.join(INDEX_ENTRY.pack(*entry) for entry in sorted(id_keys))
+    section_index = b''.join(INDEX_ENTRY.pack(*entry) for entry in sorted(section_keys))
+
+    metadata_offset = HEADER.size
+    records_offset = metadata_offset + len(metadata)
+    id_index_offset = records_offset + len(records)
+    section_index_offset = id_index_offset + len(id_index)
+    strings_offset = section_index_offset + len(section_index)
+
+    tmp_path = f"{bundle_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, position, metadata_offset, len(metadata),
+                            records_offset, id_index_offset, section_index_offset, strings_offset))
+        f.write(metadata)
+        f.write(records)
+        f.write(id_index)
+        f.write(section_index)
+        f.write(strings)
+    os.replace(tmp_path, bundle_path)
+    return position
+
+
+@contextmanager
+def bundle_lock(bundle_path: str):
+    """Hold the lock file of ``bundle_path``, so that processes sharing the
+    bundle rebuild it one at a time
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{bundle_path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _IndexKeys(Sequence):
+    """Keys of an on-disk index, for binary search with bisect"""
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __getitem__(self, i: int) -> int:
+        return INDEX_ENTRY.unpack_from(self._buffer, self._offset + i * INDEX_ENTRY.size)[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def position(self, key: int) -> Optional[int]:
+        i = bisect_left(self, key)
+        if i == self._count:
+            return None
+        found, position = INDEX_ENTRY.unpack_from(self._buffer, self._offset + i * INDEX_ENTRY.size)
+        return position if found == key else None
+
+
+class CatalogBundle:
+    """Read-only, memory-mapped view of a bundle file"""
+
+    def __init__(self, bundle_path: str):
+        self.path = bundle_path
+        try:
+            with open(bundle_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"Cannot open bundle {bundle_path}: {e}") from e
+
+        if len(self._mmap) < HEADER.size:
+            raise BundleError(f"Bundle {bundle_path} is truncated")
+        (magic, version, self.count, metadata_offset, metadata_length, self._records_offset,
+         id_index_offset, section_index_offset, self._strings_offset) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise BundleError(f"{bundle_path} is not a version {VERSION} diagram bundle")
+        if self._strings_offset > len(self._mmap):
+            raise BundleError(f"Bundle {bundle_path} is truncated")
+
+        metadata = json.loads(self._mmap[metadata_offset:metadata_offset + metadata_length])
+        self.sources: List[Dict] = metadata['sources']
+        self._types: List[str] = metadata['types']
+        self._source_paths: List[str] = [source['path'] for source in self.sources]
+        self._ids = _IndexKeys(self._mmap, id_index_offset, self.count)
+        self._sections = _IndexKeys(self._mmap, section_index_offset, self.count)
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._mmap[start:start + length].decode('utf-8')
+
+    def record(self, position: int) -> DiagramRecord:
+        """Materialize the diagram stored at ``position``, decoding its text"""
+        (diagram_id, section, type_index, source_index, title_offset, title_length,
+         content_offset, content_length) = RECORD.unpack_from(
+            self._mmap, self._records_offset + position * RECORD.size)
+        return DiagramRecord(diagram_id, self._text(title_offset, title_length),
+                             self._text(content_offset, content_length),
+                             self._types[type_index], section, self._source_paths[source_index])
+
+    def type_positions(self) -> Dict[str, array]:
+        """Positions of the diagrams of each type, read from the record table alone"""
+        positions: Dict[str, array] = {}
+        table = self._mmap[self._records_offset:self._records_offset + self.count * RECORD.size]
+        for position, fields in enumerate(RECORD.iter_unpack(table)):
+            type_name = self._types[fields[2]]
+            entry = positions.get(type_name)
+            if entry is None:
+                entry = positions[type_name] = array('I')
+            entry.append(position)
+        return positions
+
+    def position_of_id(self, diagram_id: int) -> Optional[int]:
+        return self._ids.position(diagram_id)
+
+    def position_of_section(self, section_num: int) -> Optional[int]:
+        return self._sections.position(section_num)
+
+
+class BundleRecords(Sequence):
+    """Lazy sequence of the diagram records in a bundle"""
+
+    def __init__(self, bundle: CatalogBundle):
+        self._bundle = bundle
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._bundle.record(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('diagram index out of range')
+        return self._bundle.record(index)
+
+    def __iter__(self) -> Iterator[DiagramRecord]:
+        return map(self._bundle.record, range(len(self)))
+
+    def __len__(self) -> int:
+        return self._bundle.count
+
+
+class BundleCatalog(DiagramCatalog):
+    """Catalog served straight from a memory-mapped bundle.
+
+    Lookups go through the bundle's on-disk indexes, and the full-text index
+    is built on first use rather than at load, so opening a bundle costs the
+    same whatever the size of the catalog.
+    """
+
+    LAZY_SEARCH_INDEX = True
+
+    def __init__(self, bundle: CatalogBundle):
+        super().__init__()
+        self.bundle = bundle
+        self.records = BundleRecords(bundle)
+        self.sections = SectionList(self.records)
+        self._search_index_lock = threading.Lock()
+        self._type_index = None
+        self._type_index_lock = threading.Lock()
+        self.version = source_version((source['path'], bytes.fromhex(source['digest']))
+                                      for source in bundle.sources)
+        mtimes = [source['signature'][0] for source in bundle.sources if source['signature']]
+        self.last_modified = max(mtimes) / 1e9 if mtimes else None
+
+    @property
+    def search_index(self) -> SearchIndex:
+        if self._search_index is None:
+            with self._search_index_lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex(self.records)
+        return self._search_index
+
+    @search_index.setter
+    def search_index(self, index: Optional[SearchIndex]):
+        self._search_index = index
+
+    def type_index(self) -> Dict[str, Sequence[int]]:
+        if self._type_index is None:
+            with self._type_index_lock:
+                if self._type_index is None:
+                    self._type_index = self.bundle.type_positions()
+        return self._type_index
+
+    def add(self, record: DiagramRecord):
+        raise TypeError('Bundle catalogs are read-only')
+
+    def get_by_id(self, diagram_id: int) -> Optional[DiagramRecord]:
+        position = self.bundle.position_of_id(diagram_id)
+        return None if position is None else self.bundle.record(position)
+
+    def position_of_id(self, diagram_id: int) -> Optional[int]:
+        return self.bundle.position_of_id(diagram_id)
+
+    def get_by_section(self, section_num: int) -> Optional[DiagramRecord]:
+        position = self.bundle.position_of_section(section_num)
+        return None if position is None else self.bundle.record(position)
@@ -0,0 +1,238 @@
+import hashlib
+import sys
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Number of characters of diagram content shown in section previews
+PREVIEW_LENGTH = 100
+
+
+def source_version(sources: Iterable[Tuple[str, bytes]]) -> str:
+    """Version of a catalog built from the given (path, content digest) pairs"""
+    h = hashlib.blake2b(digest_size=8)
+    for path, digest in sources:
+        h.update(path.encode('utf-8'))
+        h.update(b'\0')
+        h.update(digest)
+    return h.hexdigest()
+
+
+class DiagramRecord(Mapping):
+    """Compact, read-only diagram record.
+
+    Behaves like the ``{'id', 'title', 'content', 'type', 'section'}`` dicts the
+    parser used to return (item access, iteration, ``dict(record)``) while storing
+    its fields in slots instead of a per-record hash table. ``source`` is the
+    file the diagram was parsed from; it is not part of the mapping, so the JSON
+    shape of a record is unchanged.
+    """
+
+    FIELDS = ('id', 'title', 'content', 'type', 'section')
+    __slots__ = FIELDS + ('source',)
+
+    def __init__(self, id: int, title: str, content: str, type: str, section: int,
+                 source: Optional[str] = None):
+        self.id = id
+        self.title = title
+        self.content = content
+        # Only a handful of distinct types exist, so share the strings
+        self.type = sys.intern(type)
+        self.section = section
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DiagramRecord':
+        return cls(data['id'], data['title'], data['content'], data['type'], data['section'],
+                   data.get('source'))
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"DiagramRecord(id={self.id!r}, section={self.section!r}, title={self.title!r}, type={self.type!r})"
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def digest(self) -> str:
+        """Hash of everything a client sees of this record"""
+        h = hashlib.blake2b(digest_size=8)
+        for value in (self.id, self.title, self.content, self.type, self.section, self.source):
+            h.update(str(value).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+
+class SectionView(Mapping):
+    """Section entry derived on access from a diagram record"""
+
+    FIELDS = ('number', 'title', 'content_preview')
+    __slots__ = ('_record',)
+
+    def __init__(self, record: DiagramRecord):
+        self._record = record
+
+    @property
+    def number(self) -> int:
+        return self._record.section
+
+    @property
+    def title(self) -> str:
+        return self._record.title
+
+    @property
+    def content_preview(self) -> str:
+        content = self._record.content
+        if len(content) > PREVIEW_LENGTH:
+            return content[:PREVIEW_LENGTH] + '...'
+        return content
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class SectionList(Sequence):
+    """Lazy sequence of section entries backed by the catalog's records"""
+
+    __slots__ = ('_records',)
+
+    def __init__(self, records: List[DiagramRecord]):
+        self._records = records
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SectionView(record) for record in self._records[index]]
+        return SectionView(self._records[index])
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class RecordSubset(Sequence):
+    """Lazy sequence of the records at the given positions"""
+
+    __slots__ = ('_records', '_positions')
+
+    def __init__(self, records: Sequence, positions: Sequence[int]):
+        self._records = records
+        self._positions = positions
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._records[position] for position in self._positions[index]]
+        return self._records[self._positions[index]]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+class DiagramCatalog:
+    """Diagram records plus hash indexes for O(1) lookup by id and section"""
+
+    # Whether the search index is built on first use instead of at load
+    LAZY_SEARCH_INDEX = False
+
+    def __init__(self, records: Iterable[DiagramRecord] = ()):
+        self.records: List[DiagramRecord] = []
+        self.sections = SectionList(self.records)
+        self._by_id: Dict[int, DiagramRecord] = {}
+        self._positions: Dict[int, int] = {}
+        self._by_section: Dict[int, DiagramRecord] = {}
+        self._by_type: Dict[str, array] = {}
+        # Full-text index over the records, attached by the parser once loaded
+        self.search_index = None
+        # Trigram index for autocomplete, built on first use
+        self._suggest_index = None
+        self._suggest_index_lock = threading.Lock()
+        # Identifies the catalog's content (for HTTP validators), and the newest
+        # modification time of its sources as a Unix timestamp, if known
+        self.version: Optional[str] = None
+        self.last_modified: Optional[float] = None
+        for record in records:
+            self.add(record)
+
+    def add(self, record: DiagramRecord):
+        """Append a record and index it (the first record wins for duplicate keys)"""
+        positions = self._by_type.get(record.type)
+        if positions is None:
+            positions = self._by_type[record.type] = array('I')
+        positions.append(len(self.records))
+        self.records.append(record)
+        self._by_id.setdefault(record.id, record)
+        self._positions.setdefault(record.id, len(self.records) - 1)
+        self._by_section.setdefault(record.section, record)
+
+    @property
+    def suggest_index(self):
+        if self._suggest_index is None:
+            # Imported here: the index module depends on this one
+            from utils.suggest_index import SuggestIndex
+            with self._suggest_index_lock:
+                if self._suggest_index is None:
+                    self._suggest_index = SuggestIndex(self.records)
+        return self._suggest_index
+
+    def content_version(self) -> str:
+        """Version derived from the records themselves, for catalogs without source files"""
+        h = hashlib.blake2b(digest_size=8)
+        for record in self.records:
+            h.update(record.digest().encode('ascii'))
+        return h.hexdigest()
+
+    def get_by_id(self, diagram_id: int) -> Optional[DiagramRecord]:
+        return self._by_id.get(diagram_id)
+
+    def position_of_id(self, diagram_id: int) -> Optional[int]:
+        return self._positions.get(diagram_id)
+
+    def neighbors(self, diagram_id: int) -> Tuple[Optional[DiagramRecord], Optional[DiagramRecord]]:
+        """The diagrams before and after a diagram in catalog order. Ids are not
+        contiguous across the files of a multi-file catalog.
+        """
+        position = self.position_of_id(diagram_id)
+        if position is None:
+            return None, None
+        return (self.records[position - 1] if position > 0 else None,
+                self.records[position + 1] if position + 1 < len(self.records) else None)
+
+    def type_index(self) -> Dict[str, Sequence[int]]:
+        """Positions of the records of each diagram type, in catalog order"""
+        return self._by_type
+
+    def get_by_type(self, diagram_type: str) -> 'RecordSubset':
+        return RecordSubset(self.records, self.type_index().get(diagram_type, ()))
+
+    def type_counts(self) -> List[Tuple[str, int]]:
+        """(type, number of diagrams) pairs, most common type first"""
+        counts = [(diagram_type, len(positions)) for diagram_type, positions in self.type_index().items()]
+        return sorted(counts, key=lambda item: (-item[1], item[0]))
+
+    def get_by_section(self, section_num: int) -> Optional[DiagramRecord]:
+        return self._by_section.get(section_num)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[DiagramRecord]:
+        return iter(self.records)
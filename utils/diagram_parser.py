@@ -1,227 +1,665 @@
+import glob
+import hashlib
+import io
+import logging
+import os
 import re
-from typing import List, Dict, Optional
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from utils.bundle import BundleCatalog, BundleError, CatalogBundle, bundle_lock, write_bundle
+from utils.catalog import DiagramCatalog, DiagramRecord, source_version
+from utils.diagram_types import detect_diagram_type
+from utils.search_index import SearchIndex, SearchResult
+from utils.suggest_index import Suggestion
+
+logger = logging.getLogger(__name__)
+
+# Size of the read buffer used when streaming reference files
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Diagram ids. A single reference file numbers its diagrams 1, 2, 3... In
+# multi-file mode (DIAGRAM_FILE names a directory or a glob pattern) every file
+# owns a block of FILE_ID_BLOCK ids instead, picked by hashing its path relative
+# to the directory (or to the leading directories of the pattern that contain
+# no wildcard) into one of FILE_ID_SLOTS slots, and numbers its diagrams from
+# the start of that block. A file's ids thus depend only on its own relative
+# path: adding, removing or renaming other files leaves them alone, while
+# moving or renaming the file itself gives it new ones. The slots are sparse
+# enough that a thousand files collide with odds of about 1 in 20000; a
+# collision is reported as an error, to be resolved by renaming one of the
+# files, rather than moving either file's ids. All ids stay below 2**53, so
+# JavaScript reads them exactly.
+FILE_ID_BLOCK = 100_000
+FILE_ID_SLOTS = 10 ** 10
+
+# A section starts with a line such as "12. Some Title", possibly indented
+SECTION_HEADER = re.compile(r'\s*(\d+)\.\s+(\S.*)')
+
+
+class HashingReader(io.RawIOBase):
+    """Raw reader that feeds every byte it reads into a hash object"""
+    
+    def __init__(self, raw, digest):
+        self._raw = raw
+        self._digest = digest
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        n = self._raw.readinto(buffer)
+        if n:
+            self._digest.update(memoryview(buffer)[:n])
+        return n
+    
+    def close(self):
+        try:
+            self._raw.close()
+        finally:
+            super().close()
+
+
+def iter_lines(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, digest=None) -> Iterator[str]:
+    """Yield the lines of a file (without newlines), reading it in fixed-size chunks.
+    
+    If a hashlib object is given as ``digest`` it is updated with the raw bytes
+    of the file as they are read.
+    """
+    raw = open(file_path, 'rb', buffering=0)
+    if digest is not None:
+        raw = HashingReader(raw, digest)
+    with io.TextIOWrapper(io.BufferedReader(raw, chunk_size), encoding='utf-8') as f:
+        remainder = ''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines = (remainder + chunk).split('\n')
+            remainder = lines.pop()
+            yield from lines
+        if remainder:
+            yield remainder
+
+
+class RawSection(NamedTuple):
+    number: int
+    title: str
+    lines: List[str]
+
+    def digest(self) -> bytes:
+        """Hash of the section's title and unparsed body, used to detect edits"""
+        h = hashlib.blake2b(self.title.encode('utf-8'), digest_size=16)
+        h.update(b'\0')
+        h.update('\n'.join(self.lines).encode('utf-8'))
+        return h.digest()
+
+
+def iter_sections(lines: Iterable[str]) -> Iterator[RawSection]:
+    """Split reference-file lines into sections without parsing their bodies.
+    
+    A section is a "N. Title" line; the title runs until the next blank line and
+    everything up to the next header is the section body. Lines before the first
+    header are ignored.
+    """
+    section_num = None
+    title = ''
+    body_lines = []
+    # Header lines seen since the last blank line; a header only counts once
+    # its title is terminated by a blank line.
+    header_lines = []
+    
+    for line in lines:
+        if header_lines:
+            if line.strip():
+                header_lines.append(line)
+                continue
+            if section_num is not None:
+                yield RawSection(section_num, title, body_lines)
+            match = SECTION_HEADER.match(header_lines[0])
+            section_num = int(match.group(1))
+            title = '\n'.join([match.group(2)] + header_lines[1:]).strip()
+            body_lines = []
+            header_lines = []
+            continue
+        
+        if SECTION_HEADER.match(line):
+            header_lines.append(line)
+        else:
+            body_lines.append(line)
+    
+    if section_num is not None:
+        # An unterminated header at end of file belongs to the previous body
+        yield RawSection(section_num, title, body_lines + header_lines)
+
+
+def parse_section_body(lines: List[str]) -> str:
+    """Diagram content of a section: stripped body lines with blank lines dropped"""
+    return '\n'.join(line for line in map(str.strip, lines) if line)
+
+
+def parse_lines(lines: Iterable[str], detect_type: Callable[[str], str], first_id: int = 1,
+                source: Optional[str] = None) -> Iterator[DiagramRecord]:
+    """Turn reference-file lines into diagram records in a single pass.
+    
+    Sections with an empty body are skipped, and ids are assigned sequentially
+    from ``first_id`` to the diagrams that remain.
+    """
+    next_id = first_id
+    for section in iter_sections(lines):
+        content = parse_section_body(section.lines)
+        if content:
+            yield DiagramRecord(next_id, section.title, content, detect_type(content), section.number, source)
+            next_id += 1
+
+
+def iter_diagrams(file_path: str, detect_type: Optional[Callable[[str], str]] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, first_id: int = 1) -> Iterator[DiagramRecord]:
+    """Stream diagram records from a reference file with bounded memory"""
+    if detect_type is None:
+        detect_type = DiagramParser.detect_diagram_type
+    return parse_lines(iter_lines(file_path, chunk_size), detect_type, first_id, file_path)
+
+
+def new_file_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_digest(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+    """Content hash of a file, read in fixed-size chunks"""
+    h = new_file_hash()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """Cheap change marker for a file: (mtime in ns, size), or None if it is missing"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ParsedSection(NamedTuple):
+    digest: bytes
+    number: int
+    title: str
+    content: str
+    type: str
+
+
+class ParsedFile(NamedTuple):
+    """Everything parsed out of one reference file, in a picklable form"""
+    path: str
+    signature: Optional[Tuple[int, int]]
+    digest: bytes
+    sections: List[ParsedSection]
+
+
+def is_multi_file(spec: str) -> bool:
+    """Whether a DIAGRAM_FILE setting names a directory or glob pattern rather than one file"""
+    return os.path.isdir(spec) or any(char in spec for char in '*?[')
+
+
+class IdCollisionError(ValueError):
+    """Raised when two files of a multi-file catalog hash to the same block of ids"""
+
+
+def source_root(spec: str) -> str:
+    """The directory that the paths of a multi-file DIAGRAM_FILE setting are relative to"""
+    root = spec
+    while any(char in root for char in '*?['):
+        root = os.path.dirname(root)
+    return root or os.curdir
+
+
+def file_id_bases(paths: Iterable[str], root: str) -> Dict[str, int]:
+    """The id preceding each file's block of diagram ids in multi-file mode.
+    
+    Raises IdCollisionError when two files hash to the same block.
+    """
+    bases = {}
+    owners = {}
+    for path in sorted(paths):
+        name = os.path.relpath(path, root).replace(os.sep, '/')
+        slot = int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'big') % FILE_ID_SLOTS
+        if slot in owners:
+            raise IdCollisionError(f"{owners[slot]} and {name} hash to the same block of diagram ids; "
+                             f"rename one of them")
+        owners[slot] = name
+        bases[path] = slot * FILE_ID_BLOCK
+    return bases
+
+
+def source_id_bases(spec: str, paths: Iterable[str]) -> Optional[Dict[str, int]]:
+    """Id blocks of the files named by ``spec``, or None to number diagrams from 1"""
+    return file_id_bases(paths, source_root(spec)) if is_multi_file(spec) else None
+
+
+def resolve_sources(spec: str) -> List[str]:
+    """Files named by a DIAGRAM_FILE setting.
+    
+    ``spec`` may be a single file, a directory (every ``*.txt`` file in it) or a
+    glob pattern. Multiple files are returned in sorted order.
+    """
+    if os.path.isdir(spec):
+        return sorted(glob.glob(os.path.join(spec, '*.txt')))
+    if any(char in spec for char in '*?['):
+        return sorted(path for path in glob.glob(spec) if os.path.isfile(path))
+    return [spec]
+
+
+def parse_file(file_path: str, previous: Optional[ParsedFile] = None) -> Tuple[ParsedFile, int, int]:
+    """Parse one reference file, reusing the sections of ``previous`` that did not change.
+    
+    Runs in worker processes during parallel loads, so it only takes and
+    returns picklable values. Returns the parsed file along with the number of
+    sections that were parsed and the number taken over from ``previous``.
+    """
+    signature = file_signature(file_path)
+    known = {section.digest: section for section in previous.sections} if previous else {}
+    file_hash = new_file_hash()
+    sections = []
+    reparsed = reused = 0
+    
+    for raw in iter_sections(iter_lines(file_path, digest=file_hash)):
+        digest = raw.digest()
+        section = known.get(digest)
+        if section is None:
+            content = parse_section_body(raw.lines)
+            if not content:
+                continue
+            section = ParsedSection(digest, raw.number, raw.title, content,
+                                    DiagramParser.detect_diagram_type(content))
+            reparsed += 1
+        else:
+            section = section._replace(number=raw.number)
+            reused += 1
+        sections.append(section)
+    
+    return ParsedFile(file_path, signature, file_hash.digest(), sections), reparsed, reused
+
+
+def parse_files(paths: List[str], workers: Optional[int] = None) -> List[ParsedFile]:
+    """Parse every source file, spreading them over a process pool when there are several"""
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers < 2:
+        return [parse_file(path)[0] for path in paths]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [parsed for parsed, _, _ in pool.map(parse_file, paths)]
+
+
+def build_bundle(spec: str, bundle_path: str, workers: Optional[int] = None) -> List[ParsedFile]:
+    """Parse the reference file(s) named by ``spec`` and compile them into a bundle"""
+    paths = resolve_sources(spec)
+    files = parse_files(paths, workers)
+    with bundle_lock(bundle_path):
+        write_bundle(bundle_path, files, source_id_bases(spec, paths))
+    return files
+
 
 class DiagramParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, workers: Optional[int] = None, bundle_path: Optional[str] = None):
         self.file_path = file_path
-        self.sections = []
-        self.diagrams = []
+        # Processes used to parse multi-file catalogs (defaults to the CPU count)
+        self.workers = workers
+        # Precompiled bundle to serve from; rebuilt whenever it is stale
+        self.bundle_path = bundle_path
+        self.set_catalog(DiagramCatalog())
+        
+        # Reload bookkeeping: the parsed form of every source file the current
+        # catalog was built from, keyed by path
+        self._files: Dict[str, ParsedFile] = {}
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+        self._watcher = None
+        self._reload_listeners: List[Callable[[DiagramCatalog], None]] = []
+        self.reload_stats = {
+            'reloads': 0,
+            'last_duration_ms': 0.0,
+            'total_duration_ms': 0.0,
+            'sections_reparsed': 0,
+            'sections_reused': 0,
+            'load_duration_ms': 0.0
+        }
+        
         self.load_file()
     
+    @property
+    def diagrams(self) -> List[DiagramRecord]:
+        return self.catalog.records
+    
+    @property
+    def sections(self):
+        return self.catalog.sections
+    
+    @property
+    def search_index(self) -> SearchIndex:
+        return self.catalog.search_index
+    
     def load_file(self):
-        """Load and parse the mermaid reference file"""
+        """Load and parse the mermaid reference file(s) in a single streaming pass"""
+        start = time.perf_counter()
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            print(f"File loaded. Content length: {len(content)} characters")
-            
-            # If file is empty, use sample data
-            if not content.strip():
-                print("File is empty, loading sample data")
-                self.load_sample_data()
-                return
+            paths = resolve_sources(self.file_path)
+            if self.bundle_path:
+                catalog, files = self._load_bundle(paths)
+            else:
+                files = parse_files(paths, self.workers)
+                catalog = self._build_catalog(files, source_id_bases(self.file_path, paths))
+            self._files = {parsed.path: parsed for parsed in files}
+            self.set_catalog(catalog)
             
-            # NEW APPROACH: Find sections by looking for numbered headings followed by newline
-            # Pattern to find "X. Title" where X is a number
-            section_pattern = r'(\n|^)(\d+)\.\s+(.+?)\n\n'
-            matches = list(re.finditer(section_pattern, content, re.DOTALL))
-            
-            print(f"Found {len(matches)} sections using pattern matching")
-            
-            if not matches:
-                # Try alternative pattern
-                section_pattern = r'^(\d+)\.\s+(.+?)$'
-                matches = list(re.finditer(section_pattern, content, re.MULTILINE))
-                print(f"Found {len(matches)} sections using alternative pattern")
-            
-            for i, match in enumerate(matches):
-                section_num = int(match.group(2))
-                title = match.group(3).strip()
-                
-                # Find the content for this section (until next section or end of file)
-                start_pos = match.end()
-                if i + 1 < len(matches):
-                    end_pos = matches[i + 1].start()
-                else:
-                    end_pos = len(content)
-                
-                section_content = content[start_pos:end_pos].strip()
-                
-                if section_content:
-                    # Extract diagram content (skip any blank lines at start)
-                    lines = section_content.split('\n')
-                    diagram_lines = []
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if line:  # Skip empty lines
-                            diagram_lines.append(line)
-                    
-                    diagram_content = '\n'.join(diagram_lines)
-                    
-                    if diagram_content:
-                        diagram_type = self.detect_diagram_type(diagram_content)
-                        
-                        diagram_data = {
-                            'id': len(self.diagrams) + 1,
-                            'title': title,
-                            'content': diagram_content,
-                            'type': diagram_type,
-                            'section': section_num
-                        }
-                        
-                        self.diagrams.append(diagram_data)
-                        
-                        self.sections.append({
-                            'number': section_num,
-                            'title': title,
-                            'content_preview': diagram_content[:100] + '...' if len(diagram_content) > 100 else diagram_content
-                        })
-                        
-                        print(f"Parsed diagram {section_num}: {title} ({diagram_type})")
-            
-            print(f"Successfully parsed {len(self.diagrams)} diagrams")
-            
-            # If no diagrams were parsed, try a simpler approach
-            if len(self.diagrams) == 0:
-                print("Trying simpler parsing approach...")
-                self.simple_parse(content)
+            if len(files) > 1:
+                logger.info(f"Successfully parsed {len(self.diagrams)} diagrams from {len(files)} files")
+            else:
+                logger.info(f"Successfully parsed {len(self.diagrams)} diagrams")
             
-            # If still no diagrams, load sample data
+            # If no diagrams were parsed, load sample data
             if len(self.diagrams) == 0:
-                print("No diagrams found in file, loading sample data")
+                logger.warning("No diagrams found in file, loading sample data")
                 self.load_sample_data()
                 
         except FileNotFoundError:
-            print(f"Warning: File {self.file_path} not found. Using sample data.")
+            logger.warning(f"File {self.file_path} not found. Using sample data.")
             self.load_sample_data()
+        except IdCollisionError:
+            # Serving sample data would hide a catalog that needs fixing;
+            # a reload keeps the current catalog instead
+            raise
         except Exception as e:
-            print(f"Error parsing file: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error parsing file: {e}")
             self.load_sample_data()
+        self.reload_stats['load_duration_ms'] = (time.perf_counter() - start) * 1000
     
-    def simple_parse(self, content: str):
-        """Simpler parsing approach for problematic files"""
-        # Split by double newlines to get sections
-        sections = content.strip().split('\n\n')
+    def _load_bundle(self, paths: List[str]) -> Tuple[DiagramCatalog, List[ParsedFile]]:
+        """Open the catalog bundle, rebuilding it first if it is missing or stale.
         
-        print(f"Simple parse: Found {len(sections)} potential sections")
+        Returns the catalog along with the source files it was built from
+        (without their sections, which live in the bundle).
+        """
+        try:
+            bundle = CatalogBundle(self.bundle_path)
+        except BundleError as e:
+            logger.info(f"{e}; building it from {self.file_path}")
+        else:
+            files = self._bundle_sources(bundle, paths)
+            if files is not None:
+                logger.info(f"Loaded diagram bundle {self.bundle_path}")
+                return BundleCatalog(bundle), files
+            logger.info(f"Bundle {self.bundle_path} is stale, rebuilding it from {self.file_path}")
         
-        current_section = None
-        current_title = None
-        current_content = []
+        catalog, files, _ = self._rebuild_bundle(paths, self.workers)
+        return catalog, files
+    
+    def _rebuild_bundle(self, paths: List[str], workers: Optional[int],
+                        skip_empty: bool = False) -> Tuple[Optional[BundleCatalog], List[ParsedFile], int]:
+        """Rebuild the bundle from ``paths`` and map it, unless another process
+        sharing it did so while this one waited for its lock.
         
-        for section in sections:
-            section = section.strip()
-            if not section:
-                continue
-                
-            # Check if this section starts with a number and dot (e.g., "1. Title")
-            if re.match(r'^\d+\.\s+', section):
-                # Save previous section if exists
-                if current_section is not None and current_content:
-                    diagram_content = '\n'.join(current_content)
-                    if diagram_content.strip():
-                        diagram_type = self.detect_diagram_type(diagram_content)
-                        
-                        diagram_data = {
-                            'id': len(self.diagrams) + 1,
-                            'title': current_title,
-                            'content': diagram_content,
-                            'type': diagram_type,
-                            'section': current_section
-                        }
-                        
-                        self.diagrams.append(diagram_data)
-                        
-                        self.sections.append({
-                            'number': current_section,
-                            'title': current_title,
-                            'content_preview': diagram_content[:100] + '...' if len(diagram_content) > 100 else diagram_content
-                        })
-                
-                # Start new section
-                match = re.match(r'^(\d+)\.\s+(.+)$', section, re.DOTALL)
-                if match:
-                    current_section = int(match.group(1))
-                    current_title = match.group(2).strip()
-                    current_content = []
-                else:
-                    # Try to extract title from first line
-                    lines = section.split('\n')
-                    if lines:
-                        first_line = lines[0]
-                        match = re.match(r'^(\d+)\.\s+(.+)$', first_line)
-                        if match:
-                            current_section = int(match.group(1))
-                            current_title = match.group(2).strip()
-                            current_content = lines[1:] if len(lines) > 1 else []
-            elif current_section is not None:
-                # This is part of the current section
-                current_content.append(section)
+        Returns the catalog, the source files without their sections and the
+        number of sections parsed. The catalog is None, and the bundle left
+        alone, when ``skip_empty`` is set and the sources hold no diagrams.
+        """
+        with bundle_lock(self.bundle_path):
+            try:
+                bundle = CatalogBundle(self.bundle_path)
+            except BundleError:
+                files = None
+            else:
+                files = self._bundle_sources(bundle, paths)
+            if files is not None:
+                logger.info(f"Bundle {self.bundle_path} is already up to date, mapping it")
+                return BundleCatalog(bundle), files, 0
+            
+            files = parse_files(paths, workers)
+            parsed_sections = sum(len(parsed.sections) for parsed in files)
+            sources = [parsed._replace(sections=[]) for parsed in files]
+            if skip_empty and parsed_sections == 0:
+                return None, sources, 0
+            write_bundle(self.bundle_path, files, source_id_bases(self.file_path, paths))
+        return BundleCatalog(CatalogBundle(self.bundle_path)), sources, parsed_sections
+    
+    @staticmethod
+    def _bundle_sources(bundle: CatalogBundle, paths: List[str]) -> Optional[List[ParsedFile]]:
+        """The bundle's source files if they match ``paths`` on disk, else None.
         
-        # Don't forget the last section
-        if current_section is not None and current_content:
-            diagram_content = '\n'.join(current_content)
-            if diagram_content.strip():
-                diagram_type = self.detect_diagram_type(diagram_content)
-                
-                diagram_data = {
-                    'id': len(self.diagrams) + 1,
-                    'title': current_title,
-                    'content': diagram_content,
-                    'type': diagram_type,
-                    'section': current_section
-                }
-                
-                self.diagrams.append(diagram_data)
-                
-                self.sections.append({
-                    'number': current_section,
-                    'title': current_title,
-                    'content_preview': diagram_content[:100] + '...' if len(diagram_content) > 100 else diagram_content
-                })
+        A source whose mtime or size differs is still current if its content hash
+        matches. A bundle deployed without any of its sources is served as is.
+        """
+        if not any(file_signature(path) for path in paths):
+            logger.warning(f"Sources of {bundle.path} not found, serving the bundle as is")
+            return []
+        if [source['path'] for source in bundle.sources] != paths:
+            return None
         
-        print(f"Simple parse successfully extracted {len(self.diagrams)} diagrams")
+        files = []
+        for source in bundle.sources:
+            path = source['path']
+            signature = file_signature(path)
+            digest = bytes.fromhex(source['digest'])
+            recorded = tuple(source['signature']) if source['signature'] else None
+            if signature != recorded and (signature is None or file_digest(path) != digest):
+                return None
+            files.append(ParsedFile(path, signature, digest, []))
+        return files
     
-    def detect_diagram_type(self, content: str) -> str:
-        """Detect the type of diagram"""
-        content = content.strip()
+    @staticmethod
+    def _build_catalog(files: List[ParsedFile], id_bases: Optional[Dict[str, int]] = None) -> DiagramCatalog:
+        """Merge parsed files into one catalog, numbering diagrams across all
+        files or, with ``id_bases``, from the start of each file's id block
+        """
+        catalog = DiagramCatalog()
+        for parsed in files:
+            base = id_bases[parsed.path] if id_bases is not None else len(catalog)
+            if id_bases is not None and len(parsed.sections) >= FILE_ID_BLOCK:
+                logger.warning(f"{parsed.path} has more than {FILE_ID_BLOCK - 1} diagrams; "
+                               f"the ids of the rest run into the next block")
+            for number, section in enumerate(parsed.sections, base + 1):
+                catalog.add(DiagramRecord(number, section.title, section.content,
+                                          section.type, section.number, parsed.path))
+        catalog.version = source_version((parsed.path, parsed.digest) for parsed in files)
+        mtimes = [parsed.signature[0] for parsed in files if parsed.signature]
+        catalog.last_modified = max(mtimes) / 1e9 if mtimes else None
+        return catalog
+    
+    def set_catalog(self, catalog: DiagramCatalog):
+        """Build the catalog's search index and install it.
         
-        if content.startswith('graph'):
-            return 'graph'
-        elif content.startswith('flowchart'):
-            return 'flowchart'
-        elif content.startswith('sequenceDiagram'):
-            return 'sequence'
-        elif content.startswith('erDiagram'):
-            return 'er'
-        elif content.startswith('stateDiagram'):
-            return 'state'
-        elif content.startswith('classDiagram'):
-            return 'class'
-        elif content.startswith('gantt'):
-            return 'gantt'
-        elif content.startswith('pie'):
-            return 'pie'
-        else:
-            # Try to detect from content
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith('graph'):
-                    return 'graph'
-                elif line.startswith('flowchart'):
-                    return 'flowchart'
-                elif line.startswith('sequenceDiagram'):
-                    return 'sequence'
-                elif line.startswith('erDiagram'):
-                    return 'er'
-                elif line.startswith('stateDiagram'):
-                    return 'state'
-            return 'unknown'
+        The catalog and its index are swapped in with a single attribute
+        assignment, so concurrent readers see either the old or the new
+        catalog, never a partially built one.
+        """
+        if catalog.version is None:
+            catalog.version = catalog.content_version()
+        if not catalog.LAZY_SEARCH_INDEX:
+            catalog.search_index = SearchIndex(catalog.records)
+        self.catalog = catalog
+    
+    def _source_signatures(self) -> Dict[str, Tuple[int, int]]:
+        signatures = {}
+        for path in resolve_sources(self.file_path):
+            signature = file_signature(path)
+            if signature is not None:
+                signatures[path] = signature
+        return signatures
+    
+    def check_for_changes(self, min_interval: float = 0.0) -> bool:
+        """Reload the catalog if a source file changed since it was parsed.
+        
+        The check is one ``stat`` call per source file and runs at most once per
+        ``min_interval`` seconds. Only one thread reloads at a time; the others
+        keep serving the current catalog. Returns True if a new catalog was
+        installed.
+        """
+        now = time.monotonic()
+        if now - self._last_check < min_interval:
+            return False
+        self._last_check = now
+        
+        signatures = self._source_signatures()
+        current = {path: parsed.signature for path, parsed in self._files.items()}
+        if signatures == current:
+            return False
+        
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            return self.reload(signatures)
+        finally:
+            self._reload_lock.release()
+    
+    def reload(self, signatures: Optional[Dict[str, Tuple[int, int]]] = None) -> bool:
+        """Incrementally reparse changed source files and swap in the new catalog"""
+        start = time.perf_counter()
+        try:
+            if signatures is None:
+                signatures = self._source_signatures()
+            if self.bundle_path:
+                result = self._reload_bundle(signatures)
+            else:
+                result = self._reload_files(signatures)
+            if result is None:
+                return False
+            catalog, reparsed, reused = result
+            self.set_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error reloading {self.file_path}: {e}")
+            return False
+        
+        duration_ms = (time.perf_counter() - start) * 1000
+        stats = self.reload_stats
+        stats['reloads'] += 1
+        stats['last_duration_ms'] = duration_ms
+        stats['total_duration_ms'] += duration_ms
+        stats['sections_reparsed'] += reparsed
+        stats['sections_reused'] += reused
+        
+        logger.info(f"Reloaded {len(catalog)} diagrams from {self.file_path} "
+                    f"(reload #{stats['reloads']}, {duration_ms:.1f} ms, "
+                    f"{reparsed} sections reparsed, {reused} reused)")
+        for listener in self._reload_listeners:
+            try:
+                listener(catalog)
+            except Exception as e:
+                logger.error(f"Reload listener {listener!r} failed: {e}")
+        return True
+    
+    def on_reload(self, listener: Callable[[DiagramCatalog], None]):
+        """Call ``listener`` with every new catalog installed by a reload"""
+        self._reload_listeners.append(listener)
+    
+    def _unchanged_file(self, path: str, signature: Tuple[int, int]) -> Optional[ParsedFile]:
+        """The previously parsed form of ``path`` if its content has not changed"""
+        previous = self._files.get(path)
+        if previous is None:
+            return None
+        if previous.signature == signature:
+            return previous
+        if file_digest(path) == previous.digest:
+            # Touched but not modified
+            return previous._replace(signature=signature)
+        return None
+    
+    def _reload_files(self, signatures: Dict[str, Tuple[int, int]]) -> Optional[Tuple[DiagramCatalog, int, int]]:
+        """Build a new in-memory catalog, reparsing only the sections that changed"""
+        files = []
+        reparsed = reused = 0
+        changed = set(signatures) != set(self._files)
+        for path, signature in signatures.items():
+            parsed = self._unchanged_file(path, signature)
+            if parsed is None:
+                parsed, file_reparsed, file_reused = parse_file(path, self._files.get(path))
+                reparsed += file_reparsed
+                reused += file_reused
+                changed = True
+            files.append(parsed)
+        
+        self._files = {parsed.path: parsed for parsed in files}
+        if not changed:
+            return None
+        
+        catalog = self._build_catalog(files, source_id_bases(self.file_path, signatures))
+        if len(catalog) == 0:
+            logger.warning(f"Reload skipped: no diagrams found in {self.file_path}")
+            return None
+        return catalog, reparsed, reused
+    
+    def _reload_bundle(self, signatures: Dict[str, Tuple[int, int]]) -> Optional[Tuple[DiagramCatalog, int, int]]:
+        """Rebuild the bundle from the sources and map the new one"""
+        files = [self._unchanged_file(path, signature) for path, signature in signatures.items()]
+        if set(signatures) == set(self._files) and None not in files:
+            self._files = {parsed.path: parsed for parsed in files}
+            return None
+        
+        # Sections only live in the bundle, so every source is parsed again.
+        # Serially: a process pool forked from this threaded server could
+        # inherit locks held by other threads
+        catalog, files, reparsed = self._rebuild_bundle(list(signatures), workers=1, skip_empty=True)
+        self._files = {parsed.path: parsed for parsed in files}
+        if catalog is None:
+            logger.warning(f"Reload skipped: no diagrams found in {self.file_path}")
+            return None
+        return catalog, reparsed, 0
+    
+    def start_watcher(self, interval: float = 2.0):
+        """Poll the source files for changes from a background daemon thread.
+        
+        Threads do not survive fork(), so forked children (gunicorn workers of
+        a preloaded app) start a watcher of their own.
+        """
+        if self._watcher is not None:
+            return
+        self._spawn_watcher(interval)
+        os.register_at_fork(after_in_child=lambda: self._spawn_watcher(interval))
+    
+    def _spawn_watcher(self, interval: float):
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.check_for_changes()
+        
+        # A lock held by another thread at fork time would never be released
+        self._reload_lock = threading.Lock()
+        self._watcher = threading.Thread(target=watch, name='diagram-file-watcher', daemon=True)
+        self._watcher.start()
+    
+    def prepare_for_fork(self):
+        """Finish the catalog's lazy work before forking worker processes.
+        
+        Called in a preloading server master, so that workers share what is
+        built here copy-on-write instead of each building a private copy.
+        """
+        self.catalog.search_index
+        self.catalog.suggest_index
+        self.catalog.type_index()
+    
+    def iter_diagrams(self) -> Iterator[DiagramRecord]:
+        """Stream diagram records straight from the source files without building the full list"""
+        if isinstance(self.catalog, BundleCatalog):
+            # Already mapped; records are decoded one at a time
+            yield from self.catalog.records
+            return
+        paths = resolve_sources(self.file_path)
+        id_bases = source_id_bases(self.file_path, paths)
+        next_id = 1
+        for path in paths:
+            if id_bases is not None:
+                next_id = id_bases[path] + 1
+            for record in iter_diagrams(path, self.detect_diagram_type, first_id=next_id):
+                yield record
+                next_id = record.id + 1
+    
+    @staticmethod
+    def detect_diagram_type(content: str) -> str:
+        """Detect the type of diagram"""
+        return detect_diagram_type(content)
     
     def load_sample_data(self):
         """Load sample data if file not found or empty"""
@@ -263,47 +701,46 @@ class DiagramParser:
             }
         ]
         
-        self.diagrams = sample_diagrams
-        self.sections = []
-        for diagram in sample_diagrams:
-            self.sections.append({
-                'number': diagram['section'],
-                'title': diagram['title'],
-                'content_preview': diagram['content'][:100] + '...' if len(diagram['content']) > 100 else diagram['content']
-            })
+        self.set_catalog(DiagramCatalog(DiagramRecord.from_dict(diagram) for diagram in sample_diagrams))
         
-        print("Loaded sample data with 5 diagrams")
+        logger.info("Loaded sample data with 5 diagrams")
     
-    def get_all_diagrams(self) -> List[Dict]:
+    def get_all_diagrams(self) -> List[DiagramRecord]:
         """Get all diagrams"""
-        return self.diagrams
+        return self.catalog.records
     
-    def get_diagram_by_id(self, diagram_id: int) -> Optional[Dict]:
+    def get_diagram_by_id(self, diagram_id: int) -> Optional[DiagramRecord]:
         """Get diagram by ID"""
-        for diagram in self.diagrams:
-            if diagram['id'] == diagram_id:
-                return diagram
-        return None
+        return self.catalog.get_by_id(diagram_id)
     
-    def get_diagram_by_section(self, section_num: int) -> Optional[Dict]:
+    def get_diagram_by_section(self, section_num: int) -> Optional[DiagramRecord]:
         """Get diagram by section number"""
-        for diagram in self.diagrams:
-            if diagram['section'] == section_num:
-                return diagram
-        return None
+        return self.catalog.get_by_section(section_num)
+    
+    def get_neighbors(self, diagram_id: int) -> Tuple[Optional[DiagramRecord], Optional[DiagramRecord]]:
+        """Get the previous and next diagrams in catalog order"""
+        return self.catalog.neighbors(diagram_id)
+    
+    def get_diagrams_by_type(self, diagram_type: str) -> Sequence[DiagramRecord]:
+        """Get the diagrams of one type, in catalog order"""
+        return self.catalog.get_by_type(diagram_type)
+    
+    def get_type_counts(self) -> List[Tuple[str, int]]:
+        """Get the number of diagrams of each type, most common first"""
+        return self.catalog.type_counts()
     
-    def get_all_sections(self) -> List[Dict]:
+    def get_all_sections(self):
         """Get all sections"""
-        return self.sections
+        return self.catalog.sections
     
-    def search_diagrams(self, query: str) -> List[Dict]:
-        """Search diagrams by title or content"""
-        query = query.lower()
-        results = []
-        
-        for diagram in self.diagrams:
-            if (query in diagram['title'].lower() or 
-                query in diagram['content'].lower()):
-                results.append(diagram)
-        
-        return results
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        """Ranked search returning the total match count and one page of diagrams"""
+        return self.catalog.search_index.search(query, limit, offset)
+    
+    def search_diagrams(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[DiagramRecord]:
+        """Search diagrams by title or content, best matches first"""
+        return self.search(query, limit, offset).diagrams
+    
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        """Typo-tolerant title suggestions for a partially typed query"""
+        return self.catalog.suggest_index.suggest(query, limit)
@@ -0,0 +1,137 @@
+"""Mermaid diagram type detection.
+
+A diagram's type is named by the keyword that opens its first meaningful line,
+i.e. the first line that is not blank, part of a YAML frontmatter block, a
+``%%{init: ...}%%`` directive or a ``%%`` comment. Reference files often put a
+line of prose (such as a repeated title) before the diagram itself, so up to
+``MAX_PREAMBLE_LINES`` meaningful lines without a keyword are skipped.
+"""
+import re
+from typing import Dict, Iterator
+
+UNKNOWN_TYPE = 'unknown'
+
+# Opening keyword -> type name. Types the viewer has always known keep their
+# short names (graph, sequence, er, ...), as they appear in URLs and exports.
+DIAGRAM_KEYWORDS: Dict[str, str] = {
+    'graph': 'graph',
+    'flowchart': 'flowchart',
+    'flowchart-elk': 'flowchart',
+    'sequenceDiagram': 'sequence',
+    'classDiagram': 'class',
+    'classDiagram-v2': 'class',
+    'stateDiagram': 'state',
+    'stateDiagram-v2': 'state',
+    'erDiagram': 'er',
+    'journey': 'journey',
+    'gantt': 'gantt',
+    'pie': 'pie',
+    'quadrantChart': 'quadrant',
+    'requirementDiagram': 'requirement',
+    'gitGraph': 'gitgraph',
+    'C4Context': 'c4',
+    'C4Container': 'c4',
+    'C4Component': 'c4',
+    'C4Dynamic': 'c4',
+    'C4Deployment': 'c4',
+    'mindmap': 'mindmap',
+    'timeline': 'timeline',
+    'zenuml': 'zenuml',
+    'sankey': 'sankey',
+    'sankey-beta': 'sankey',
+    'xychart': 'xychart',
+    'xychart-beta': 'xychart',
+    'block': 'block',
+    'block-beta': 'block',
+    'packet': 'packet',
+    'packet-beta': 'packet',
+    'kanban': 'kanban',
+    'architecture': 'architecture',
+    'architecture-beta': 'architecture',
+    'radar-beta': 'radar',
+    'treemap': 'treemap',
+    'treemap-beta': 'treemap'
+}
+
+TYPE_LABELS: Dict[str, str] = {
+    'graph': 'Graph',
+    'flowchart': 'Flowchart',
+    'sequence': 'Sequence',
+    'class': 'Class Diagram',
+    'state': 'State Diagram',
+    'er': 'ER Diagram',
+    'journey': 'User Journey',
+    'gantt': 'Gantt',
+    'pie': 'Pie Chart',
+    'quadrant': 'Quadrant Chart',
+    'requirement': 'Requirement Diagram',
+    'gitgraph': 'Git Graph',
+    'c4': 'C4',
+    'mindmap': 'Mindmap',
+    'timeline': 'Timeline',
+    'zenuml': 'ZenUML',
+    'sankey': 'Sankey',
+    'xychart': 'XY Chart',
+    'block': 'Block Diagram',
+    'packet': 'Packet',
+    'kanban': 'Kanban',
+    'architecture': 'Architecture',
+    'radar': 'Radar',
+    'treemap': 'Treemap',
+    UNKNOWN_TYPE: 'Unknown'
+}
+
+KEYWORD_PATTERN = re.compile(r'[\w-]+')
+
+# Meaningful lines without a diagram keyword skipped before giving up
+MAX_PREAMBLE_LINES = 10
+
+
+def _lines(content: str) -> Iterator[str]:
+    """Lines of ``content``, split off one at a time"""
+    start = 0
+    while True:
+        end = content.find('\n', start)
+        if end < 0:
+            yield content[start:]
+            return
+        yield content[start:end]
+        start = end + 1
+
+
+def detect_diagram_type(content: str) -> str:
+    """Type of a Mermaid diagram, or ``UNKNOWN_TYPE``"""
+    lines = _lines(content)
+    first = True
+    preamble = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if first and line == '---':
+            # YAML frontmatter, up to the closing marker
+            for line in lines:
+                if line.strip() == '---':
+                    break
+            first = False
+            continue
+        first = False
+        if line.startswith('%%'):
+            if line.startswith('%%{') and '}%%' not in line:
+                # Directive spanning several lines
+                for line in lines:
+                    if '}%%' in line:
+                        break
+            continue
+        match = KEYWORD_PATTERN.match(line)
+        diagram_type = DIAGRAM_KEYWORDS.get(match.group()) if match else None
+        if diagram_type is not None:
+            return diagram_type
+        preamble += 1
+        if preamble > MAX_PREAMBLE_LINES:
+            break
+    return UNKNOWN_TYPE
+
+
+def type_label(diagram_type: str) -> str:
+    return TYPE_LABELS.get(diagram_type, diagram_type)
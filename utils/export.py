@@ -0,0 +1,222 @@
+"""Streaming catalog exports with byte-range support.
+
+An export is either NDJSON (one diagram record per line) or a zip archive
+holding one ``.mmd`` file per diagram. Zip entries are stored uncompressed, so
+the size and offset of every entry is known without compressing anything, and
+the archive uses zip64 records once it outgrows the classic format.
+
+Exports are generated diagram by diagram and never held in memory. The first
+complete pass over an export records where each diagram starts (an
+``ExportLayout``); with it, a range request starts generating at the diagram
+containing the first requested byte rather than at the beginning.
+"""
+import re
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+from utils.lru_cache import VersionedLRUCache
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'zip': ('application/zip', 'zip')
+}
+
+# Diagrams encoded per chunk handed to the WSGI server
+EXPORT_BATCH_SIZE = 256
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_OFFSET_EXTRA = struct.Struct('<HHQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END_OF_DIRECTORY = struct.Struct('<IHHHHIIH')
+UTF8_NAMES = 0x0800
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+
+
+class ExportLayout(NamedTuple):
+    positions: Sequence[int]  # catalog positions of the exported diagrams
+    offsets: array            # start of each diagram's bytes, then the end of the last one
+    crcs: Optional[array]     # CRC-32 of each zip entry
+    size: int                 # total length in bytes
+
+    def nbytes(self) -> int:
+        size = self.offsets.itemsize * len(self.offsets)
+        if self.crcs is not None:
+            size += self.crcs.itemsize * len(self.crcs)
+        if isinstance(self.positions, array):
+            size += self.positions.itemsize * len(self.positions)
+        return size
+
+
+class ExportLayoutCache(VersionedLRUCache):
+    """Layouts of the exports of a single catalog version"""
+
+    def entry_size(self, layout: ExportLayout) -> int:
+        return layout.nbytes()
+
+
+def parse_section_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Bounds of ``START-END``, ``START-``, ``-END`` or a single section number"""
+    if not value:
+        return None, None
+    start, dash, end = value.partition('-')
+    try:
+        first = int(start) if start.strip() else None
+        last = int(end) if end.strip() else None
+        if not dash:
+            last = first
+    except ValueError:
+        raise ValueError(f"Invalid section range: {value!r}. Use START-END, START-, -END or N")
+    return first, last
+
+
+def select_positions(records: Sequence, type_positions: Optional[Sequence[int]] = None,
+                     first_section: Optional[int] = None, last_section: Optional[int] = None) -> Sequence[int]:
+    """Positions in ``records`` of the diagrams matching every given filter.
+
+    ``type_positions`` restricts the export to one diagram type: the positions
+    of that type's diagrams, from the catalog's type index.
+    """
+    candidates = range(len(records)) if type_positions is None else type_positions
+    if first_section is None and last_section is None:
+        return candidates
+    return array('I', (position for position in candidates
+                       if (first_section is None or records[position]['section'] >= first_section)
+                       and (last_section is None or records[position]['section'] <= last_section)))
+
+
+def entry_name(record) -> str:
+    slug = re.sub(r'[^a-z0-9]+', '-', record['title'].lower()).strip('-')[:60]
+    return f"{record['id']}-{slug or 'diagram'}.mmd"
+
+
+def _dos_datetime(timestamp: Optional[float]) -> Tuple[int, int]:
+    t = time.gmtime(timestamp if timestamp is not None else 315532800)
+    year = min(max(t.tm_year, 1980), 2107)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _batched(chunks: Iterable[bytes], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield b''.join(batch)
+            batch = []
+    if batch:
+        yield b''.join(batch)
+
+
+def _clip(chunks: Iterable[bytes], offset: int, start: int, stop: int) -> Iterator[bytes]:
+    """The part of ``chunks``, which begin at byte ``offset``, in [start, stop)"""
+    for chunk in chunks:
+        end = offset + len(chunk)
+        if end > start:
+            yield chunk[max(0, start - offset):stop - offset]
+        offset = end
+        if offset >= stop:
+            return
+
+
+class CatalogExport:
+    """One export of the diagrams at ``positions`` in ``records``"""
+
+    def __init__(self, records: Sequence, positions: Sequence[int], export_format: str,
+                 dumps: Callable[[Any], str], timestamp: Optional[float] = None,
+                 layout: Optional[ExportLayout] = None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}. Available: {', '.join(EXPORT_FORMATS)}")
+        self.records = records
+        self.positions = positions
+        self.format = export_format
+        self.layout = layout
+        self._dumps = dumps
+        self._dos_time, self._dos_date = _dos_datetime(timestamp)
+
+    def _encoded(self, first: int = 0) -> Iterator[Tuple[bytes, int]]:
+        """(bytes, CRC-32) of each diagram from the ``first``-th one on"""
+        for i in range(first, len(self.positions)):
+            record = self.records[self.positions[i]]
+            if self.format == 'ndjson':
+                yield (self._dumps(record) + '\n').encode('utf-8'), 0
+                continue
+            data = record['content'].encode('utf-8')
+            name = entry_name(record).encode('utf-8')
+            crc = zlib.crc32(data)
+            header = LOCAL_HEADER.pack(0x04034b50, ZIP_VERSION, UTF8_NAMES, 0, self._dos_time, self._dos_date,
+                                       crc, len(data), len(data), len(name), 0)
+            yield header + name + data, crc
+
+    def _trailer(self, offsets: array, crcs: Optional[array]) -> Iterator[bytes]:
+        """The zip central directory and end records (nothing for NDJSON)"""
+        if self.format != 'zip':
+            return
+        directory_offset = offsets[-1]
+        directory_size = 0
+        for i, position in enumerate(self.positions):
+            name = entry_name(self.records[position]).encode('utf-8')
+            size = offsets[i + 1] - offsets[i] - LOCAL_HEADER.size - len(name)
+            offset = offsets[i]
+            extra = b''
+            if offset >= 0xFFFFFFFF:
+                extra = ZIP64_OFFSET_EXTRA.pack(0x0001, 8, offset)
+                offset = 0xFFFFFFFF
+            entry = CENTRAL_HEADER.pack(0x02014b50, ZIP64_VERSION, ZIP64_VERSION if extra else ZIP_VERSION,
+                                        UTF8_NAMES, 0, self._dos_time, self._dos_date, crcs[i], size, size,
+                                        len(name), len(extra), 0, 0, 0, 0, offset) + name + extra
+            directory_size += len(entry)
+            yield entry
+
+        count = len(self.positions)
+        if count >= 0xFFFF or directory_offset >= 0xFFFFFFFF or directory_size >= 0xFFFFFFFF:
+            zip64_end_offset = directory_offset + directory_size
+            yield ZIP64_END.pack(0x06064b50, ZIP64_END.size - 12, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+                                 count, count, directory_size, directory_offset)
+            yield ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_end_offset, 1)
+            yield END_OF_DIRECTORY.pack(0x06054b50, 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+        else:
+            yield END_OF_DIRECTORY.pack(0x06054b50, 0, 0, count, count, directory_size, directory_offset, 0)
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """The whole export, recording its layout on the way"""
+        offsets = array('Q', [0])
+        crcs = array('I') if self.format == 'zip' else None
+        position = 0
+        for data, crc in self._encoded():
+            yield data
+            position += len(data)
+            offsets.append(position)
+            if crcs is not None:
+                crcs.append(crc)
+        for chunk in self._trailer(offsets, crcs):
+            yield chunk
+            position += len(chunk)
+        self.layout = ExportLayout(self.positions, offsets, crcs, position)
+
+    def chunks(self) -> Iterator[bytes]:
+        return _batched(self.iter_bytes())
+
+    def build_layout(self) -> ExportLayout:
+        """Generate the export once, without keeping it, to learn its layout"""
+        if self.layout is None:
+            for _ in self.iter_bytes():
+                pass
+        return self.layout
+
+    def range_chunks(self, start: int, stop: int) -> Iterator[bytes]:
+        """Bytes [start, stop) of the export; requires its layout"""
+        layout = self.build_layout()
+        entries_end = layout.offsets[-1]
+        if start < entries_end:
+            first = bisect_right(layout.offsets, start) - 1
+            yield from _clip(_batched(data for data, _ in self._encoded(first)),
+                             layout.offsets[first], start, min(stop, entries_end))
+        if stop > entries_end:
+            yield from _clip(_batched(self._trailer(layout.offsets, layout.crcs)),
+                             entries_end, max(start, entries_end), stop)
@@ -0,0 +1,65 @@
+from typing import Callable, Optional
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from utils.lru_cache import VersionedLRUCache
+
+
+class FragmentCache(VersionedLRUCache):
+    """Rendered template fragments of a single catalog version"""
+
+    def entry_size(self, fragment: str) -> int:
+        return len(fragment.encode('utf-8'))
+
+
+class FragmentCacheError(RuntimeError):
+    """Raised in verify mode when a cached fragment differs from a fresh render"""
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', key... %}...{% endcache %}`` template tag.
+
+    The block is rendered once per catalog version and key, then served from
+    ``environment.fragment_cache``. The version comes from calling
+    ``environment.fragment_cache_version``; when it returns None (or no cache
+    is configured) the block is simply rendered.
+
+    A block may only read catalog-wide data, which is the same on every page,
+    and values derived from the keys it lists; anything a view passes in for
+    one page must be part of the key. With ``environment.fragment_cache_verify``
+    set, every hit is rendered again and compared with the cached fragment, so
+    a block that breaks this rule fails the tests rendering it.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_version=lambda: None,
+                           fragment_cache_verify=False)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # Keys are scoped to the template, so fragment names only need to be
+        # unique within one file
+        key = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.Tuple(key, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key: tuple, caller: Callable[[], str]) -> str:
+        cache: Optional[FragmentCache] = self.environment.fragment_cache
+        version = self.environment.fragment_cache_version()
+        if cache is None or version is None:
+            return caller()
+        fragment = cache.get(key, version)
+        if fragment is None:
+            fragment = caller()
+            cache.put(key, version, fragment)
+        elif self.environment.fragment_cache_verify and caller() != fragment:
+            raise FragmentCacheError(f"Cached fragment {key!r} differs from a fresh render; "
+                                     f"it reads page data missing from its key")
+        return fragment
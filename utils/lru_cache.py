@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Computation:
+    """A cache miss being computed, which other threads missing the same key wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error: Optional[BaseException] = None
+
+
+class VersionedLRUCache:
+    """LRU cache bounded by the total size of its entries.
+
+    Entries belong to one catalog version; storing or looking up an entry for
+    a different version drops everything cached for the old one. With a
+    ``ttl``, entries also expire that many seconds after they are stored.
+    Subclasses define how an entry's size is measured.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (entry, expiry time or None)
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Optional[float]]]' = OrderedDict()
+        self._computing: Dict[Hashable, _Computation] = {}
+        self._version = None
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def entry_size(self, entry: Any) -> int:
+        raise NotImplementedError
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+    def _lookup(self, key: Hashable) -> Optional[Any]:
+        """The live entry for ``key``, dropping it if it expired; holds the lock"""
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            self._size -= self.entry_size(entry)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, version: str, entry: Any):
+        size = self.entry_size(entry)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._check_version(version)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= self.entry_size(previous[0])
+            self._entries[key] = (entry, expires)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= self.entry_size(evicted)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, version: str, compute: Callable[[], Any]) -> Any:
+        """The entry for ``key``, computed with ``compute()`` and stored on a miss.
+
+        Concurrent misses for the same key and version are coalesced: one
+        thread computes the entry while the others wait for its result (or
+        its exception).
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            computation = self._computing.get((version, key))
+            leader = computation is None
+            if leader:
+                computation = self._computing[(version, key)] = _Computation()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            computation.done.wait()
+            if computation.error is not None:
+                raise computation.error
+            return computation.entry
+
+        try:
+            computation.entry = compute()
+        except BaseException as e:
+            computation.error = e
+            raise
+        else:
+            self.put(key, version, computation.entry)
+            return computation.entry
+        finally:
+            with self._lock:
+                del self._computing[(version, key)]
+            computation.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,154 @@
+"""Per-request profiling.
+
+A profiled request runs under cProfile. Its time is then broken down by what
+the code was doing: catalog and parser code, Jinja rendering, JSON
+serialization and everything else, each function's own time being counted
+once. Calls into builtins are counted in the group of the code that made them.
+The slowest profiles are kept in a bounded store.
+"""
+import cProfile
+import heapq
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Where a function's source lives -> breakdown group. Jinja compiles
+# templates to code whose file name is the template's.
+PROFILE_GROUPS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('jinja', (f'{os.sep}jinja2{os.sep}', f'{os.sep}markupsafe{os.sep}', '.html')),
+    ('json', (f'{os.sep}json{os.sep}', f'{os.sep}utils{os.sep}streaming.py')),
+    ('parser', tuple(f'{os.sep}utils{os.sep}{module}.py' for module in (
+        'diagram_parser', 'catalog', 'bundle', 'search_index', 'suggest_index', 'diagram_types', 'export')))
+)
+OTHER_GROUP = 'other'
+
+
+def function_group(function: Tuple[str, int, str]) -> Optional[str]:
+    """Breakdown group of a pstats function key, or None for builtins"""
+    filename, _, name = function
+    if filename == '~':
+        return 'json' if '_json' in name else None
+    for group, markers in PROFILE_GROUPS:
+        if any(marker in filename for marker in markers):
+            return group
+    return OTHER_GROUP
+
+
+def time_breakdown(stats: pstats.Stats) -> Dict[str, float]:
+    """Seconds of own time spent in each group"""
+    totals = dict.fromkeys([group for group, _ in PROFILE_GROUPS] + [OTHER_GROUP], 0.0)
+    for function, (_, _, own_time, _, callers) in stats.stats.items():
+        group = function_group(function)
+        if group is not None:
+            totals[group] += own_time
+            continue
+        # A builtin: split its time over the code that called it
+        attributed = 0.0
+        for caller, caller_stats in callers.items():
+            totals[function_group(caller) or OTHER_GROUP] += caller_stats[2]
+            attributed += caller_stats[2]
+        totals[OTHER_GROUP] += max(0.0, own_time - attributed)
+    return totals
+
+
+class RequestProfile(NamedTuple):
+    id: int
+    timestamp: float
+    method: str
+    path: str
+    endpoint: Optional[str]
+    status: int
+    duration_ms: float
+    trigger: str                  # 'requested' or 'sampled'
+    phases_ms: Dict[str, float]   # phases timed by the app (render, serialize, search)
+    breakdown_ms: Dict[str, float]
+    report: str                   # the top functions by cumulative time
+
+    def summary(self) -> Dict:
+        summary = self._asdict()
+        del summary['report']
+        return summary
+
+
+class RequestProfiler:
+    """cProfile run over one request, from its start until its body has been sent.
+
+    One request is profiled at a time per process: from Python 3.12 on, a
+    profiler sees every thread and only one can be active.
+    """
+    _active = threading.Lock()
+
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self._profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profile.enable()
+
+    @classmethod
+    def start(cls, trigger: str) -> Optional['RequestProfiler']:
+        """A running profiler, or None while another request is being profiled"""
+        if not cls._active.acquire(blocking=False):
+            return None
+        try:
+            return cls(trigger)
+        except BaseException:
+            cls._active.release()
+            raise
+
+    def discard(self):
+        self._profile.disable()
+        self._active.release()
+
+    def finish(self, profile_id: int, method: str, path: str, endpoint: Optional[str], status: int,
+               phases: Dict[str, float], report_lines: int = 40) -> RequestProfile:
+        self._profile.disable()
+        duration = time.perf_counter() - self._start
+        self._active.release()
+        stats = pstats.Stats(self._profile)
+        breakdown = time_breakdown(stats)
+
+        report = io.StringIO()
+        stats.stream = report
+        stats.strip_dirs().sort_stats('cumulative').print_stats(report_lines)
+        return RequestProfile(profile_id, time.time(), method, path, endpoint, status,
+                              round(duration * 1000, 3), self.trigger,
+                              {phase: round(seconds * 1000, 3) for phase, seconds in phases.items()},
+                              {group: round(seconds * 1000, 3) for group, seconds in breakdown.items()},
+                              report.getvalue())
+
+
+class ProfileStore:
+    """The ``keep`` slowest request profiles seen by this process"""
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self._heap: List[Tuple[float, int, RequestProfile]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: RequestProfile):
+        item = (profile.duration_ms, profile.id, profile)
+        with self._lock:
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def profiles(self) -> List[RequestProfile]:
+        """Kept profiles, slowest first"""
+        with self._lock:
+            return [profile for _, _, profile in sorted(self._heap, reverse=True)]
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for _, _, profile in self._heap:
+                if profile.id == profile_id:
+                    return profile
+        return None
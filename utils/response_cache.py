@@ -0,0 +1,57 @@
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from utils.lru_cache import VersionedLRUCache
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings() -> List[str]:
+    """Content encodings we can produce, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str, flush: bool = False) -> Iterator[bytes]:
+    """Compress a body chunk by chunk, yielding compressed data as it is produced.
+    
+    With ``flush``, each chunk is flushed through the compressor, so a client
+    reading a streamed body can decode every chunk as soon as it arrives.
+    """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+        sync = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    elif encoding == 'br' and brotli is not None:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish, sync = compressor.process, compressor.finish, compressor.flush
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    for chunk in chunks:
+        part = compress(chunk)
+        if flush:
+            part += sync()
+        if part:
+            yield part
+    part = finish()
+    if part:
+        yield part
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    content_type: str
+    headers: List[Tuple[str, str]]
+
+
+class CompressedResponseCache(VersionedLRUCache):
+    """LRU cache of compressed response bodies bounded by their total size,
+    holding the responses of a single catalog version"""
+
+    def entry_size(self, entry: CachedBody) -> int:
+        return len(entry.body)
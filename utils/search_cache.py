@@ -0,0 +1,26 @@
+"""Cache of serialized search results.
+
+Search traffic concentrates on a few queries, so /api/search keeps the JSON
+bodies of recent result pages. Queries are keyed by their search tokens, so
+differences in case, spacing or punctuation share one entry.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+from utils.lru_cache import VersionedLRUCache
+from utils.search_index import tokenize
+
+
+class CachedSearch(NamedTuple):
+    body: bytes
+    total: int
+
+
+def search_cache_key(query: str, limit: Optional[int], offset: int) -> Tuple:
+    return tuple(tokenize(query)), limit, offset
+
+
+class SearchResultCache(VersionedLRUCache):
+    """Serialized search result pages of a single catalog version"""
+
+    def entry_size(self, entry: CachedSearch) -> int:
+        return len(entry.body)
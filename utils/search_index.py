@@ -0,0 +1,96 @@
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from utils.catalog import DiagramRecord
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# A title occurrence outweighs all but very frequent content occurrences
+TITLE_WEIGHT = 5.0
+# Tokens that only share the query term as a prefix score less than exact matches
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchResult(NamedTuple):
+    total: int
+    diagrams: List[DiagramRecord]
+
+
+class SearchIndex:
+    """Token inverted index over diagram titles and content.
+
+    Each token maps to a posting list of record positions with a precomputed
+    weight. Queries are AND-ed across terms, every term also matches tokens it
+    is a prefix of, and results are ranked by summed weight.
+    """
+
+    def __init__(self, records: Sequence[DiagramRecord]):
+        self.records = records
+        postings: Dict[str, List] = {}
+
+        for position, record in enumerate(records):
+            title_counts = Counter(tokenize(record.title))
+            content_counts = Counter(tokenize(record.content))
+            for token in title_counts.keys() | content_counts.keys():
+                weight = TITLE_WEIGHT * title_counts[token] + math.log1p(content_counts[token])
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = [array('I'), array('f')]
+                entry[0].append(position)
+                entry[1].append(weight)
+
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        """Scores of every record containing a token that starts with ``term``"""
+        scores: Dict[int, float] = {}
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            factor = 1.0 if token == term else PREFIX_WEIGHT
+            positions, weights = self._postings[token]
+            for position, weight in zip(positions, weights):
+                scores[position] = scores.get(position, 0.0) + weight * factor
+        return scores
+
+    def match(self, query: str) -> Dict[int, float]:
+        """Positions of records matching every query term, with their scores"""
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return {}
+
+        # Longer terms tend to have shorter posting lists; start from those
+        matches = self._term_scores(terms[0])
+        for term in terms[1:]:
+            if not matches:
+                break
+            scores = self._term_scores(term)
+            matches = {position: score + scores[position]
+                       for position, score in matches.items() if position in scores}
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        """Return the ranked diagrams for ``query`` between ``offset`` and ``offset + limit``"""
+        matches = self.match(query)
+
+        # Highest score first; ties keep catalog order
+        rank_key = lambda item: (item[1], -item[0])
+        if limit is None:
+            ranked = sorted(matches.items(), key=rank_key, reverse=True)
+        else:
+            ranked = heapq.nlargest(offset + limit, matches.items(), key=rank_key)
+
+        end = None if limit is None else offset + limit
+        return SearchResult(len(matches), [self.records[position] for position, _ in ranked[offset:end]])
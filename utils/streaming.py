@@ -0,0 +1,34 @@
+from typing import Any, Callable, Iterable, Iterator
+
+# Items serialized per chunk handed to the WSGI server; large enough to avoid a
+# write per diagram, small enough to keep memory flat
+STREAM_BATCH_SIZE = 256
+
+
+def _batched(items: Iterable[Any], dumps: Callable[[Any], str], batch_size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def json_array_chunks(items: Iterable[Any], dumps: Callable[[Any], str],
+                      batch_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+    """Serialize ``items`` as one JSON array, a batch of elements at a time"""
+    yield '['
+    separator = ''
+    for batch in _batched(items, dumps, batch_size):
+        yield separator + ','.join(batch)
+        separator = ','
+    yield ']'
+
+
+def ndjson_chunks(items: Iterable[Any], dumps: Callable[[Any], str],
+                  batch_size: int = STREAM_BATCH_SIZE) -> Iterator[str]:
+    """Serialize ``items`` as newline-delimited JSON, a batch of lines at a time"""
+    for batch in _batched(items, dumps, batch_size):
+        yield '\n'.join(batch) + '\n'
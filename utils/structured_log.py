@@ -0,0 +1,42 @@
+import json
+import logging
+import random
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line.
+
+    Structured fields passed as ``extra={'fields': {...}}`` are merged into the
+    object next to the timestamp, level, logger name and message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = 'INFO'):
+    """Send application logs to stderr as JSON lines"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+def sampled(rate: float) -> bool:
+    """True for roughly ``rate`` of calls (always for 1, never for 0)"""
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_event(logger: logging.Logger, message: str, level: int = logging.INFO, **fields):
+    logger.log(level, message, extra={'fields': fields})
+
@@ -0,0 +1,188 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from operator import neg
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Sequence, Set, Tuple
+
+from utils.search_index import tokenize
+
+# Labels, quoted strings and message or transition text after ':' are prose,
+# not identifiers
+LABEL_PATTERN = re.compile(r'\[[^\]]*\]|\([^)]*\)|\{[^}]*\}|"[^"]*"|:.*')
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')
+# Words of camelCase, PascalCase and snake_case identifiers
+IDENTIFIER_PART_PATTERN = re.compile(r'[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])')
+MERMAID_KEYWORDS = frozenset((
+    'graph', 'flowchart', 'subgraph', 'end', 'direction', 'sequencediagram', 'participant', 'actor',
+    'note', 'over', 'loop', 'alt', 'else', 'opt', 'par', 'and', 'rect', 'activate', 'deactivate',
+    'erdiagram', 'statediagram', 'state', 'classdiagram', 'class', 'classdef', 'style', 'linkstyle',
+    'click', 'title', 'section', 'string', 'int', 'float', 'datetime', 'date', 'boolean', 'bool', 'text'
+))
+
+# Identifier matches rank below title matches of the same similarity
+IDENTIFIER_WEIGHT = 0.7
+# Vocabulary words less similar than this to a query word are not matches
+MIN_SIMILARITY = 0.3
+# Most similar vocabulary words considered for each query word
+MAX_EXPANSIONS = 16
+# Match groups scored per word in each pass of a query, all of them in the last
+TIER_DEPTHS = (1, 4, None)
+
+
+def identifiers(content: str) -> Iterator[str]:
+    """Node, participant, entity and state names used in a diagram body, and
+    the words they are made of"""
+    for line in content.splitlines():
+        for name in IDENTIFIER_PATTERN.findall(LABEL_PATTERN.sub(' ', line)):
+            if name.lower() in MERMAID_KEYWORDS:
+                continue
+            yield name.lower()
+            parts = IDENTIFIER_PART_PATTERN.findall(name)
+            if len(parts) > 1:
+                for part in parts:
+                    if len(part) > 2:
+                        yield part.lower()
+
+
+def trigrams(word: str, prefix: bool = False) -> Set[str]:
+    """Trigrams of a word padded like pg_trgm; a prefix has no end padding, so it
+    is fully contained in every word it starts"""
+    padded = f'  {word}' if prefix else f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Suggestion(NamedTuple):
+    id: int
+    title: str
+
+
+class SuggestIndex:
+    """Trigram index over the words of diagram titles and the identifiers in
+    diagram bodies, for typo-tolerant autocomplete.
+
+    Each query word is expanded to the most similar vocabulary words (by shared
+    trigrams, the last word being treated as a prefix still being typed), and
+    diagrams are ranked by their best match for every query word.
+    """
+
+    def __init__(self, records: Sequence):
+        self.records = records
+        word_ids: Dict[str, int] = {}
+        title_postings: List[array] = []
+        identifier_postings: List[array] = []
+
+        def word_id(word: str) -> int:
+            index = word_ids.get(word)
+            if index is None:
+                index = word_ids[word] = len(word_ids)
+                title_postings.append(array('I'))
+                identifier_postings.append(array('I'))
+            return index
+
+        for position, record in enumerate(records):
+            title_words = set(tokenize(record['title']))
+            for word in title_words:
+                title_postings[word_id(word)].append(position)
+            for word in set(identifiers(record['content'])) - title_words:
+                identifier_postings[word_id(word)].append(position)
+
+        trigram_postings: Dict[str, array] = {}
+        trigram_counts = array('H')
+        for word, index in word_ids.items():
+            grams = trigrams(word)
+            trigram_counts.append(len(grams))
+            for gram in grams:
+                entry = trigram_postings.get(gram)
+                if entry is None:
+                    entry = trigram_postings[gram] = array('I')
+                entry.append(index)
+
+        self._title_postings = title_postings
+        self._identifier_postings = identifier_postings
+        self._trigram_postings = trigram_postings
+        self._trigram_counts = trigram_counts
+
+    def _similar_words(self, word: str, prefix: bool) -> List[tuple]:
+        """(similarity, word id) of the vocabulary words most similar to ``word``"""
+        grams = trigrams(word, prefix)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_postings.get(gram, ()))
+
+        candidates = []
+        for index, count in shared.items():
+            jaccard = count / (len(grams) + self._trigram_counts[index] - count)
+            # A prefix only needs to be covered; prefer the shorter completions
+            similarity = 0.8 * count / len(grams) + 0.2 * jaccard if prefix else jaccard
+            if similarity >= MIN_SIMILARITY:
+                candidates.append((similarity, index))
+        return heapq.nlargest(MAX_EXPANSIONS, candidates)
+
+    def _groups(self, word: str, prefix: bool) -> List[Tuple[float, array]]:
+        """(score, positions) of the diagrams matching ``word``, best score first"""
+        groups = []
+        for similarity, index in self._similar_words(word, prefix):
+            groups.append((similarity, self._title_postings[index]))
+            groups.append((similarity * IDENTIFIER_WEIGHT, self._identifier_postings[index]))
+        groups.sort(key=lambda group: group[0], reverse=True)
+        return [group for group in groups if group[1]]
+
+    @staticmethod
+    def _matches(word_groups: List[List[Tuple[float, array]]]) -> Dict[int, float]:
+        """Summed best scores of the diagrams in the groups of every word"""
+        matches = None
+        for groups in word_groups:
+            scores = {}
+            # Worst group first, so better scores overwrite worse ones
+            for score, positions in reversed(groups):
+                if matches is not None:
+                    positions = _intersect(matches, positions)
+                scores.update(dict.fromkeys(positions, score))
+            matches = scores if matches is None else {position: matches[position] + score
+                                                      for position, score in scores.items()}
+            if not matches:
+                break
+        return matches
+
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        """Top ``limit`` diagrams for a partially typed query, best first"""
+        words = tokenize(query)
+        if not words:
+            return []
+        word_groups = [self._groups(word, prefix=i == len(words) - 1) for i, word in enumerate(words)]
+        if not all(word_groups):
+            return []
+        # Narrowest words first, so the others are only checked against few candidates
+        word_groups.sort(key=lambda groups: sum(len(positions) for _, positions in groups))
+        best_total = sum(groups[0][0] for groups in word_groups)
+
+        for depth in TIER_DEPTHS:
+            matches = self._matches([groups[:depth] for groups in word_groups])
+            # Bounded heap of the best matches; ties keep catalog order
+            best = heapq.nlargest(limit, zip(matches.values(), map(neg, matches)))
+            # A diagram left out misses the scored groups of some word, so it
+            # can score at most this; stop once the results beat it
+            bound = max((best_total - groups[0][0] + groups[depth][0]
+                         for groups in word_groups if depth is not None and len(groups) > depth), default=None)
+            if bound is None or (len(best) == limit and best[-1][0] > bound):
+                break
+
+        suggestions = []
+        for _, position in best:
+            record = self.records[-position]
+            suggestions.append(Suggestion(record['id'], record['title']))
+        return suggestions
+
+
+def _intersect(candidates: Dict[int, float], positions: array) -> Iterable[int]:
+    """The ``candidates`` that are in the sorted ``positions``"""
+    if len(candidates) * 16 >= len(positions):
+        return candidates.keys() & positions
+    found = []
+    for position in candidates:
+        i = bisect_left(positions, position)
+        if i < len(positions) and positions[i] == position:
+            found.append(position)
+    return found
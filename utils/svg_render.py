@@ -0,0 +1,386 @@
+"""Server-side rendering of diagrams to SVG.
+
+A renderer turns Mermaid source into SVG. ``SVGCache`` keeps what it renders
+on disk under a hash of the renderer and the source, so a diagram is rendered
+once whatever its id, and the result survives restarts and is shared by every
+worker process; the least recently used files are pruned beyond a size limit.
+``SVGPrerenderer`` fills the cache from a background thread pool whenever the
+catalog changes.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from xml.sax.saxutils import escape
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process prerenders
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class RenderError(Exception):
+    """A diagram could not be rendered"""
+
+
+class SVGRenderer:
+    """Renders Mermaid source to SVG.
+
+    ``fingerprint`` identifies the renderer's output: cached SVGs are only
+    reused by a renderer with the same fingerprint.
+    """
+
+    name = 'renderer'
+
+    @property
+    def fingerprint(self) -> str:
+        return self.name
+
+    def render(self, content: str) -> bytes:
+        raise NotImplementedError
+
+
+class StubRenderer(SVGRenderer):
+    """Placeholder SVGs showing the first line of the source, for tests and development"""
+
+    name = 'stub'
+
+    def render(self, content: str) -> bytes:
+        first_line = content.strip().split('\n', 1)[0]
+        return ('<svg xmlns="http://www.w3.org/2000/svg" width="320" height="40" viewBox="0 0 320 40">'
+                f'<text x="10" y="25">{escape(first_line)}</text></svg>').encode('utf-8')
+
+
+class MermaidCLIRenderer(SVGRenderer):
+    """The mermaid CLI (``mmdc`` from @mermaid-js/mermaid-cli), run once per diagram"""
+
+    name = 'mmdc'
+
+    def __init__(self, command: str = 'mmdc', theme: str = 'default', timeout: float = 30,
+                 puppeteer_config: Optional[str] = None):
+        self.command = command
+        self.theme = theme
+        self.timeout = timeout
+        self.puppeteer_config = puppeteer_config
+        self._version = None
+
+    @staticmethod
+    def available(command: str = 'mmdc') -> bool:
+        return shutil.which(command) is not None
+
+    @property
+    def fingerprint(self) -> str:
+        # Upgrading mermaid changes its output, so the version is part of the key
+        if self._version is None:
+            try:
+                result = subprocess.run([self.command, '--version'], capture_output=True, text=True,
+                                        timeout=self.timeout)
+                self._version = result.stdout.strip() or 'unknown'
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(f"{self.command} --version failed: {e}")
+                self._version = 'unknown'
+        return f"{self.name} {self._version} {self.theme}"
+
+    def render(self, content: str) -> bytes:
+        with tempfile.TemporaryDirectory(prefix='mmdc-') as directory:
+            source = os.path.join(directory, 'diagram.mmd')
+            output = os.path.join(directory, 'diagram.svg')
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(content)
+            command = [self.command, '--quiet', '-i', source, '-o', output, '-t', self.theme, '-b', 'white']
+            if self.puppeteer_config:
+                command += ['-p', self.puppeteer_config]
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+            except (OSError, subprocess.SubprocessError) as e:
+                raise RenderError(str(e)) from e
+            if result.returncode != 0 or not os.path.exists(output):
+                message = (result.stderr or result.stdout).strip().splitlines()
+                raise RenderError(message[-1] if message else f"exit status {result.returncode}")
+            with open(output, 'rb') as f:
+                return f.read()
+
+
+def make_renderer(name: Optional[str], command: str = 'mmdc', timeout: float = 30,
+                  puppeteer_config: Optional[str] = None) -> Optional[SVGRenderer]:
+    """The renderer called ``name``: 'mmdc', 'stub', or 'auto' for mmdc when it
+    is installed. None (or 'none') and an unavailable 'auto' give no renderer.
+    """
+    if not name or name == 'none':
+        return None
+    if name == 'stub':
+        return StubRenderer()
+    if name not in ('mmdc', 'auto'):
+        raise ValueError(f"Unknown SVG renderer: {name}")
+    if not MermaidCLIRenderer.available(command):
+        if name == 'mmdc':
+            logger.warning(f"SVG rendering disabled: {command} not found")
+        return None
+    return MermaidCLIRenderer(command, timeout=timeout, puppeteer_config=puppeteer_config)
+
+
+# A cached file's mtime records when it was last used, refreshed at most this often
+TOUCH_INTERVAL = 3600
+# Pruning deletes the least recently used files down to this share of max_bytes
+PRUNE_TARGET = 0.9
+# Failed renders are retried after retry_seconds, doubling up to this many times
+MAX_RETRY_DOUBLINGS = 6
+# Renders a catalog prerender keeps queued or running at once, per pool thread
+PRERENDER_QUEUE_PER_WORKER = 2
+
+
+class SVGCache:
+    """Rendered SVGs on disk, one file per renderer fingerprint and source.
+
+    With ``max_bytes``, writing past that size deletes the least recently used
+    files. Several processes may share the directory: each tracks the size it
+    knows of, and pruning rescans the directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._size: Optional[int] = None  # scanned on the first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fingerprint: str, content: str) -> str:
+        h = hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=16)
+        h.update(b'\0')
+        h.update(content.encode('utf-8'))
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.svg')
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached SVG for ``key``, or None; marks it as used"""
+        path = self.path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return path
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put(self, key: str, svg: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(svg)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        if self.max_bytes is not None:
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(size for _, size, _ in self._files())
+                else:
+                    self._size += len(svg)
+                if self._size > self.max_bytes:
+                    self._prune()
+
+    def _files(self):
+        """(path, size, mtime) of every cached SVG"""
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for file in os.scandir(entry.path):
+                if file.name.endswith('.svg'):
+                    try:
+                        stat = file.stat()
+                    except OSError:
+                        continue  # pruned by another process
+                    yield file.path, stat.st_size, stat.st_mtime
+
+    def _prune(self):
+        """Delete the least recently used files down to PRUNE_TARGET of max_bytes; holds the lock"""
+        files = sorted(self._files(), key=lambda file: file[2])
+        size = sum(size for _, size, _ in files)
+        target = self.max_bytes * PRUNE_TARGET
+        evicted = 0
+        for path, file_size, _ in files:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= file_size
+            evicted += 1
+        self._size = size
+        self.evictions += evicted
+        if evicted:
+            logger.info(f"Pruned {evicted} SVGs from {self.directory}")
+
+
+class SVGPrerenderer:
+    """Renders diagrams into an ``SVGCache`` from a pool of background threads.
+
+    The renders themselves run in renderer subprocesses, so threads suffice.
+    Of the processes sharing a cache directory, only the one holding its lock
+    file prerenders whole catalogs, from a thread of its own that keeps at
+    most ``PRERENDER_QUEUE_PER_WORKER`` renders per pool thread in flight; any
+    process renders single diagrams that are requested but not cached. A
+    diagram that fails to render is retried
+    ``retry_seconds`` later, then at doubling intervals. Pool threads do not
+    survive fork(), so a forked child starts its own pool when it first needs one.
+    """
+
+    def __init__(self, renderer: SVGRenderer, cache: SVGCache, workers: int = 2, retry_seconds: float = 60):
+        self.renderer = renderer
+        self.cache = cache
+        self.workers = workers
+        self.retry_seconds = retry_seconds
+        self.rendered = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+        self._fingerprint = None
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Set[str] = set()
+        # key -> (failed attempts, monotonic time of the next attempt)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._version = None
+        # A lock file inherited from the parent is the parent's claim, not ours
+        if getattr(self, '_lock_file', None) is not None:
+            self._lock_file.close()
+        self._lock_file = None
+        self._claimed = False
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = self.renderer.fingerprint
+        return self._fingerprint
+
+    def key(self, content: str) -> str:
+        return self.cache.key(self.fingerprint, content)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def lookup(self, content: str) -> Tuple[str, Optional[str]]:
+        """Cache key of a diagram and the path of its cached SVG, or None when
+        it is not cached yet; a miss queues it for rendering
+        """
+        key = self.key(content)
+        path = self.cache.get(key)
+        if path is None:
+            self._submit(key, content)
+        return key, path
+
+    def sync(self, catalog):
+        """Prerender the diagrams of ``catalog`` unless it is the one seen last"""
+        if catalog.version == self._version:
+            return
+        self._version = catalog.version
+        if self._claim():
+            threading.Thread(target=self._prerender, args=(catalog, catalog.version),
+                             name='svg-prerender', daemon=True).start()
+
+    def _claim(self) -> bool:
+        """Whether this process prerenders catalogs for the cache directory"""
+        if self._claimed or fcntl is None:
+            return True
+        os.makedirs(self.cache.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.cache.directory, '.prerender.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self._claimed = True
+        return True
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='svg-render')
+            return self._executor
+
+    def _prerender(self, catalog: Iterable, version: str):
+        start = time.perf_counter()
+        queued = 0
+        # Submitting a large catalog at once would queue a render for every diagram
+        slots = threading.BoundedSemaphore(self.workers * PRERENDER_QUEUE_PER_WORKER)
+        for record in catalog:
+            if version != self._version:
+                return  # superseded by a newer catalog
+            key = self.key(record.content)
+            if self.cache.get(key) is not None:
+                continue
+            slots.acquire()
+            if self._submit(key, record.content, slots.release):
+                queued += 1
+            else:
+                slots.release()
+        logger.info(f"Submitted {queued} diagrams for SVG rendering "
+                    f"({time.perf_counter() - start:.1f} s)")
+
+    def _submit(self, key: str, content: str, done: Optional[Callable[[], None]] = None) -> bool:
+        """Queue a render unless one is pending or backing off; ``done`` is
+        called once a queued render finishes
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            failure = self._failures.get(key)
+            if failure is not None and time.monotonic() < failure[1]:
+                return False
+            self._pending.add(key)
+        self._pool().submit(self._render, key, content, done)
+        return True
+
+    def _render(self, key: str, content: str, done: Optional[Callable[[], None]] = None):
+        start = time.perf_counter()
+        rendered = failed = 0
+        try:
+            if not self.cache.contains(key):
+                self.cache.put(key, self.renderer.render(content))
+                rendered = 1
+        except Exception as e:
+            logger.warning(f"Rendering diagram {key} failed: {e}")
+            failed = 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                if failed:
+                    # Invalid sources fail every time; back off instead of retrying them forever
+                    attempts = self._failures.get(key, (0, 0.0))[0] + 1
+                    delay = self.retry_seconds * 2 ** min(attempts - 1, MAX_RETRY_DOUBLINGS)
+                    self._failures[key] = (attempts, time.monotonic() + delay)
+                else:
+                    self._failures.pop(key, None)
+                self.rendered += rendered
+                self.failed += failed
+                self.render_seconds += time.perf_counter() - start
+            if done is not None:
+                done()
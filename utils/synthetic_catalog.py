@@ -0,0 +1,121 @@
+"""Generate synthetic reference files for benchmarking.
+
+Usage:
+    python -m utils.synthetic_catalog SECTIONS [-o FILE] [--seed N]
+
+The output has the layout of mermaid_ref.txt ("N. Title", a blank line, then
+the diagram body) with a mix of flowchart, sequence, ER and state diagrams of
+varying size. The same seed always produces the same file.
+"""
+import argparse
+import random
+import sys
+from typing import Callable, Dict, List
+
+# Share of each diagram kind, roughly that of hand-written reference files
+DIAGRAM_MIX = (('graph', 0.4), ('sequence', 0.25), ('er', 0.2), ('state', 0.15))
+
+WORDS = ('account', 'api', 'archive', 'audit', 'auth', 'backup', 'billing', 'cache', 'catalog',
+         'client', 'config', 'customer', 'dashboard', 'database', 'deploy', 'email', 'event',
+         'export', 'gateway', 'import', 'inventory', 'invoice', 'job', 'ledger', 'login', 'metrics',
+         'notification', 'order', 'payment', 'pdf', 'pipeline', 'profile', 'queue', 'report',
+         'route', 'scheduler', 'search', 'session', 'shipment', 'storage', 'token', 'upload',
+         'user', 'validation', 'webhook', 'worker')
+TITLE_KINDS = {
+    'graph': ('Architecture', 'Flow', 'Pipeline', 'Overview'),
+    'sequence': ('Sequence', 'Interaction', 'Request Flow'),
+    'er': ('Schema', 'Data Model', 'Entity Relationships'),
+    'state': ('States', 'Lifecycle', 'State Machine')
+}
+
+
+def _name(rng: random.Random) -> str:
+    return ''.join(word.capitalize() for word in rng.sample(WORDS, 2))
+
+
+def _graph(rng: random.Random) -> List[str]:
+    nodes = [_name(rng) for _ in range(rng.randint(4, 24))]
+    lines = [rng.choice(('graph TD', 'graph LR', 'graph TB'))]
+    if rng.random() < 0.3:
+        lines.append(f'    subgraph "{rng.choice(WORDS).capitalize()} Layer"')
+        lines.extend(f'        {node}[{node}]' for node in nodes[:3])
+        lines.append('    end')
+    for i, node in enumerate(nodes[1:], 1):
+        source = nodes[rng.randrange(i)]
+        arrow = rng.choice(('-->', '-->', '-.->', '==>'))
+        lines.append(f'    {source} {arrow} {node}[{node.lower()}]')
+    return lines
+
+
+def _sequence(rng: random.Random) -> List[str]:
+    participants = [_name(rng) for _ in range(rng.randint(2, 6))]
+    lines = ['sequenceDiagram']
+    lines.extend(f'    participant {participant}' for participant in participants)
+    for _ in range(rng.randint(3, 20)):
+        sender, receiver = rng.sample(participants, 2)
+        arrow = rng.choice(('->>', '-->>', '-)'))
+        lines.append(f'    {sender}{arrow}{receiver}: {rng.choice(WORDS)} {rng.choice(WORDS)}')
+    return lines
+
+
+def _er(rng: random.Random) -> List[str]:
+    entities = list(dict.fromkeys(rng.choice(WORDS).upper() for _ in range(rng.randint(2, 8))))
+    lines = ['erDiagram']
+    for entity in entities:
+        lines.append(f'    {entity} {{')
+        lines.append('        int id PK')
+        for word in rng.sample(WORDS, rng.randint(1, 6)):
+            lines.append(f'        {rng.choice(("string", "int", "datetime", "float"))} {word}_field')
+        lines.append('    }')
+    for left, right in zip(entities, entities[1:]):
+        lines.append(f'    {left} {rng.choice(("||--o{", "||--||", "}o--o{"))} {right} : {rng.choice(WORDS)}')
+    return lines
+
+
+def _state(rng: random.Random) -> List[str]:
+    states = list(dict.fromkeys(_name(rng) for _ in range(rng.randint(3, 12))))
+    lines = ['stateDiagram-v2', f'    [*] --> {states[0]}']
+    for current, following in zip(states, states[1:]):
+        lines.append(f'    {current} --> {following} : {rng.choice(WORDS)}')
+    lines.append(f'    {states[-1]} --> [*]')
+    return lines
+
+
+BODIES: Dict[str, Callable[[random.Random], List[str]]] = {
+    'graph': _graph,
+    'sequence': _sequence,
+    'er': _er,
+    'state': _state
+}
+
+
+def generate_reference_file(path: str, sections: int, seed: int = 0) -> int:
+    """Write ``sections`` synthetic diagrams to ``path`` and return its size in bytes"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in DIAGRAM_MIX]
+    weights = [weight for _, weight in DIAGRAM_MIX]
+    size = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for number in range(1, sections + 1):
+            kind = rng.choices(kinds, weights)[0]
+            title = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()} {rng.choice(TITLE_KINDS[kind])}"
+            chunk = f"{number}. {title}\n\n" + '\n'.join(BODIES[kind](rng)) + '\n\n'
+            size += f.write(chunk)
+    return size
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Generate a synthetic mermaid reference file')
+    arg_parser.add_argument('sections', type=int, help='number of sections to generate')
+    arg_parser.add_argument('-o', '--output', default='mermaid_synthetic.txt',
+                            help='file to write (default: %(default)s)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    args = arg_parser.parse_args(argv)
+
+    size = generate_reference_file(args.output, args.sections, args.seed)
+    print(f"Wrote {args.sections} sections ({size / 1e6:.1f} MB) to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())